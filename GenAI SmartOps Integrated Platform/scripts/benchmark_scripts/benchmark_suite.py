@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark Suite
+
+Deterministic, offline performance benchmark of the chatbot and the script intent matcher:
+- ingestion throughput (rows/s) of OpenAI_RAG._load_documents and of a full vector store build
+  (sync_vector_store) on synthetic Excel sheets of --rows rows
+- per-source retrieve_relevant_docs latency
+- end-to-end graph invoke latency (p50/p95/p99) and prompt tokens per query
+- ScriptIntentMatcher intent index build/load time and match latency per path (keyword or embedding)
+
+No network is used: embeddings come from a local provider (hashing by default) and the LLM is a
+canned-answer stand-in that records the prompts it receives. Synthetic data is generated from a
+fixed seed and kept in --work-dir, so repeated runs compare like with like. Results are printed
+(and optionally written) as JSON; the exit status is 1 if any benchmark failed.
+
+Usage:
+    python scripts/benchmark_scripts/benchmark_suite.py --rows 10000 100000 --output suite.json
+    python scripts/benchmark_scripts/benchmark_suite.py --only graph intent --repeat 20
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import traceback
+import numpy as np
+import pandas as pd
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+# Resolve BASE_DIR (move up two directories from script location)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.insert(0, os.path.join(BASE_DIR, "src", "agents"))
+
+import smart_ops_gen_ai_chatbot as chatbot  # noqa: E402
+from embedding_providers import create_embeddings  # noqa: E402
+from token_counter import count_tokens  # noqa: E402
+
+SEED = 42
+
+# Chat questions of the graph benchmark (one per routing path: ID lookup, filtered, ambiguous, ...)
+GRAPH_QUERIES = [
+    "Show me the details of INC0000042",
+    "Which high impact incidents are still open?",
+    "List emergency changes with high risk",
+    "Which servers run RHEL in production?",
+    "Is the oracle database DB00017 supported by the DBA team?",
+    "Which firewalls are in the datacenter VLAN 20?",
+    "Why is the application slow?",
+    "What changed on the network before the outage?"
+]
+
+INTENT_QUERIES = [
+    "Check CPU load",
+    "Find memory performance",
+    "Troubleshoot network slow speed",
+    "Application Server Appserver02 is unresponsive, take action.",
+    "Get data of server name 'grafana-server-05' from Grafana",
+    "Temp folder size exceeded 5MB, clean it up",
+    # No keyword or keywords of several scripts: answered by the vector search
+    "Show me the performance data of host WRRSS03W531",
+    "Server dbserver03 is slow and its memory is full"
+]
+
+WORDS = ("server disk memory cpu latency timeout network packet loss database query lock replication "
+         "backup restore certificate expired login failure patch reboot service restart cluster node "
+         "firewall rule vlan switch port router route dns application error slow unresponsive").split()
+
+
+class RecordingChatModel(FakeListChatModel):
+    """Canned-answer chat model that counts the tokens of every prompt it receives."""
+
+    prompt_tokens: list = []
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        self.prompt_tokens.append(count_tokens("\n".join(str(message.content) for message in messages)))
+        return super()._call(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+# ---------- Synthetic data ----------
+
+def _text(rng, rows, words=12):
+    picks = rng.choice(WORDS, size=(rows, words))
+    return [" ".join(row) for row in picks]
+
+
+def _dates(rng, rows):
+    return pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D")
+
+
+def synthetic_sheet(source, rows, seed=SEED):
+    """A sheet with the key, lookup and metadata columns the real export of `source` has."""
+    rng = np.random.default_rng(seed)
+    n = np.arange(1, rows + 1)
+    pick = lambda *values: rng.choice(values, size=rows)  # noqa: E731
+
+    if source == "Incidents":
+        start = _dates(rng, rows)
+        return pd.DataFrame({
+            "Incident Number": [f"INC{i:07d}" for i in n],
+            "Incident Priority": pick("P1", "P2", "P3", "P4"),
+            "Incident Impact": pick("High", "Medium", "Low"),
+            "Incident Support Group": pick("Windows Team", "Linux Team", "DBA Team", "Network Team"),
+            "Incident Category": pick("Application", "Network", "Database", "Hardware"),
+            "Incident state": pick("Open", "In Progress", "Resolved", "Closed"),
+            "Incident Start Date": start,
+            "Incident End Date": start + pd.to_timedelta(rng.integers(0, 72, rows), unit="h"),
+            "Short Description": _text(rng, rows),
+            "Resolution Notes": _text(rng, rows, words=30)
+        })
+    if source == "Change_Requests":
+        start = _dates(rng, rows)
+        return pd.DataFrame({
+            "ChangeNumber": [f"CHG-{i:06d}" for i in n],
+            "Category": pick("Application", "Network", "Database", "Infrastructure"),
+            "Risk": pick("High", "Medium", "Low"),
+            "TypeOfChange": pick("Standard", "Normal", "Emergency"),
+            "State": pick("New", "Scheduled", "Implemented", "Closed"),
+            "AssignGroup": pick("Windows Team", "Linux Team", "DBA Team", "Network Team"),
+            "StartDate": start,
+            "EndDate": start + pd.to_timedelta(rng.integers(1, 48, rows), unit="h"),
+            "IsProductionChange": pick(True, False),
+            "Description": _text(rng, rows, words=20)
+        })
+    if source == "CI_Data":
+        return pd.DataFrame({
+            "Device Name": [f"WLJP{i % 100:02d}W{i // 100:02d}" for i in n],
+            "Device ID": [f"CI{i:06d}" for i in n],
+            "Location": pick("Datacenter", "Branch", "Cloud"),
+            "Type": pick("Server", "Virtual Machine", "Appliance"),
+            "OS": pick("Windows", "RHEL", "Ubuntu"),
+            "Supported by": pick("Windows Team", "Linux Team"),
+            "Environment": pick("Production", "Test", "Development"),
+            "Status": pick("Active", "Retired"),
+            "Application": _text(rng, rows, words=3)
+        })
+    if source == "Knowledge_Base":
+        return pd.DataFrame({
+            "KB#": [f"KB{i:06d}" for i in n],
+            "Type": pick("Application", "Network", "Database"),
+            "Severity": pick("High", "Medium", "Low"),
+            "Title": _text(rng, rows, words=6),
+            "Resolution": _text(rng, rows, words=40)
+        })
+    if source == "Database_Data":
+        return pd.DataFrame({
+            "DB ID": [f"DB{i:05d}" for i in n],
+            "DB Name": [f"db_{word}_{i}" for word, i in zip(rng.choice(WORDS, rows), n)],
+            "Server": [f"DBSRV{i % 500:03d}" for i in n],
+            "DB Type": pick("Oracle", "MS-SQL", "PostgreSQL", "MySQL"),
+            "Environment": pick("Production", "Test", "Development"),
+            "Supported By": pick("DBA Team", "Application Team"),
+            "Status": pick("Online", "Offline")
+        })
+    if source == "Network_Devices":
+        return pd.DataFrame({
+            "Device ID/Serial Number": [f"SN-{i:07d}" for i in n],
+            "Device Name/Hostname": [f"netdev-{i:06d}" for i in n],
+            "IP Address": [f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in n],
+            "MAC Address": [":".join(f"{(i >> shift) & 255:02X}" for shift in (40, 32, 24, 16, 8, 0)) for i in n],
+            "Device Type": pick("Router", "Switch", "Firewall", "Access Point"),
+            "Manufacturer": pick("Cisco", "Juniper", "Fortinet", "Aruba"),
+            "Location": pick("Datacenter", "Branch", "Campus"),
+            "Department/Owner": pick("Network Team", "Security Team"),
+            "Connection Type": pick("Wired", "Wireless"),
+            "Status": pick("Active", "Inactive"),
+            "Security Level": pick("High", "Medium", "Low"),
+            "VLAN": rng.integers(1, 50, rows),
+            "Last Updated": _dates(rng, rows)
+        })
+    raise ValueError(f"No synthetic data for source {source}")
+
+
+def write_sheet(directory, source, rows):
+    """Write (or reuse) the synthetic Excel file of a source; returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, chatbot.DATA_SOURCES[source])
+    marker = f"{path}.{rows}.{SEED}"
+    if not (os.path.exists(path) and os.path.exists(marker)):
+        start = time.perf_counter()
+        synthetic_sheet(source, rows).to_excel(path, index=False)
+        open(marker, "w").close()
+        print(f"Generated {rows} {source} rows in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return path
+
+
+# ---------- Measurements ----------
+
+def percentiles(samples):
+    values = np.asarray(samples, dtype=float)
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 6),
+        "p50": round(float(np.percentile(values, 50)), 6),
+        "p95": round(float(np.percentile(values, 95)), 6),
+        "p99": round(float(np.percentile(values, 99)), 6)
+    }
+
+
+def bench_ingestion(work_dir, rows_list, source="Incidents"):
+    """rows/s of parsing + chunking (cold and Parquet-cached) and of a full vector store build."""
+    results = {}
+    for rows in rows_list:
+        docs_dir = os.path.join(work_dir, "sheets", f"{source}-{rows}")
+        file_path = write_sheet(docs_dir, source, rows)
+        run_dir = tempfile.mkdtemp(prefix="ingest-", dir=work_dir)
+        try:
+            rag = chatbot.OpenAI_RAG(
+                docs_dir, os.path.join(run_dir, "chroma"),
+                record_index_path=os.path.join(run_dir, "record_index.sqlite3"),
+                sheet_cache_dir=os.path.join(run_dir, "sheets"),
+                store_mode=chatbot.STORE_MODE_SINGLE
+            )
+
+            start = time.perf_counter()
+            documents = rag._load_documents(file_path, source)
+            cold = time.perf_counter() - start
+
+            start = time.perf_counter()
+            rag._load_documents(file_path, source)
+            cached = time.perf_counter() - start
+
+            start = time.perf_counter()
+            rag.sync_vector_store(source, file_path)
+            build = time.perf_counter() - start
+
+            results[str(rows)] = {
+                "chunks": len(documents),
+                "load_documents_s": round(cold, 4),
+                "load_documents_rows_per_s": round(rows / cold, 1),
+                "load_documents_cached_rows_per_s": round(rows / cached, 1),
+                "vector_store_build_s": round(build, 4),
+                "vector_store_build_rows_per_s": round(rows / build, 1)
+            }
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+        print(f"ingestion {rows}: {results[str(rows)]}", file=sys.stderr)
+    return results
+
+
+def bench_retrieval(queries, repeat):
+    """Latency of retrieve_relevant_docs per source (seconds)."""
+    rag = chatbot.get_rag_system()
+    results = {}
+    for source in chatbot.DATA_SOURCES:
+        samples = []
+        for _ in range(repeat):
+            for query in queries:
+                start = time.perf_counter()
+                rag.retrieve_relevant_docs(query, source)
+                samples.append(time.perf_counter() - start)
+        results[source] = percentiles(samples)
+    return results
+
+
+def bench_graph(llm, queries, repeat):
+    """End-to-end graph latency (seconds) and prompt tokens of the final LLM call per query.
+
+    Retrieval caches are emptied before every run, so each sample pays for the full search path.
+    """
+    graph = chatbot.get_graph()
+    retrieval_caches = chatbot.get_service_desk().retrieval_caches.values()
+    latencies, context_tokens, dropped_tokens = [], [], []
+    llm.prompt_tokens.clear()
+    for _ in range(repeat):
+        for query in queries:
+            for cache in retrieval_caches:
+                cache.clear()
+            start = time.perf_counter()
+            result = graph.invoke({"query": query, "chat_history": ""})
+            latencies.append(time.perf_counter() - start)
+            stats = result.get("Context_Stats") or {}
+            context_tokens.append(stats.get("context_tokens", 0))
+            dropped_tokens.append(stats.get("dropped_tokens", 0))
+    return {
+        "latency_s": percentiles(latencies),
+        "prompt_tokens": percentiles(llm.prompt_tokens),
+        "context_tokens": percentiles(context_tokens),
+        "dropped_context_tokens": percentiles(dropped_tokens)
+    }
+
+
+def bench_intent(embeddings, queries, repeat, index_dir):
+    """Intent matching: index build vs load of the persisted index, and match() latency per path."""
+    from script_intent_matcher_agent import ScriptIntentMatcher
+
+    start = time.perf_counter()
+    ScriptIntentMatcher(None, embeddings, index_dir=index_dir, rebuild=True)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    matcher = ScriptIntentMatcher(None, embeddings, index_dir=index_dir)
+    load = time.perf_counter() - start
+
+    samples, by_path = [], {}
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            path = matcher.match(query)["path"]
+            elapsed = time.perf_counter() - start
+            samples.append(elapsed)
+            by_path.setdefault(path, []).append(elapsed)
+    return {
+        "index_build_s": round(build, 4),
+        "index_load_s": round(load, 4),
+        "latency_s": percentiles(samples),
+        "latency_by_path_s": {path: percentiles(values) for path, values in by_path.items()},
+        "queries_per_path": {path: len(values) // repeat for path, values in by_path.items()},
+        "queries_per_s": round(len(samples) / sum(samples), 1)
+    }
+
+
+def run_suite(args):
+    work_dir = os.path.abspath(args.work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+    embeddings = create_embeddings(args.embeddings)
+    llm = RecordingChatModel(responses=["Benchmark answer."])
+    chatbot.configure(
+        embedding_model=embeddings,
+        llm=llm,
+        sql_llm=FakeListChatModel(responses=["SELECT 1"]),
+        docs_path=os.path.join(work_dir, "sources", str(args.source_rows)),
+        persist_directory=os.path.join(work_dir, "chroma", f"{args.source_rows}-{embeddings.model_name}"),
+        record_index_path=os.path.join(work_dir, "cache", "record_index.sqlite3"),
+        sheet_cache_dir=os.path.join(work_dir, "cache", "sheets")
+    )
+
+    benchmarks = {
+        "ingestion": lambda: bench_ingestion(work_dir, args.rows),
+        "retrieval": lambda: bench_retrieval(GRAPH_QUERIES, args.repeat),
+        "graph": lambda: bench_graph(llm, GRAPH_QUERIES, args.repeat),
+        "intent": lambda: bench_intent(
+            embeddings, INTENT_QUERIES, args.repeat * 10, os.path.join(work_dir, "intent_index")
+        )
+    }
+    if any(name in ("retrieval", "graph") for name in args.only or benchmarks):
+        for source in chatbot.DATA_SOURCES:
+            write_sheet(os.path.join(work_dir, "sources", str(args.source_rows)), source, args.source_rows)
+
+    results = {}
+    for name, bench in benchmarks.items():
+        if args.only and name not in args.only:
+            continue
+        start = time.perf_counter()
+        try:
+            results[name] = bench()
+        except Exception as e:
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            traceback.print_exc()
+            print(f"ERROR: {name} benchmark failed: {results[name]['error']}", file=sys.stderr)
+        print(f"{name} finished in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    return {
+        "benchmark": "suite",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": SEED,
+        "embeddings": embeddings.model_name,
+        "source_rows": args.source_rows,
+        "repeat": args.repeat,
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline performance benchmark of ingestion, retrieval and chat")
+    parser.add_argument("--rows", type=int, nargs="*", default=[10000],
+                        help="Sheet sizes of the ingestion benchmark, e.g. 10000 100000 1000000")
+    parser.add_argument("--source-rows", type=int, default=2000, help="Rows per source for retrieval and graph runs")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the query set")
+    parser.add_argument("--embeddings", default="hashing", choices=["hashing", "sentence_transformer"],
+                        help="Local embedding provider")
+    parser.add_argument("--only", nargs="*", default=[], help="Run only these: ingestion retrieval graph intent")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "smartops_benchmark"),
+                        help="Synthetic sheets and stores (reused between runs)")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run_suite(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    failed = [name for name, result in report["results"].items() if "error" in result]
+    if failed:
+        print(f"ERROR: benchmarks failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Startup Benchmark Script
+
+Measures cold-start time of every entry point so startup regressions show up:
+- import time of the agent modules (should stay free of network calls and index builds)
+- time until the Flask alert receiver answers /health (and, with --warm, until its intent index is built)
+- time until the Gradio app serves its page
+- time until the monitoring script reports it started
+
+Each measurement starts a fresh Python process, killed if it is not ready within --timeout. Results
+are printed (and optionally written) as JSON; the exit status is 1 if any measurement failed.
+
+Usage:
+    python scripts/benchmark_scripts/startup_benchmark.py --runs 3 --output startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import platform
+import statistics
+import threading
+import subprocess
+import requests
+
+# Resolve BASE_DIR (move up two directories from script location)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+AGENTS_DIR = os.path.join(BASE_DIR, "src", "agents")
+
+FLASK_SERVER_SCRIPT = os.path.join(AGENTS_DIR, "flask_alert_receiver_agent.py")
+GRADIO_APP_SCRIPT = os.path.join(AGENTS_DIR, "GenAI_SmartOps_Integrated_Platform.py")
+MONITORING_SCRIPT = os.path.join(BASE_DIR, "scripts", "monitoring_scripts", "m_temp_files_size_monitoring.py")
+
+FLASK_HEALTH_URL = "http://127.0.0.1:5006/health"
+GRADIO_PORT = 7861  # Not the default port, so a running UI does not answer for the benchmarked one
+
+IMPORT_MODULES = [
+    "smart_ops_gen_ai_chatbot",
+    "gen_ai_script_executer_agent",
+    "flask_alert_receiver_agent",
+    "GenAI_SmartOps_Integrated_Platform"
+]
+
+
+def measure_import(module, timeout):
+    """Seconds spent importing `module` in a fresh interpreter."""
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"import {module}; print(time.perf_counter() - start)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=AGENTS_DIR, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def wait_for_http(process, url, timeout, ready=lambda response: response.status_code == 200):
+    """Seconds from now until `url` satisfies `ready`; raises if the process exits or times out."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"process exited with code {process.returncode}")
+        try:
+            response = requests.get(url, timeout=1)
+            if ready(response):
+                return time.perf_counter() - start
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} not ready after {timeout}s")
+
+
+def wait_for_output(process, text, timeout):
+    """Seconds from now until the process prints a line containing `text`; raises if it exits or times out.
+
+    stdout is read on a helper thread, so a process that prints nothing cannot block the wait.
+    """
+    lines = queue.Queue()
+
+    def pump():
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=pump, daemon=True).start()
+    start = time.perf_counter()
+    while True:
+        remaining = timeout - (time.perf_counter() - start)
+        if remaining <= 0:
+            raise TimeoutError(f"'{text}' not printed after {timeout}s")
+        try:
+            line = lines.get(timeout=remaining)
+        except queue.Empty:
+            continue
+        if line is None:
+            raise RuntimeError(f"process exited with code {process.wait()} before printing '{text}'")
+        if text in line:
+            return time.perf_counter() - start
+
+
+def start_process(script_path, env=None):
+    return subprocess.Popen(
+        [sys.executable, "-u", script_path],
+        cwd=os.path.dirname(script_path),
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+
+
+def stop_process(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def measure_flask(timeout, warm):
+    process = start_process(FLASK_SERVER_SCRIPT)
+    start = time.perf_counter()
+    try:
+        result = {"ready_s": wait_for_http(process, FLASK_HEALTH_URL, timeout)}
+        if warm:
+            wait_for_http(process, FLASK_HEALTH_URL, timeout, ready=lambda response: response.json().get("matcher_ready"))
+            result["warm_s"] = time.perf_counter() - start
+        return result
+    finally:
+        stop_process(process)
+
+
+def measure_gradio(timeout):
+    process = start_process(GRADIO_APP_SCRIPT, env={"GRADIO_SERVER_PORT": str(GRADIO_PORT), "SMARTOPS_NO_BROWSER": "1"})
+    try:
+        return {"ready_s": wait_for_http(process, f"http://127.0.0.1:{GRADIO_PORT}/", timeout)}
+    finally:
+        stop_process(process)
+
+
+def measure_monitor(timeout):
+    """Seconds until the monitoring script prints its start banner."""
+    process = start_process(MONITORING_SCRIPT)
+    try:
+        return {"ready_s": wait_for_output(process, "monitoring script started", timeout)}
+    except TimeoutError:
+        process.kill()  # Hung: no point in a graceful stop
+        raise
+    finally:
+        stop_process(process)
+
+
+def summarize(samples):
+    """Median/min/max per metric over the runs that succeeded."""
+    summary = {}
+    for metric in sorted({key for sample in samples if "error" not in sample for key in sample}):
+        values = [sample[metric] for sample in samples if metric in sample]
+        summary[metric] = {
+            "median_s": round(statistics.median(values), 4),
+            "min_s": round(min(values), 4),
+            "max_s": round(max(values), 4)
+        }
+    errors = [sample["error"] for sample in samples if "error" in sample]
+    if errors:
+        summary["errors"] = errors
+    return summary
+
+
+def run_benchmark(runs, timeout, warm, components):
+    measurements = {
+        "flask_alert_receiver": lambda: measure_flask(timeout, warm),
+        "gradio_app": lambda: measure_gradio(timeout),
+        "monitoring_script": lambda: measure_monitor(timeout)
+    }
+    for module in IMPORT_MODULES:
+        measurements[f"import:{module}"] = lambda module=module: {"import_s": measure_import(module, timeout)}
+
+    results = {}
+    for name, measure in measurements.items():
+        if components and not any(name.startswith(component) for component in components):
+            continue
+        samples = []
+        for _ in range(runs):
+            try:
+                samples.append(measure())
+            except Exception as e:
+                samples.append({"error": f"{type(e).__name__}: {e}"})
+                print(f"ERROR: {name} measurement failed: {samples[-1]['error']}", file=sys.stderr)
+        results[name] = summarize(samples)
+        print(f"{name}: {results[name]}", file=sys.stderr)
+
+    return {
+        "benchmark": "startup",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": runs,
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark of the SmartOps entry points")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per measurement")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds to wait for a process to become ready")
+    parser.add_argument("--warm", action="store_true", help="Also wait for the Flask intent index (needs API access)")
+    parser.add_argument("--only", nargs="*", default=[], help="Measure only these components, e.g. import gradio_app")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.runs, args.timeout, args.warm, args.only)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    failed = [name for name, result in report["results"].items() if "errors" in result]
+    if failed:
+        print(f"ERROR: measurements failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
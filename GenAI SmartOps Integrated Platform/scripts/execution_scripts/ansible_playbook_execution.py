@@ -115,11 +115,10 @@ def extract_server_name(query):
 #     #time.sleep(3)
 #     #print(f"\n **{server_name} issue resolved successfully!**")
 
-def execute_ansible_playbook(query):
+def run(query):
     server_name = extract_server_name(query)
     if not server_name:
-        print("\n **Error:** Server name not found in query.")
-        return
+        return "\n **Error:** Server name not found in query."
 
     issue_type = extract_issue_type(query)
 
@@ -129,9 +128,11 @@ def execute_ansible_playbook(query):
 
     issue, fix_action = random.choice(server_issue_mapping[issue_type])
 
-    print(f"\n Issue detected on {server_name}: {issue}")
     time.sleep(2)
-    print(f"\n Action: {fix_action}")
+    return f"\n Issue detected on {server_name}: {issue}\n\n Action: {fix_action}"
+
+def execute_ansible_playbook(query):
+    print(run(query))
 
 
 if __name__ == "__main__":
@@ -140,4 +141,4 @@ if __name__ == "__main__":
         #print(f"\nProcessing Query: {query}")
         execute_ansible_playbook(query)
     else:
-        print(" No query provided. Please pass a valid query.")
\ No newline at end of file
+        print(" No query provided. Please pass a valid query.")
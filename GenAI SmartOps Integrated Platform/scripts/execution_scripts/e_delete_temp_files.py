@@ -16,8 +16,14 @@ LOG_FILE = os.path.join(LOG_DIR, "e_delete_temp_files.log")
 # Ensure log directory exists
 os.makedirs(LOG_DIR, exist_ok=True)
 
-# Configure logging
-logging.basicConfig(filename=LOG_FILE, level=logging.INFO, format="%(asctime)s - %(message)s")
+# Configure logging (own logger: the script also runs inside the executor's process)
+logger = logging.getLogger("e_delete_temp_files")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+if not logger.handlers:
+    file_handler = logging.FileHandler(LOG_FILE)
+    file_handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    logger.addHandler(file_handler)
 
 # Update TEMP_FOLDER path (Assuming it's inside `data/temp/`)
 TEMP_FOLDER = os.path.join(BASE_DIR, "data", "temp")
@@ -43,8 +49,8 @@ def format_response(query, folder_path, deleted_files):
 def delete_temp_files(query):
     """Delete files in the temp folder and return formatted details."""
     if not os.path.exists(TEMP_FOLDER):
-        logging.error(f"Folder not found: {TEMP_FOLDER}")
-        return {"status": "error", "message": f"Folder `{TEMP_FOLDER}` not found."}
+        logger.error(f"Folder not found: {TEMP_FOLDER}")
+        return f" Temporary folder not found, No Action Taken.\n\nFolder Path: {TEMP_FOLDER}\n"
 
     deleted_files = []
     for filename in os.listdir(TEMP_FOLDER):
@@ -54,14 +60,17 @@ def delete_temp_files(query):
                 os.remove(file_path)
                 deleted_files.append(filename)
         except Exception as e:
-            logging.error(f"Error deleting {filename}: {e}")
+            logger.error(f"Error deleting {filename}: {e}")
 
     # Prepare formatted response
     response = format_response(query, TEMP_FOLDER, deleted_files)
-    logging.info(json.dumps(response, indent=2, ensure_ascii=False))
+    logger.info(json.dumps(response, indent=2, ensure_ascii=False))
 
     return response
 
+def run(query):
+    return delete_temp_files(query)
+
 if __name__ == "__main__":
     query = sys.argv[1] if len(sys.argv) > 1 else "No query provided"
     result = delete_temp_files(query)
@@ -1,5 +1,10 @@
+import sys
 import psutil
 
-# Get the CPU usage percentage over a 1-second interval
-cpu_usage = psutil.cpu_percent(interval=1)
-print(f"CPU Usage: {cpu_usage}%")
+def run(query):
+    # Get the CPU usage percentage over a 1-second interval
+    cpu_usage = psutil.cpu_percent(interval=1)
+    return f"CPU Usage: {cpu_usage}%"
+
+if __name__ == "__main__":
+    print(run(" ".join(sys.argv[1:])))
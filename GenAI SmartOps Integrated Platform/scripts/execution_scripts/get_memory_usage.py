@@ -1,5 +1,10 @@
+import sys
 import psutil
 
-# Get the system's memory usage percentage
-memory_usage = psutil.virtual_memory().percent
-print(f"Memory Usage: {memory_usage}%")
\ No newline at end of file
+def run(query):
+    # Get the system's memory usage percentage
+    memory_usage = psutil.virtual_memory().percent
+    return f"Memory Usage: {memory_usage}%"
+
+if __name__ == "__main__":
+    print(run(" ".join(sys.argv[1:])))
@@ -50,11 +50,12 @@ def format_data(data):
         f"   Packet Loss: {data['Packet_Loss']}%\n"
     )
 
+def run(query):
+    data = fetch_dummy_grafana_data(query)
+    return format_data(data) if data else ""
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
-        query = sys.argv[1]
-        data = fetch_dummy_grafana_data(query)
-        if data:
-            print(format_data(data))
+        print(run(sys.argv[1]))
     else:
         print("No query provided. Please pass a valid query.")
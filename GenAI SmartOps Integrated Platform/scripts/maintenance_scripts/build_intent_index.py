@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Intent Index Build Script
+
+Embeds the script intent table (script_intent_matcher_agent.SCRIPT_INTENTS) once and stores the
+normalized FAISS index in [IntentIndex] PATH, tagged with the intent table version and the
+embedding model. The alert receiver and the Gradio app then load it at start-up instead of
+embedding the intents in every process. Run it after changing the intents or [Embedding]
+INTENT_PROVIDER/INTENT_MODEL; a stale index is otherwise rebuilt by the first matcher.
+
+Usage:
+    python scripts/maintenance_scripts/build_intent_index.py
+    python scripts/maintenance_scripts/build_intent_index.py --check "What is the Memory usage of system ?"
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Resolve BASE_DIR (move up two directories from script location)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.insert(0, os.path.join(BASE_DIR, "src", "agents"))
+
+from dotenv import load_dotenv  # noqa: E402
+from gen_ai_script_executer_agent import INTENT_INDEX_DIR, config  # noqa: E402
+from embedding_providers import embeddings_from_config  # noqa: E402
+from script_intent_matcher_agent import ScriptIntentMatcher  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the persisted script intent index")
+    parser.add_argument("--index-dir", default=INTENT_INDEX_DIR, help="Directory of the index files")
+    parser.add_argument("--check", nargs="*", default=[], help="Queries to match against the new index")
+    args = parser.parse_args()
+
+    load_dotenv()
+    api_key = os.getenv("openai_api_key")
+    embeddings = embeddings_from_config(config, api_key, prefix="INTENT_")
+
+    start = time.perf_counter()
+    matcher = ScriptIntentMatcher(api_key, embeddings, index_dir=args.index_dir, rebuild=True)
+    index_path, _ = matcher.index_paths()
+    # Printed: importing the executor sends logging to its log file
+    print(
+        f"✅ Intent index for {matcher.embedding_model} (version {matcher.version}, "
+        f"{len(matcher.script_intents)} intents) written to {index_path} in {time.perf_counter() - start:.2f}s"
+    )
+
+    for query in args.check:
+        matched = matcher.match(query)
+        print(f"{query!r} -> {matched['script']} (via {matched['path']}, score {matched['score']})")
+
+
+if __name__ == "__main__":
+    main()
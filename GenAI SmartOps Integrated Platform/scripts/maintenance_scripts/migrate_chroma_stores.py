@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Chroma Store Migration Script
+
+Converts the per-source Chroma stores (data/chroma_db/<source>) into the single collection
+used by [VectorStore] MODE = single. Stored embeddings are copied as they are and every
+document is tagged with its `source` metadata field. Stores built with another embedding model
+than the default are migrated with --embedding-model <model ID>.
+
+Stores built before delta ingestion have no row_id/row_hash metadata, and the first sync deletes
+and re-embeds such documents. While copying, each legacy chunk whose text is identical to a chunk
+of the current sheet (data/documents) gets that row's ID and metadata, so the sync keeps it. Rows
+whose text differs (edited since the build, or rendered differently now, e.g. midnight timestamps
+as plain dates) or whose sheet is missing are still re-embedded; the summary reports how many
+documents were backfilled.
+
+Collections at the data/chroma_db root other than the target are orphans of older builds.
+They are listed, and deleted with --purge-orphans.
+
+Usage:
+    python scripts/maintenance_scripts/migrate_chroma_stores.py --dry-run
+    python scripts/maintenance_scripts/migrate_chroma_stores.py --purge-orphans --remove-source-stores
+"""
+
+import os
+import sys
+import shutil
+import logging
+import argparse
+import chromadb
+from collections import Counter, defaultdict
+
+# Resolve BASE_DIR (move up two directories from script location)
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+sys.path.insert(0, os.path.join(BASE_DIR, "src", "agents"))
+
+from smart_ops_gen_ai_chatbot import (  # noqa: E402
+    DATA_SOURCES, DEFAULT_COLLECTION_NAME, DOCS_PATH, EMBEDDING_MODEL_KEY, PERSIST_DIRECTORY, OpenAI_RAG, config,
+    store_suffix
+)
+from embedding_providers import DEFAULT_EMBEDDING_MODEL  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+def collection_names(client):
+    # list_collections() returns names in some chromadb versions and Collection objects in others
+    return [getattr(collection, "name", collection) for collection in client.list_collections()]
+
+
+def is_legacy(metadata):
+    return "row_id" not in (metadata or {}) or "row_hash" not in (metadata or {})
+
+
+def backfill_plan(collection, documents):
+    """Map legacy document IDs to the (row-keyed ID, metadata) of the identical chunk in `documents`.
+
+    A row is only backfilled when all of its chunks are found; a partly matching row stays legacy
+    and is re-embedded as a whole by the next sync.
+    """
+    stored = collection.get(include=["documents", "metadatas"])
+    legacy = defaultdict(list)  # chunk text -> legacy IDs
+    for doc_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+        if is_legacy(metadata):
+            legacy[text].append(doc_id)
+
+    rows = defaultdict(list)  # row ID -> [(chunk ID, document)]
+    for doc_id, doc in zip(OpenAI_RAG._chunk_ids(documents), documents):
+        rows[doc.metadata["row_id"]].append((doc_id, doc))
+
+    plan = {}
+    for chunks in rows.values():
+        needed = Counter(doc.page_content for _, doc in chunks)
+        if all(len(legacy.get(text, ())) >= count for text, count in needed.items()):
+            for doc_id, doc in chunks:
+                plan[legacy[doc.page_content].pop()] = (doc_id, doc.metadata)
+    return plan
+
+
+def migrate_source(source, source_path, target, dry_run, documents=(), batch_size=BATCH_SIZE):
+    """Copy every collection of one per-source store into the target collection.
+
+    Legacy documents matching a chunk of `documents` (the source's current sheet) get its
+    row ID and metadata. Returns (copied, backfilled) document counts.
+    """
+    client = chromadb.PersistentClient(path=source_path)
+    copied = backfilled = 0
+
+    for name in collection_names(client):
+        collection = client.get_collection(name)
+        total = collection.count()
+        plan = backfill_plan(collection, documents) if documents else {}
+        logger.info(f"{source}: collection '{name}' has {total} documents ({len(plan)} legacy documents to backfill)")
+        backfilled += len(plan)
+        if dry_run:
+            copied += total
+            continue
+
+        for offset in range(0, total, batch_size):
+            batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            ids, metadatas = [], []
+            for doc_id, metadata in zip(batch["ids"], batch["metadatas"]):
+                if doc_id in plan:
+                    doc_id, metadata = plan[doc_id]
+                # Row-keyed IDs already start with the source; older random IDs get it as a prefix
+                ids.append(doc_id if doc_id.startswith(f"{source}:") else f"{source}:{doc_id}")
+                metadatas.append(dict(metadata or {}, source=source))
+            target.upsert(ids=ids, embeddings=batch["embeddings"], documents=batch["documents"], metadatas=metadatas)
+            copied += len(ids)
+
+    return copied, backfilled
+
+
+def sheet_documents(rag, source):
+    """The documents the next sync builds for a source, or none if its sheet is missing."""
+    file_path = os.path.join(rag.docs_path, DATA_SOURCES[source])
+    if not os.path.exists(file_path):
+        logger.warning(f"{source}: {file_path} not found, legacy documents are not backfilled")
+        return []
+    return rag._load_documents(file_path, source)
+
+
+def migrate(persist_directory, collection_name, dry_run=False, purge_orphans=False, remove_source_stores=False,
+            embedding_model=DEFAULT_EMBEDDING_MODEL, docs_path=DOCS_PATH):
+    suffix = store_suffix(embedding_model)
+    rag = OpenAI_RAG(docs_path, persist_directory, embedding_model=embedding_model)
+    client = chromadb.PersistentClient(path=persist_directory)
+    # Collections of other embedding models ("<collection>__<model>") are not orphans
+    orphans = [
+        name for name in collection_names(client)
+        if name != collection_name and not name.startswith(f"{collection_name}__")
+    ]
+    collection_name += suffix
+    target = None if dry_run else client.get_or_create_collection(
+        collection_name, metadata={EMBEDDING_MODEL_KEY: embedding_model}
+    )
+
+    summary, backfilled = {}, {}
+    for source in DATA_SOURCES:
+        source_path = os.path.join(persist_directory, source + suffix)
+        if not os.path.isdir(source_path):
+            continue
+        try:
+            summary[source], backfilled[source] = migrate_source(
+                source, source_path, target, dry_run, sheet_documents(rag, source)
+            )
+        except Exception as e:
+            logger.error(f"{source}: migration failed, store left in place: {e}")
+            continue
+
+        if remove_source_stores and not dry_run:
+            shutil.rmtree(source_path)
+            logger.info(f"{source}: removed per-source store {source_path}")
+
+    for name in orphans:
+        if purge_orphans and not dry_run:
+            client.delete_collection(name)
+            logger.info(f"Deleted orphaned collection '{name}'")
+        else:
+            logger.info(f"Orphaned collection '{name}' (use --purge-orphans to delete)")
+
+    action = "Would copy" if dry_run else "Copied"
+    logger.info(f"{action} {sum(summary.values())} documents into '{collection_name}': {summary}")
+    logger.info(
+        f"Backfilled row metadata of {sum(backfilled.values())} legacy documents: {backfilled} "
+        "(other legacy documents are re-embedded by the next sync)"
+    )
+    if target is not None:
+        logger.info(f"'{collection_name}' now holds {target.count()} documents")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the per-source Chroma stores into one collection")
+    parser.add_argument("--persist-directory", default=PERSIST_DIRECTORY)
+    parser.add_argument("--collection", default=config.get("VectorStore", "COLLECTION", fallback=DEFAULT_COLLECTION_NAME))
+    parser.add_argument("--embedding-model", default=DEFAULT_EMBEDDING_MODEL, help="Model ID the stores were built with")
+    parser.add_argument("--docs-path", default=DOCS_PATH, help="Sheets used to backfill row metadata of legacy documents")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be migrated")
+    parser.add_argument("--purge-orphans", action="store_true", help="Delete other collections at the store root")
+    parser.add_argument("--remove-source-stores", action="store_true", help="Delete each per-source store once copied")
+    args = parser.parse_args()
+
+    migrate(args.persist_directory, args.collection, args.dry_run, args.purge_orphans, args.remove_source_stores,
+            args.embedding_model, args.docs_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ Monitors a folder and triggers an alert if the size exceeds a set threshold.
 """
 
 import os
+import sys
 import requests
 import logging
 import time
@@ -49,6 +50,52 @@ logging.info(f"Resolved LOG_DIR path: {LOG_DIR}")
 SIZE_LIMIT_MB = config.getfloat("Settings", "SIZE_LIMIT_MB", fallback=5)  # Default 5 MB
 FLASK_ALERT_URL = config.get("Settings", "FLASK_ALERT_URL", fallback="http://localhost:5006/alert")  # Updated port to 5006
 
+# When the receiver is unreachable, alerts go straight into its durable queue ([AlertQueue])
+sys.path.insert(0, os.path.join(BASE_DIR, "src", "agents"))
+from alert_queue import QueueFull, queue_from_config  # noqa: E402
+from alert_jobs import alert_fingerprint  # noqa: E402
+
+platform_config = configparser.ConfigParser()
+platform_config.read(os.path.join(BASE_DIR, "config", "config.ini"))
+MAX_SEND_ATTEMPTS = 3
+_alert_queue = None
+
+
+def enqueue_directly(alert_data):
+    """Store an alert in the receiver's queue file; it runs once the receiver is back."""
+    global _alert_queue
+    if _alert_queue is None:
+        _alert_queue = queue_from_config(platform_config, BASE_DIR)
+    message = alert_data["message"]
+    dedup_window = platform_config.getfloat("AlertJobs", "DEDUP_WINDOW_SECONDS", fallback=300)
+    row, reason = _alert_queue.enqueue(message, alert_data, alert_fingerprint(message), dedup_window)
+    logging.info(f"Alert queued directly as job {row['id']}" + (f" (deduplicated: {reason})" if reason else ""))
+
+
+def send_alert(alert_data):
+    """POST an alert; honours 429 Retry-After and falls back to the durable queue if the receiver is down."""
+    for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+        try:
+            response = requests.post(FLASK_ALERT_URL, json=alert_data, timeout=5)
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Failed to send alert: {e}")
+            try:
+                enqueue_directly(alert_data)
+            except QueueFull as full:
+                logging.error(f"Alert queue full, alert deferred to the next check: {full}")
+            return
+        if response.status_code in (200, 202):  # 202: queued as a job on the receiver
+            logging.info(f"Alert sent successfully: {response.json()}")
+            return
+        if response.status_code == 429:
+            retry_after = float(response.headers.get("Retry-After", 5))
+            logging.warning(f"Receiver busy (attempt {attempt}), retrying in {retry_after:g}s")
+            time.sleep(retry_after)
+            continue
+        logging.error(f"Alert failed. Status Code: {response.status_code}, Response: {response.text}")
+        return
+    logging.error("Receiver still busy, alert deferred to the next check")
+
 def get_folder_size(folder):
     """Calculate folder size in MB."""
     try:
@@ -81,14 +128,7 @@ def monitor_folder():
                 "status": "firing",
                 "message": f"Temp folder size exceeded {SIZE_LIMIT_MB} MB"
             }
-            try:
-                response = requests.post(FLASK_ALERT_URL, json=alert_data, timeout=5)
-                if response.status_code == 200:
-                    logging.info(f"Alert sent successfully: {response.json()}")
-                else:
-                    logging.error(f"Alert failed. Status Code: {response.status_code}, Response: {response.text}")
-            except requests.exceptions.RequestException as e:
-                logging.error(f"Failed to send alert: {e}")
+            send_alert(alert_data)
 
         time.sleep(20)  # Check every 20 seconds
 
@@ -1,10 +1,11 @@
 import os
-import time
+import asyncio
 import gradio as gr
 import webbrowser
 from dotenv import load_dotenv
-from smart_ops_gen_ai_chatbot import graph_executor  
-from langchain.memory import ConversationBufferMemory
+from smart_ops_gen_ai_chatbot import astream_query, get_llm, warm_up, config
+from session_memory import SessionMemory
+import metrics
 from gen_ai_script_executer_agent import gen_ai_script_executer  
 
 load_dotenv()
@@ -13,22 +14,35 @@ api_key = os.getenv("openai_api_key")
 if not api_key:
     raise ValueError("API key is missing! Set it in the .env file.")
 
-memory = ConversationBufferMemory()
 script_executer = gen_ai_script_executer(api_key)
 
-def ask_chatbot(user_query, history):
+def new_session_memory():
+    """Token-bounded conversation memory for one browser session."""
+    return SessionMemory(
+        get_llm(),
+        max_window_tokens=config.getint("SessionMemory", "WINDOW_TOKENS", fallback=1500),
+        max_summary_tokens=config.getint("SessionMemory", "SUMMARY_TOKENS", fallback=400)
+    )
+
+async def ask_chatbot(user_query, history, session_memory):
+    # Async handler: the graph runs on the event loop, so concurrent sessions don't each hold a worker thread
     print("Chatbot query received:", user_query, flush=True)
+    if session_memory is None:
+        session_memory = new_session_memory()
     history.append((user_query, "**AI is typing...**"))
-    yield "", history  
-    chat_history = memory.load_memory_variables({})
-    full_query = f"Previous Context:\n{chat_history['history']}\n\nNew Query: {user_query}"
-    time.sleep(0.05)
-    response = graph_executor.invoke({"query": full_query})
-    chatbot_response = response["Final_Response"]
-    memory.save_context({"query": user_query}, {"response": chatbot_response})
+    yield "", history, session_memory
+    await asyncio.sleep(0.05)
+    # Retrieval runs on a condensed standalone question; the history only goes to the final prompt
+    standalone_query = await session_memory.acondense_question(user_query)
+    chatbot_response = ""
+    async for token in astream_query(standalone_query, chat_history=session_memory.history_text()):
+        chatbot_response += token
+        history[-1] = (user_query, chatbot_response)
+        yield "", history, session_memory
+    await session_memory.aadd_turn(user_query, chatbot_response)
     print("Chatbot response:", chatbot_response, flush=True)
     history[-1] = (user_query, chatbot_response)
-    yield "", history  
+    yield "", history, session_memory
 
 def run_script(user_query):
     print("Script query received:", user_query, flush=True)
@@ -37,8 +51,7 @@ def run_script(user_query):
     return result
 
 def clear_chat():
-    memory.clear()
-    return []
+    return [], None
 
 with gr.Blocks() as demo:
     gr.Markdown("## GenAI - SmartOps Integrated Platform")
@@ -48,10 +61,11 @@ with gr.Blocks() as demo:
             gr.Markdown("**SmartOps AI – Ready to Assist!**")
             gr.Markdown("Seamlessly interact with AI to get insights, troubleshoot issues, and enhance decision-making—effortlessly and in real-time!")
             chatbot_ui = gr.Chatbot(label="Chat History")
+            session_memory = gr.State(None)  # Per-browser-session conversation memory
             user_input = gr.Textbox(label="Type your message...", placeholder="E.g., How many Windows servers are active?", show_label=False)
             clear_button = gr.Button("Clear Chat")
-            user_input.submit(fn=ask_chatbot, inputs=[user_input, chatbot_ui], outputs=[user_input, chatbot_ui])
-            clear_button.click(fn=clear_chat, inputs=[], outputs=[chatbot_ui])
+            user_input.submit(fn=ask_chatbot, inputs=[user_input, chatbot_ui, session_memory], outputs=[user_input, chatbot_ui, session_memory])
+            clear_button.click(fn=clear_chat, inputs=[], outputs=[chatbot_ui, session_memory])
 
         with gr.TabItem("Agentic Action Hub"):
             gr.Markdown("**AI-Powered Action Hub : Intelligent Automation at Your Fingertips!**")
@@ -63,10 +77,18 @@ with gr.Blocks() as demo:
 if __name__ == "__main__":
     print("Launching Gradio App...")
 
+    # Chroma stores, graph and intent index are built in the background while the UI comes up
+    warm_up()
+    script_executer.warm_up()
+
+    # Gradio has no route for Prometheus, so /metrics is served by a sidecar thread
+    metrics.serve_metrics(config.getint("Metrics", "GRADIO_PORT", fallback=9464))
+
     # Get local URL dynamically
-    _, local_url, _ = demo.launch(inbrowser=not 'JPY_PARENT_PID' in os.environ, show_api=False)
+    open_browser = not 'JPY_PARENT_PID' in os.environ and not os.getenv("SMARTOPS_NO_BROWSER")
+    _, local_url, _ = demo.launch(inbrowser=open_browser, show_api=False)
 
     # Open browser manually in CMD
-    if local_url and not 'JPY_PARENT_PID' in os.environ:
+    if local_url and open_browser:
         webbrowser.open(local_url)
         
\ No newline at end of file
@@ -0,0 +1,266 @@
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Job states: queued -> matching -> waiting (per-script limit reached) -> running -> finished state
+# (queued and the finished states are stored in the AlertQueue; the others only exist in memory)
+
+JOB_STATUS = metrics.REGISTRY.counter("smartops_alert_jobs_total", "Alert jobs by final status", ("status",))
+DEDUPLICATED = metrics.REGISTRY.counter(
+    "smartops_alerts_deduplicated_total", "Alerts answered by an existing job", ("reason",)
+)
+
+# Parts of an alert message that differ between repeats of the same alert
+VOLATILE_PATTERNS = [
+    re.compile(r"\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(z|[+-]\d{2}:?\d{2})?"),  # ISO timestamps
+    re.compile(r"\b\d{1,2}:\d{2}:\d{2}\b"),  # Clock times
+    re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")  # UUIDs
+]
+
+
+def parse_script_limits(text):
+    """'a.py:1, b.py:3' -> {'a.py': 1, 'b.py': 3}"""
+    limits = {}
+    for item in text.split(","):
+        if ":" in item:
+            name, limit = item.rsplit(":", 1)
+            limits[name.strip()] = int(limit)
+    return limits
+
+
+def normalize_message(message):
+    """Lower-case the message, drop timestamps/UUIDs and collapse whitespace and trailing punctuation."""
+    text = str(message).lower()
+    for pattern in VOLATILE_PATTERNS:
+        text = pattern.sub(" ", text)
+    return re.sub(r"\s+", " ", text).strip(" .!?")
+
+
+def alert_fingerprint(message, labels=None):
+    """Identity of an alert: its normalized message plus its labels (order-independent)."""
+    payload = json.dumps([normalize_message(message), labels or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class AlertJobManager:
+    """Runs queued alerts as jobs: intent match, then the script, on a bounded worker pool.
+
+    Alerts are stored in the durable AlertQueue first. A dispatcher thread leases them in
+    batches of up to `batch_size`, holding at most `max_in_flight` at a time, so a burst waits
+    on disk instead of in memory and never reaches the matcher and scripts faster than
+    `workers` at a time. Leases of held jobs are renewed while they wait or run; jobs of a
+    crashed process are redelivered when their lease expires.
+
+    At most `max_per_script` jobs (or the script's entry in `script_limits`) run one script at a
+    time; further jobs for it wait in a per-script line without holding a worker, so a slow
+    playbook cannot starve other scripts. Jobs time out after the executor's [ScriptRuntime]
+    TIMEOUT_SECONDS. Isolated scripts are killed then; a timed out in-process plugin cannot be,
+    so its job keeps the script's slot until the plugin thread really returns, and a hung
+    plugin never has more than its limit of threads running. The newest `max_finished` finished
+    jobs stay queryable.
+
+    Repeats of an alert (same fingerprint) do not start another job: while a job for it is
+    unfinished they share it (singleflight), and for `dedup_window` seconds after it was queued
+    they get its result. A failed or timed out job does not suppress the next alert.
+    `dedup_window=0` leaves only the singleflight.
+    """
+
+    def __init__(self, executor, queue, workers=8, max_per_script=2, script_limits=None, max_finished=10000,
+                 dedup_window=300, batch_size=32, max_in_flight=None, poll_interval=0.5):
+        self.executor = executor
+        self.queue = queue
+        self.max_per_script = max_per_script
+        self.script_limits = script_limits or {}
+        self.max_finished = max_finished
+        self.dedup_window = dedup_window
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight or workers * 4
+        self.poll_interval = poll_interval
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="alert-job")
+        self._held = {}  # job ID -> job dict of the jobs this process has leased
+        self._running = defaultdict(int)  # script name -> running jobs
+        self._waiting = defaultdict(deque)  # script name -> jobs waiting for a slot
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._dispatcher = None
+
+    def _limit(self, script_name):
+        return self.script_limits.get(script_name, self.max_per_script)
+
+    def start(self):
+        """Start the dispatcher thread (picks up alerts left in the queue by a previous run, too)."""
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="alert-dispatcher", daemon=True)
+            self._dispatcher.start()
+        return self._dispatcher
+
+    def submit(self, message, alert=None):
+        """Queue an alert and return its job.
+
+        A repeat of an alert returns the existing job, with `deduplicated` set to the reason
+        ("in_flight" or "window"). Raises alert_queue.QueueFull when the queue is full.
+        """
+        alert = alert or {}
+        row, reason = self.queue.enqueue(
+            message, alert, alert_fingerprint(message, alert.get("labels")), self.dedup_window
+        )
+        if reason:
+            DEDUPLICATED.inc(reason=reason)
+            logger.info(f"🔁 Alert deduplicated ({reason}) onto job {row['id']}: {message}")
+        else:
+            logger.info(f"📥 Alert job {row['id']} queued: {message}")
+            self._wake.set()
+        return dict(self._view(row), deduplicated=reason)
+
+    def _view(self, row):
+        with self._lock:
+            held = self._held.get(row["id"])
+            status = held["status"] if held else row["status"]
+        return {
+            "id": row["id"],
+            "status": status,
+            "alert_message": row["message"],
+            "priority": row["priority"],
+            "script": (held or row)["script"],
+            "result": row["result"],
+            "duplicates": row["duplicates"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": (held or row)["started_at"],
+            "finished_at": row["finished_at"]
+        }
+
+    def get(self, job_id):
+        """The job, or None if unknown (or already purged)."""
+        row = self.queue.get(job_id)
+        return self._view(row) if row else None
+
+    def stats(self):
+        with self._lock:
+            local = {
+                "held": len(self._held),
+                "running": {name: count for name, count in self._running.items() if count},
+                "waiting": {name: len(jobs) for name, jobs in self._waiting.items() if jobs}
+            }
+        return dict(local, queue=self.queue.counts())
+
+    def _dispatch_loop(self):
+        last_renewal = last_purge = time.time()
+        while not self._stopped.is_set():
+            try:
+                with self._lock:
+                    free = self.max_in_flight - len(self._held)
+                batch = self.queue.dequeue_batch(min(free, self.batch_size)) if free > 0 else []
+                for row in batch:
+                    job = dict(row, status="queued", script=None, started_at=None)
+                    with self._lock:
+                        self._held[job["id"]] = job
+                    self._pool.submit(self._match, job)
+
+                now = time.time()
+                if now - last_renewal > self.queue.lease_seconds / 3:
+                    with self._lock:
+                        held_ids = list(self._held)
+                    self.queue.extend_leases(held_ids)
+                    last_renewal = now
+                if now - last_purge > 60:
+                    self.queue.purge(self.max_finished)
+                    last_purge = now
+            except Exception as e:
+                logger.error(f"Alert dispatcher error: {e}")
+                batch = []
+            if len(batch) < self.batch_size:  # Queue drained or in-flight limit reached: wait for work
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _match(self, job):
+        job["status"] = "matching"
+        try:
+            script_name = self.executor.match_script(job["message"])
+        except Exception as e:
+            logger.error(f"Alert job {job['id']}: intent matching failed: {e}")
+            self._finish(job, "failed", f" Error matching script: {e}")
+            return
+        if script_name is None:
+            self._finish(job, "no_match", " No relevant script found for the query.")
+            return
+        job["script"] = script_name
+        with self._lock:
+            if self._running[script_name] >= self._limit(script_name):
+                job["status"] = "waiting"
+                self._waiting[script_name].append(job)
+                return
+            self._running[script_name] += 1
+        self._execute(job)
+
+    def _execute(self, job):
+        script_name = job["script"]
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        metrics.SPAN_SECONDS.observe(job["started_at"] - job["created_at"], span="job_wait", detail=script_name, status="ok")
+        release = self._slot_releaser(script_name)
+        try:
+            self.queue.mark_started(job["id"], script_name)
+            # The slot is freed when the script has stopped, not when run_script returns
+            status, result = self.executor.run_script(script_name, job["message"], on_done=release)
+        except Exception as e:
+            release()
+            status, result = "error", f" Error executing script: {e}"
+        self._finish(job, {"success": "succeeded", "timeout": "timeout"}.get(status, "failed"), result)
+
+    def _slot_releaser(self, script_name):
+        """Callable freeing one running slot of the script (only the first call counts) and starting its next waiting job."""
+        released = []
+
+        def release():
+            with self._lock:
+                if released:
+                    return
+                released.append(True)
+                self._running[script_name] -= 1
+                next_job = self._waiting[script_name].popleft() if self._waiting[script_name] else None
+                if next_job is not None:
+                    self._running[script_name] += 1
+            if next_job is not None:
+                self._pool.submit(self._execute, next_job)
+
+        return release
+
+    def _finish(self, job, status, result):
+        try:
+            self.queue.complete(job["id"], status, result, job["script"])
+        finally:
+            with self._lock:
+                self._held.pop(job["id"], None)
+            self._wake.set()  # A slot is free
+        JOB_STATUS.inc(status=status)
+        logger.info(f"Alert job {job['id']} {status} in {time.time() - job['created_at']:.2f}s")
+
+    def shutdown(self, wait=False):
+        self._stopped.set()
+        self._wake.set()
+        self._pool.shutdown(wait=wait)
+
+
+def job_manager_from_config(config, executor, queue):
+    """AlertJobManager from the [AlertJobs] section."""
+    return AlertJobManager(
+        executor,
+        queue,
+        workers=config.getint("AlertJobs", "WORKERS", fallback=8),
+        max_per_script=config.getint("AlertJobs", "MAX_PER_SCRIPT", fallback=2),
+        script_limits=parse_script_limits(config.get("AlertJobs", "SCRIPT_LIMITS", fallback="")),
+        max_finished=config.getint("AlertJobs", "MAX_FINISHED_JOBS", fallback=10000),
+        dedup_window=config.getfloat("AlertJobs", "DEDUP_WINDOW_SECONDS", fallback=300),
+        batch_size=config.getint("AlertJobs", "DEQUEUE_BATCH", fallback=32),
+        max_in_flight=config.getint("AlertJobs", "MAX_IN_FLIGHT", fallback=0) or None
+    )
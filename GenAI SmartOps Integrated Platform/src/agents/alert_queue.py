@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Row states: queued -> leased (a consumer holds it) -> a finished state
+PENDING_STATES = ("queued", "leased")
+FINISHED_STATES = ("succeeded", "failed", "timeout", "no_match")
+
+# Priority of an alert without an explicit "priority", by its severity (label or field)
+SEVERITY_PRIORITY = {"critical": 30, "high": 20, "error": 20, "warning": 10, "info": 0}
+
+
+class QueueFull(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def alert_priority(alert):
+    """Explicit integer `priority` of the alert payload, else its severity's priority (higher runs first).
+
+    Senders' payloads are not validated beyond `message`: a `labels` value that is not an object
+    is ignored.
+    """
+    priority = alert.get("priority")
+    if isinstance(priority, int) and not isinstance(priority, bool):
+        return priority
+    labels = alert.get("labels")
+    severity = alert.get("severity") or (labels.get("severity") if isinstance(labels, dict) else None) or ""
+    return SEVERITY_PRIORITY.get(str(severity).lower(), 0)
+
+
+class AlertQueue:
+    """Durable alert work queue in SQLite (WAL), shared by alert producers and the job consumer.
+
+    Delivery is at-least-once: dequeue_batch() leases rows for `lease_seconds`; a row whose
+    consumer died before complete() is handed out again once its lease expires, up to
+    `max_attempts` times. Rows are dequeued by priority, then in arrival order. enqueue()
+    refuses new alerts with QueueFull once `max_depth` are unfinished (backpressure), and
+    answers repeats of an unfinished or recently succeeded alert with the existing row; both
+    checks run in one write transaction, so they hold across processes.
+    """
+
+    def __init__(self, db_path, max_depth=10000, lease_seconds=300, max_attempts=3, retry_after=5):
+        self.db_path = db_path
+        self.max_depth = max_depth
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_after = retry_after
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS alerts ("
+                " id TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, message TEXT NOT NULL, alert TEXT NOT NULL,"
+                " priority INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+                " lease_until REAL, script TEXT, result TEXT, duplicates INTEGER NOT NULL DEFAULT 0,"
+                " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_ready ON alerts (status, priority DESC, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_alerts_fingerprint ON alerts (fingerprint, created_at)")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job["alert"] = json.loads(job["alert"])
+        return job
+
+    def enqueue(self, message, alert, fingerprint, dedup_window=0):
+        """Store an alert; returns (row, dedup reason or None).
+
+        reason is "in_flight" (an unfinished row has the same fingerprint) or "window" (one
+        succeeded or found no script less than `dedup_window` seconds after it was queued).
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            latest = conn.execute(
+                "SELECT * FROM alerts WHERE fingerprint = ? ORDER BY created_at DESC LIMIT 1", (fingerprint,)
+            ).fetchone()
+            reason = None
+            if latest is not None and latest["status"] in PENDING_STATES:
+                reason = "in_flight"
+            elif latest is not None and latest["status"] in ("succeeded", "no_match") and now - latest["created_at"] < dedup_window:
+                reason = "window"
+            if reason:
+                conn.execute("UPDATE alerts SET duplicates = duplicates + 1 WHERE id = ?", (latest["id"],))
+                return dict(self._row(latest), duplicates=latest["duplicates"] + 1), reason
+
+            depth = conn.execute(
+                "SELECT COUNT(*) FROM alerts WHERE status IN (?, ?)", PENDING_STATES
+            ).fetchone()[0]
+            if depth >= self.max_depth:
+                raise QueueFull(f"{depth} alerts queued (limit {self.max_depth})", self.retry_after)
+
+            row = {
+                "id": uuid.uuid4().hex, "fingerprint": fingerprint, "message": message,
+                "alert": json.dumps(alert, default=str), "priority": alert_priority(alert),
+                "status": "queued", "created_at": now
+            }
+            conn.execute(
+                "INSERT INTO alerts (id, fingerprint, message, alert, priority, status, created_at)"
+                " VALUES (:id, :fingerprint, :message, :alert, :priority, :status, :created_at)", row
+            )
+            return self._row(conn.execute("SELECT * FROM alerts WHERE id = ?", (row["id"],)).fetchone()), None
+
+    def dequeue_batch(self, limit):
+        """Lease up to `limit` ready rows (queued, or leased with an expired lease), highest priority first.
+
+        Rows that already used up `max_attempts` are marked failed instead of being handed out.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT * FROM alerts WHERE status = 'queued' OR (status = 'leased' AND lease_until < ?)"
+                " ORDER BY priority DESC, created_at LIMIT ?", (now, limit)
+            ).fetchall()
+            batch = []
+            for row in rows:
+                if row["attempts"] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE alerts SET status = 'failed', result = ?, finished_at = ? WHERE id = ?",
+                        (f" Gave up after {row['attempts']} delivery attempts.", now, row["id"])
+                    )
+                    logger.error(f"Alert {row['id']} failed after {row['attempts']} delivery attempts: {row['message']}")
+                    continue
+                conn.execute(
+                    "UPDATE alerts SET status = 'leased', attempts = attempts + 1, lease_until = ? WHERE id = ?",
+                    (now + self.lease_seconds, row["id"])
+                )
+                batch.append(dict(self._row(row), status="leased", attempts=row["attempts"] + 1))
+            return batch
+
+    def extend_leases(self, ids):
+        """Renew the leases of rows still being worked on."""
+        if not ids:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE alerts SET lease_until = ? WHERE id = ? AND status = 'leased'",
+                [(time.time() + self.lease_seconds, row_id) for row_id in ids]
+            )
+
+    def mark_started(self, row_id, script):
+        with self._transaction() as conn:
+            conn.execute("UPDATE alerts SET script = ?, started_at = ? WHERE id = ?", (script, time.time(), row_id))
+
+    def complete(self, row_id, status, result, script=None):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE alerts SET status = ?, result = ?, script = COALESCE(?, script), finished_at = ?,"
+                " lease_until = NULL WHERE id = ?",
+                (status, result, script, time.time(), row_id)
+            )
+
+    def get(self, row_id):
+        with self._lock:
+            return self._row(self._conn.execute("SELECT * FROM alerts WHERE id = ?", (row_id,)).fetchone())
+
+    def counts(self):
+        """Rows per status."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM alerts GROUP BY status").fetchall())
+
+    def purge(self, keep_finished):
+        """Delete all but the newest `keep_finished` finished rows."""
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM alerts WHERE status IN (?, ?, ?, ?) AND id NOT IN ("
+                " SELECT id FROM alerts WHERE status IN (?, ?, ?, ?) ORDER BY finished_at DESC LIMIT ?)",
+                FINISHED_STATES + FINISHED_STATES + (keep_finished,)
+            )
+
+
+def queue_from_config(config, base_dir):
+    """AlertQueue from the [AlertQueue] section (paths relative to the project root)."""
+    return AlertQueue(
+        os.path.join(base_dir, config.get("AlertQueue", "PATH", fallback="data/queue/alerts.sqlite3")),
+        max_depth=config.getint("AlertQueue", "MAX_DEPTH", fallback=10000),
+        lease_seconds=config.getfloat("AlertQueue", "LEASE_SECONDS", fallback=300),
+        max_attempts=config.getint("AlertQueue", "MAX_ATTEMPTS", fallback=3),
+        retry_after=config.getint("AlertQueue", "RETRY_AFTER_SECONDS", fallback=5)
+    )
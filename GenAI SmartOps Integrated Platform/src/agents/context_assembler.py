@@ -0,0 +1,238 @@
+import re
+import json
+import logging
+from token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+
+# Reciprocal rank fusion constant: damps the difference between the top few ranks
+RRF_K = 60
+
+# Shortest shared text accepted as splitter overlap between two chunks of a row
+MIN_STITCH_OVERLAP = 12
+
+STRUCTURED_HEADING = "Structured Query Result (complete table)"
+
+
+def tokenize(text):
+    return set(WORD_PATTERN.findall(text.lower()))
+
+
+def stitch(first, second, max_overlap):
+    """Join two chunks of one row if `second` starts with a tail of `first` (splitter overlap), else None."""
+    for length in range(min(len(first), len(second), max_overlap), MIN_STITCH_OVERLAP - 1, -1):
+        if first.endswith(second[:length]):
+            return first + second[length:]
+    return None
+
+
+def merge_row_chunks(chunks, max_overlap):
+    """Rebuild as much of a row as possible from its retrieved chunks (in rank order)."""
+    pieces = list(dict.fromkeys(chunk.strip() for chunk in chunks if chunk.strip()))
+
+    def join_any(pieces):
+        for i, first in enumerate(pieces):
+            for j, second in enumerate(pieces):
+                if i != j:
+                    joined = first if second in first else stitch(first, second, max_overlap)
+                    if joined is not None:
+                        return [piece for k, piece in enumerate(pieces) if k not in (i, j)] + [joined]
+        return None
+
+    while len(pieces) > 1:
+        joined = join_any(pieces)
+        if joined is None:
+            break  # Remaining chunks are non-adjacent parts of the row
+        pieces = joined
+    return " … ".join(pieces)
+
+
+class ContextAssembler:
+    """Builds the final-prompt context from the retrieved documents within a token budget.
+
+    1. Deduplicate: chunks of the same row are stitched back together (dropping the splitter
+       overlap), repeated text is kept once and rows already returned by the exact lookup are
+       not repeated from vector search.
+    2. Rerank across sources: reciprocal rank fusion of each row's rank in its source's vector
+       search and its rank by query-term overlap, then MMR so near-identical rows (Jaccard over
+       their words) do not crowd out other records.
+    3. Pack rows in MMR order until the next one no longer fits ``max_tokens``, serialized as
+       one plain line per row under a heading per category instead of indented JSON.
+
+    Exact record matches come first; a structured query result is included as compact JSON (cut
+    to the rows that fit) and counts against the budget, as do the headings and separators, so
+    the context never exceeds ``max_tokens``. Each call returns how many tokens were dropped.
+    """
+
+    def __init__(self, max_tokens=3000, mmr_lambda=0.7, max_overlap=200):
+        self.max_tokens = max_tokens
+        self.mmr_lambda = mmr_lambda
+        self.max_overlap = max_overlap
+
+    def _units(self, exact_docs, categories):
+        """Merge documents into one unit per row: dicts with label, text, rank and group order."""
+        units, by_row, seen_text = [], {}, set()
+
+        def add(label, doc, rank, exact):
+            metadata = doc.metadata or {}
+            row_key = (metadata.get("source"), metadata.get("row_id"))
+            if row_key[1] is not None and row_key in by_row:
+                unit = by_row[row_key]
+                if not unit["exact"]:
+                    unit["chunks"].append(doc.page_content)
+                return
+            unit = {"label": label, "chunks": [doc.page_content], "rank": rank, "exact": exact}
+            if row_key[1] is not None:
+                by_row[row_key] = unit
+            units.append(unit)
+
+        for rank, doc in enumerate(exact_docs or []):
+            add("Exact Record Matches", doc, rank, True)
+        for label, docs in categories:
+            for rank, doc in enumerate(docs or []):
+                add(label, doc, rank, False)
+
+        result = []
+        for unit in units:
+            text = merge_row_chunks(unit["chunks"], self.max_overlap)
+            key = re.sub(r"\s+", " ", text).strip().lower()
+            if not key or key in seen_text:
+                continue
+            seen_text.add(key)
+            unit["text"] = text
+            unit["words"] = tokenize(text)
+            unit["tokens"] = count_tokens(text)
+            result.append(unit)
+        return result
+
+    def _relevance(self, units, query):
+        """Reciprocal rank fusion of the vector rank and the lexical (query-term overlap) rank."""
+        query_words = tokenize(query)
+        lexical = sorted(range(len(units)), key=lambda i: -len(units[i]["words"] & query_words))
+        lexical_rank = {index: rank for rank, index in enumerate(lexical)}
+        for index, unit in enumerate(units):
+            unit["score"] = 1 / (RRF_K + unit["rank"]) + 1 / (RRF_K + lexical_rank[index])
+
+    def _pack_mmr(self, units, budget):
+        """Pick units by maximal marginal relevance until the next pick's cost no longer fits `budget` tokens.
+
+        Every remaining unit keeps its highest Jaccard similarity (over words) to the units picked
+        so far, updated only against the latest pick, so a call costs O(n²) set comparisons.
+        """
+        if not units:
+            return []
+        top = max(unit["score"] for unit in units) or 1.0
+        remaining = list(units)
+        redundancy = [0.0] * len(remaining)
+        picked, used = [], 0
+        while remaining:
+            best = max(
+                range(len(remaining)),
+                key=lambda i: self.mmr_lambda * remaining[i]["score"] / top - (1 - self.mmr_lambda) * redundancy[i]
+            )
+            unit = remaining.pop(best)
+            redundancy.pop(best)
+            if used + unit["cost"] > budget:
+                break
+            picked.append(unit)
+            used += unit["cost"]
+            words = unit["words"]
+            redundancy = [
+                max(current, len(words & other["words"]) / (len(words | other["words"]) or 1))
+                for current, other in zip(redundancy, remaining)
+            ]
+        return picked
+
+    @staticmethod
+    def _structured_json(structured):
+        return json.dumps(structured, separators=(",", ":"), default=str)
+
+    @classmethod
+    def _serialize(cls, sections, structured):
+        parts = []
+        for label, texts in sections.items():
+            if texts:
+                parts.append(f"## {label}\n" + "\n".join(f"- {text}" for text in texts))
+        if structured:
+            parts.append(f"## {STRUCTURED_HEADING}\n" + cls._structured_json(structured))
+        return "\n\n".join(parts)
+
+    def _fit_structured(self, structured, budget):
+        """The structured result, with trailing rows dropped (truncated) until it fits `budget`; None if nothing fits."""
+        def cost(result):
+            return count_tokens(f"\n\n## {STRUCTURED_HEADING}\n" + self._structured_json(result))
+
+        if cost(structured) <= budget:
+            return structured
+        rows = list(structured.get("rows") or [])
+        while rows:
+            rows = rows[:len(rows) // 2]
+            trimmed = dict(structured, rows=rows, truncated=True)
+            if cost(trimmed) <= budget:
+                logger.warning(f"Structured result cut to {len(rows)} rows to fit the context budget")
+                return trimmed
+        logger.warning("Structured result does not fit the context budget and is left out")
+        return None
+
+    def assemble(self, query, exact_docs, categories, structured=None):
+        """Return (context text, stats).
+
+        `categories` is a list of (label, documents in vector-rank order).
+        """
+        raw_tokens = sum(count_tokens(doc.page_content) for doc in exact_docs or [])
+        raw_tokens += sum(count_tokens(doc.page_content) for _, docs in categories for doc in docs or [])
+        raw_chunks = len(exact_docs or []) + sum(len(docs or []) for _, docs in categories)
+
+        units = self._units(exact_docs, categories)
+        exact = [unit for unit in units if unit["exact"]]
+        searched = [unit for unit in units if not unit["exact"]]
+        self._relevance(searched, query)
+
+        sections = {"Exact Record Matches": []}
+        sections.update({label: [] for label, _ in categories})
+
+        # Headings, bullets and blank lines between sections count against the budget too
+        budget = self.max_tokens - sum(count_tokens(f"\n\n## {label}\n") for label in sections)
+        if structured:
+            structured = self._fit_structured(structured, budget)
+            if structured:
+                budget -= count_tokens(f"\n\n## {STRUCTURED_HEADING}\n" + self._structured_json(structured))
+        bullet = count_tokens("\n- ")
+        for unit in units:
+            unit["cost"] = unit["tokens"] + bullet
+
+        packed, used = [], 0
+        for unit in exact:
+            if used + unit["cost"] > budget:
+                continue  # A shorter exact match further down may still fit
+            packed.append(unit)
+            used += unit["cost"]
+        packed += self._pack_mmr(searched, budget - used)
+        for unit in packed:
+            sections[unit["label"]].append(unit["text"])
+
+        context = self._serialize(sections, structured)
+        # Token counts are not exactly additive over joined text; drop the last rows if that tips it over
+        while count_tokens(context) > self.max_tokens and packed:
+            unit = packed.pop()
+            sections[unit["label"]].remove(unit["text"])
+            context = self._serialize(sections, structured)
+        used, kept = sum(unit["tokens"] for unit in packed), len(packed)
+
+        stats = {
+            "chunks": raw_chunks,
+            "rows": len(units),
+            "kept_rows": kept,
+            "context_tokens": count_tokens(context),
+            "dropped_duplicate_tokens": max(0, raw_tokens - sum(unit["tokens"] for unit in units)),
+            "dropped_budget_tokens": sum(unit["tokens"] for unit in units) - used
+        }
+        stats["dropped_tokens"] = stats["dropped_duplicate_tokens"] + stats["dropped_budget_tokens"]
+        assert stats["context_tokens"] <= self.max_tokens, stats
+        logger.info(
+            f"📦 Context: {kept}/{len(units)} rows from {raw_chunks} chunks, {stats['context_tokens']} tokens "
+            f"(dropped {stats['dropped_duplicate_tokens']} duplicate + {stats['dropped_budget_tokens']} over budget)"
+        )
+        return context, stats
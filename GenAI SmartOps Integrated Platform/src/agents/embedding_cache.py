@@ -0,0 +1,271 @@
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from token_counter import count_tokens
+import metrics
+
+# Handle the case where __file__ is not defined
+try:
+    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+except NameError:
+    BASE_DIR = os.path.abspath(os.path.join(os.getcwd(), "../.."))  # Fallback for Jupyter
+
+# Shared by the chatbot, the intent matcher and every other process on this host
+EMBEDDING_CACHE_DIR = os.path.join(BASE_DIR, "data", "cache", "embeddings")
+
+# SQLite limits the number of bound parameters per statement
+SQLITE_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-addressed, disk-persisted cache in front of any LangChain embeddings model.
+
+    Vectors are keyed by (model, sha256(text)). The index (slot, last use) lives in SQLite and
+    the vectors in one memory-mapped float32 matrix per model, so lookups never hit the network
+    and the cache survives restarts. The least recently used entries are evicted once
+    ``max_entries`` is reached.
+    """
+
+    def __init__(self, embeddings_model, model_name, cache_dir=EMBEDDING_CACHE_DIR, max_entries=200000):
+        self.embeddings_model = embeddings_model
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        safe_name = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in model_name)
+        self.vectors_path = os.path.join(cache_dir, f"{safe_name}.f32")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(cache_dir, "embedding_cache.sqlite3"),
+            timeout=30,
+            isolation_level=None,  # Transactions are managed explicitly (BEGIN IMMEDIATE)
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, slot INTEGER NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_lru ON embeddings (model, last_used)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS models (model TEXT PRIMARY KEY, dim INTEGER NOT NULL)")
+
+        self._dim = None
+        self._capacity = 0
+        self._matrix = None
+
+    # ---------- Memory-mapped vector matrix ----------
+
+    def _load_dim(self):
+        if self._dim is None:
+            row = self._conn.execute("SELECT dim FROM models WHERE model = ?", (self.model_name,)).fetchone()
+            self._dim = row[0] if row else None
+        return self._dim
+
+    def _remap(self):
+        """(Re)open the matrix at its current on-disk size; other processes may have grown it."""
+        row_bytes = self._dim * 4
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        self._capacity = size // row_bytes
+        self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(self._capacity, self._dim)) \
+            if self._capacity else None
+
+    def _ensure_capacity(self, rows):
+        if rows <= self._capacity:
+            return
+        self._remap()
+        if rows <= self._capacity:
+            return
+
+        new_capacity = min(max(rows, self._capacity * 2, 1024), self.max_entries)
+        if self._matrix is not None:
+            self._matrix.flush()
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self._dim * 4)
+        self._remap()
+
+    def _read_slot(self, slot):
+        if slot >= self._capacity:
+            self._remap()
+        return np.array(self._matrix[slot], dtype=np.float32).tolist()
+
+    # ---------- Cache operations ----------
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys):
+        """Return {key: vector} for every cached key and refresh their last-use time."""
+        if not keys or self._load_dim() is None:
+            return {}
+
+        found = {}
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for start in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[start:start + SQLITE_BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, slot FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                for text_hash, slot in rows:
+                    found[text_hash] = self._read_slot(slot)
+
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = julianday('now') WHERE model = ? AND text_hash = ?",
+                [(self.model_name, key) for key in found]
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return found
+
+    def _store(self, vectors_by_key):
+        """Write new vectors, evicting the least recently used entries when the cache is full."""
+        if not vectors_by_key:
+            return
+
+        items = list(vectors_by_key.items())[-self.max_entries:]
+        if self._load_dim() is None:
+            self._dim = len(items[0][1])
+            self._conn.execute("INSERT OR IGNORE INTO models (model, dim) VALUES (?, ?)", (self.model_name, self._dim))
+
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another thread or process may have cached some of these in the meantime
+            cached = set()
+            for start in range(0, len(items), SQLITE_BATCH_SIZE):
+                batch = [key for key, _ in items[start:start + SQLITE_BATCH_SIZE]]
+                cached.update(row[0] for row in self._conn.execute(
+                    f"SELECT text_hash FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [self.model_name, *batch]
+                ))
+            items = [(key, vector) for key, vector in items if key not in cached]
+
+            count, next_slot = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(slot) + 1, 0) FROM embeddings WHERE model = ?", (self.model_name,)
+            ).fetchone()
+
+            # Step 1: Evict LRU entries and reuse their slots
+            slots = []
+            overflow = count + len(items) - self.max_entries
+            if overflow > 0:
+                evicted = self._conn.execute(
+                    "SELECT text_hash, slot FROM embeddings WHERE model = ? ORDER BY last_used LIMIT ?",
+                    (self.model_name, overflow)
+                ).fetchall()
+                self._conn.executemany(
+                    "DELETE FROM embeddings WHERE model = ? AND text_hash = ?",
+                    [(self.model_name, text_hash) for text_hash, _ in evicted]
+                )
+                slots.extend(slot for _, slot in evicted)
+                self.evictions += len(evicted)
+
+            # Step 2: Append the rest after the highest used slot
+            slots.extend(range(next_slot, next_slot + len(items) - len(slots)))
+
+            if items:
+                self._ensure_capacity(max(slots) + 1)
+                for (_, vector), slot in zip(items, slots):
+                    self._matrix[slot] = np.asarray(vector, dtype=np.float32)
+                self._matrix.flush()
+
+                self._conn.executemany(
+                    "INSERT INTO embeddings (model, text_hash, slot, last_used) VALUES (?, ?, ?, julianday('now'))",
+                    [(self.model_name, key, slot) for (key, _), slot in zip(items, slots)]
+                )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _split_cached(self, texts):
+        """Return (keys, cached vectors, {key: text} still to embed) for a list of texts."""
+        keys = [self._key(text) for text in texts]
+        unique_keys = list(dict.fromkeys(keys))
+
+        pending = {}
+        with self._lock:
+            cached = self._lookup(unique_keys)
+            for key, text in zip(keys, texts):
+                if key not in cached:
+                    pending.setdefault(key, text)
+            self.hits += len(unique_keys) - len(pending)
+        return keys, cached, pending
+
+    def _remember(self, cached, pending, vectors):
+        # Only cache misses reach the wrapped model, so only they are counted (and priced)
+        metrics.record_tokens(self.model_name, "embedding", prompt_tokens=sum(count_tokens(text) for text in pending.values()))
+        new_vectors = dict(zip(pending, vectors))
+        with self._lock:
+            self.misses += len(pending)
+            self._store(new_vectors)
+        cached.update(new_vectors)
+
+    def lookup(self, texts):
+        """Return the cached vector for each text, or None where it still has to be embedded."""
+        keys = [self._key(text) for text in texts]
+        with self._lock:
+            cached = self._lookup(list(dict.fromkeys(keys)))
+            self.hits += len(cached)
+        return [cached.get(key) for key in keys]
+
+    # ---------- LangChain Embeddings interface ----------
+
+    def embed_documents(self, texts):
+        """Embed texts, calling the wrapped model only for texts not cached yet."""
+        keys, cached, pending = self._split_cached(texts)
+        if pending:
+            self._remember(cached, pending, self.embeddings_model.embed_documents(list(pending.values())))
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        """Embed a single query text through the cache."""
+        keys, cached, pending = self._split_cached([text])
+        if pending:
+            self._remember(cached, pending, [self.embeddings_model.embed_query(text)])
+        return cached[keys[0]]
+
+    async def aembed_documents(self, texts):
+        keys, cached, pending = self._split_cached(texts)
+        if pending:
+            self._remember(cached, pending, await self.embeddings_model.aembed_documents(list(pending.values())))
+        return [cached[key] for key in keys]
+
+    async def aembed_query(self, text):
+        keys, cached, pending = self._split_cached([text])
+        if pending:
+            self._remember(cached, pending, [await self.embeddings_model.aembed_query(text)])
+        return cached[keys[0]]
+
+    def stats(self):
+        """Hit/miss counters of this process plus the number of vectors stored for the model."""
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model_name,)
+            ).fetchone()[0]
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "model": self.model_name,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "max_entries": self.max_entries
+        }
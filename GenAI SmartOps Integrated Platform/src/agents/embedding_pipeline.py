@@ -0,0 +1,153 @@
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from token_counter import count_tokens
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# OpenAI accepts at most 2048 inputs per embeddings request
+MAX_BATCH_ITEMS = 2048
+
+
+class RateLimiter:
+    """Token buckets for requests-per-minute and tokens-per-minute, shared by all workers."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_budget = float(requests_per_minute)
+        self._token_budget = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._request_budget = min(self.requests_per_minute, self._request_budget + elapsed * self.requests_per_minute / 60)
+        self._token_budget = min(self.tokens_per_minute, self._token_budget + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens):
+        """Block until one request carrying `tokens` tokens fits in both budgets."""
+        tokens = min(tokens, self.tokens_per_minute)  # An oversized batch waits for a full bucket
+        while True:
+            with self._lock:
+                self._refill()
+                if self._request_budget >= 1 and self._token_budget >= tokens:
+                    self._request_budget -= 1
+                    self._token_budget -= tokens
+                    return
+                wait = max(
+                    (1 - self._request_budget) * 60 / self.requests_per_minute,
+                    (tokens - self._token_budget) * 60 / self.tokens_per_minute
+                )
+            time.sleep(max(wait, 0.01))
+
+
+def _is_rate_limit_error(error):
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError" or "rate limit" in str(error).lower()
+
+
+def _retry_after(error):
+    """Seconds requested by the server's Retry-After header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class BatchEmbeddingPipeline:
+    """Concurrent, rate-limit-aware embedding of documents straight into Chroma.
+
+    Documents are grouped into token-bounded batches, embedded concurrently within the
+    configured RPM/TPM budget (429s are retried with exponential backoff) and written to the
+    store in large upserts as results arrive, so index builds are bound by the API budget
+    rather than by one request at a time.
+    """
+
+    def __init__(self, embedding_model, max_batch_tokens=8000, requests_per_minute=3000,
+                 tokens_per_minute=1000000, max_concurrency=8, max_retries=6, write_batch_size=5000):
+        self.embedding_model = embedding_model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_retries = max_retries
+        self.write_batch_size = write_batch_size
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embedding")
+
+    def _batches(self, texts):
+        """Yield lists of indexes whose texts fit in one request, with their token count."""
+        batch, batch_tokens = [], 0
+        for index, text in enumerate(texts):
+            tokens = count_tokens(text)
+            if batch and (batch_tokens + tokens > self.max_batch_tokens or len(batch) >= MAX_BATCH_ITEMS):
+                yield batch, batch_tokens
+                batch, batch_tokens = [], 0
+            batch.append(index)
+            batch_tokens += tokens
+        if batch:
+            yield batch, batch_tokens
+
+    def _embed_with_retry(self, texts, tokens):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(tokens)
+            try:
+                with metrics.span("embedding", f"batch={len(texts)}"):
+                    return self.embedding_model.embed_documents(texts)
+            except Exception as e:
+                if not _is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                delay = _retry_after(e) or min(60, 2 ** attempt) + random.uniform(0, 1)
+                logger.warning(f"Embedding rate limited (attempt {attempt + 1}/{self.max_retries}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _write(self, store, rows):
+        """Upsert precomputed embeddings into the Chroma collection behind a LangChain store."""
+        for start in range(0, len(rows), self.write_batch_size):
+            batch = rows[start:start + self.write_batch_size]
+            store._collection.upsert(
+                ids=[doc_id for doc_id, _, _ in batch],
+                embeddings=[embedding for _, _, embedding in batch],
+                documents=[doc.page_content for _, doc, _ in batch],
+                metadatas=[doc.metadata for _, doc, _ in batch]
+            )
+
+    def ingest(self, store, documents, ids):
+        """Embed `documents` and write them into `store` under `ids`. Returns the number written."""
+        texts = [doc.page_content for doc in documents]
+        embeddings = [None] * len(texts)
+
+        # Vectors already in the embedding cache cost no request budget
+        if hasattr(self.embedding_model, "lookup"):
+            embeddings = self.embedding_model.lookup(texts)
+        pending = [index for index, embedding in enumerate(embeddings) if embedding is None]
+
+        buffer, written = [], 0
+        for index, embedding in enumerate(embeddings):
+            if embedding is not None:
+                buffer.append((ids[index], documents[index], embedding))
+
+        futures = {}
+        for batch, tokens in self._batches([texts[index] for index in pending]):
+            batch_indexes = [pending[position] for position in batch]
+            future = self.executor.submit(self._embed_with_retry, [texts[index] for index in batch_indexes], tokens)
+            futures[future] = batch_indexes
+
+        for future in as_completed(futures):
+            for index, embedding in zip(futures[future], future.result()):
+                buffer.append((ids[index], documents[index], embedding))
+            if len(buffer) >= self.write_batch_size:
+                self._write(store, buffer)
+                written += len(buffer)
+                buffer = []
+
+        if buffer:
+            self._write(store, buffer)
+            written += len(buffer)
+
+        logger.info(f"Embedded {len(pending)} of {len(texts)} chunks ({len(futures)} requests), wrote {written}")
+        return written
@@ -0,0 +1,148 @@
+import re
+import hashlib
+import logging
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from embedding_cache import CachedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# [Embedding] PROVIDER values:
+#   openai               - OpenAI API (network round trip per uncached text)
+#   sentence_transformer - small local transformer on CPU (needs the sentence-transformers package)
+#   hashing              - hashed word and character n-grams; no model, no network, sub-millisecond
+EMBEDDING_PROVIDERS = ("openai", "sentence_transformer", "hashing")
+
+DEFAULT_PROVIDER = "openai"
+DEFAULT_MODELS = {
+    "openai": "text-embedding-3-small",
+    "sentence_transformer": "sentence-transformers/all-MiniLM-L6-v2"
+}
+DEFAULT_HASH_DIMENSIONS = 1024
+
+# Model ID the existing stores were built with before stores were tagged
+DEFAULT_EMBEDDING_MODEL = DEFAULT_MODELS[DEFAULT_PROVIDER]
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def model_slug(model_id):
+    """File/collection-name safe form of a model ID."""
+    return re.sub(r"[^0-9A-Za-z_-]+", "-", model_id).strip("-")
+
+
+def embedding_model_id(embeddings):
+    """ID of the model behind an embeddings object (stores are tagged with it)."""
+    return getattr(embeddings, "model_name", None) or DEFAULT_EMBEDDING_MODEL
+
+
+class HashingEmbeddings(Embeddings):
+    """Feature-hashed bag of words and character trigrams, L2-normalized.
+
+    Deterministic and dependency-free: identical texts always map to the same vector on every
+    host, so it needs neither a cache nor a model download. Good enough for short intent texts
+    and keyword-heavy records; the semantic recall of a trained model is not the aim.
+    """
+
+    def __init__(self, dimensions=DEFAULT_HASH_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model_name = f"hashing-{dimensions}"
+
+    def _features(self, text):
+        words = WORD_PATTERN.findall(text.lower())
+        features = list(words)
+        features += [f"{first} {second}" for first, second in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return features
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in self._features(text):
+            digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dimensions] += 1.0 if digest >> 63 else -1.0
+        vector = np.sign(vector) * np.log1p(np.abs(vector))  # Sublinear term frequency
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def stats(self):
+        return {"model": self.model_name, "cached": False}
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Local sentence-transformers model on CPU, loaded once on first use."""
+
+    def __init__(self, model_name=DEFAULT_MODELS["sentence_transformer"], batch_size=64):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    try:
+                        from sentence_transformers import SentenceTransformer
+                    except ImportError as e:
+                        raise ImportError(
+                            "Embedding provider 'sentence_transformer' needs the sentence-transformers package"
+                        ) from e
+                    self._model = SentenceTransformer(self.model_name, device="cpu")
+                    logger.info(f"Loaded local embedding model {self.model_name}")
+        return self._model
+
+    def embed_documents(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def create_embeddings(provider=DEFAULT_PROVIDER, model=None, api_key=None, dimensions=DEFAULT_HASH_DIMENSIONS):
+    """Build the embeddings model of a provider.
+
+    OpenAI and sentence-transformer models sit behind the shared disk cache; the hashing
+    model is cheaper than a cache lookup and is returned as is.
+    """
+    if provider == "hashing":
+        return HashingEmbeddings(dimensions)
+    if provider == "sentence_transformer":
+        embeddings = SentenceTransformerEmbeddings(model or DEFAULT_MODELS[provider])
+        return CachedEmbeddings(embeddings, model_name=embeddings.model_name)
+    if provider == "openai":
+        if not api_key:
+            raise ValueError("API key is missing! Set it in the config/.env file.")
+        from langchain_openai import OpenAIEmbeddings
+        model = model or DEFAULT_MODELS[provider]
+        return CachedEmbeddings(OpenAIEmbeddings(model=model, openai_api_key=api_key), model_name=model)
+    raise ValueError(f"Unknown embedding provider '{provider}' (expected one of {', '.join(EMBEDDING_PROVIDERS)})")
+
+
+def embedding_settings(config, prefix=""):
+    """(provider, model, dimensions) from the [Embedding] section.
+
+    With a `prefix` (e.g. "INTENT_"), <prefix>PROVIDER/<prefix>MODEL apply when set and
+    PROVIDER/MODEL otherwise.
+    """
+    if not config.get("Embedding", f"{prefix}PROVIDER", fallback=""):
+        prefix = ""
+    provider = config.get("Embedding", f"{prefix}PROVIDER", fallback="") or DEFAULT_PROVIDER
+    model = config.get("Embedding", f"{prefix}MODEL", fallback="") or None
+    dimensions = config.getint("Embedding", "HASH_DIMENSIONS", fallback=DEFAULT_HASH_DIMENSIONS)
+    return provider.strip().lower(), model, dimensions
+
+
+def embeddings_from_config(config, api_key=None, prefix=""):
+    provider, model, dimensions = embedding_settings(config, prefix)
+    return create_embeddings(provider, model, api_key, dimensions)
@@ -1,15 +1,19 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import logging
 import os
 import sys
-from gen_ai_script_executer_agent import gen_ai_script_executer
+import threading
+from gen_ai_script_executer_agent import gen_ai_script_executer, INTENT_EMBEDDING_PROVIDER, config, BASE_DIR
+from alert_jobs import job_manager_from_config
+from alert_queue import QueueFull, queue_from_config
 from dotenv import load_dotenv
+import metrics
 
 # Load API key from .env
 load_dotenv()
 api_key = os.getenv("openai_api_key")
 
-if not api_key:
+if not api_key and INTENT_EMBEDDING_PROVIDER == "openai":
     raise ValueError("API key is missing! Set it in the .env file.")
 
 app = Flask(__name__)
@@ -28,19 +32,46 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
-# Initialize the script executor agent with the API key
+# Initialize the script executor agent with the API key (its intent matcher is built lazily)
 script_executor = gen_ai_script_executer(api_key=api_key)
 
+# /alert only stores alerts in the durable queue ([AlertQueue]); they run as background jobs
+# on a bounded pool ([AlertJobs])
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """The job manager and its queue, created and started on first use (importing this module touches no files)."""
+    global _job_manager
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                manager = job_manager_from_config(config, script_executor, queue_from_config(config, BASE_DIR))
+                manager.start()
+                _job_manager = manager
+    return _job_manager
+
 @app.route("/", methods=["GET"])
 def home():
     return "Flask Alert Receiver is running!"
 
+@app.route("/health", methods=["GET"])
+def health():
+    """Readiness probe: the server is up; `matcher_ready` tells whether the intent index is warm."""
+    return jsonify({"status": "ok", "matcher_ready": script_executor.is_ready, "jobs": get_job_manager().stats()}), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus scrape target: intent matching and script execution timings."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/alert', methods=['POST'])
 def handle_alert():
-    """Receive alerts and trigger the GenAI Script Executor Agent."""
+    """Receive alerts and queue a GenAI Script Executor job (poll /jobs/<id> for the result)."""
     data = request.get_json(silent=True)
 
-    if not data or "message" not in data:
+    if not isinstance(data, dict) or "message" not in data:
         return jsonify({"error": "Invalid request. Expected JSON with 'message' key"}), 400  
 
     alert_message = data["message"]
@@ -48,27 +79,47 @@ def handle_alert():
     # Log received alert
     logging.info(f"Received Alert: {alert_message}")
 
-    # Trigger the GenAI script execution
     try:
-        execution_result = script_executor.execute_script(alert_message)
-
-        # Log execution details
-        logging.info(f"Execution Output: {execution_result}")
-
-        response = {
-            "status": "success",
-            "alert_message": alert_message,
-            "execution_result": execution_result
-        }
-    except Exception as e:
-        logging.error(f"Error executing script: {e}")
-        response = {
-            "status": "error",
-            "alert_message": alert_message,
-            "error": str(e)
-        }
-
-    return jsonify(response), 200
+        job = get_job_manager().submit(alert_message, data)
+    except QueueFull as e:
+        # Backpressure: producers retry after Retry-After seconds
+        logging.warning(f"Alert rejected: {e}")
+        response = jsonify({"status": "rejected", "alert_message": alert_message, "error": str(e)})
+        return response, 429, {"Retry-After": str(e.retry_after)}
+
+    response = {
+        "status": "accepted",
+        "alert_message": alert_message,
+        "job_id": job["id"],
+        "job_url": f"/jobs/{job['id']}",
+        "deduplicated": job["deduplicated"]  # in_flight / window: a repeat answered by an existing job
+    }
+    return jsonify(response), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Status of an alert job; `execution_result` is set once it has finished."""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+    return jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "alert_message": job["alert_message"],
+        "priority": job["priority"],
+        "script": job["script"],
+        "execution_result": job["result"],
+        "duplicates": job["duplicates"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"]
+    }), 200
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", port=5006, debug=True)
+    # Build the intent index in the background; /health answers immediately
+    script_executor.warm_up()
+    # Open the queue and pick up alerts left from a previous run before the first request
+    get_job_manager()
+    # The reloader would import (and warm up) everything twice
+    app.run(host="0.0.0.0", port=5006, debug=True, use_reloader=False)
@@ -1,21 +1,20 @@
 import os
 import re
+import time
+import threading
 import faiss
 import subprocess
 import numpy as np
 import logging
+import configparser
+import metrics
 from langchain_community.chat_models import ChatOpenAI
 from langchain_community.embeddings import OpenAIEmbeddings
 from langchain_community.vectorstores import FAISS
 from dotenv import load_dotenv
 from script_intent_matcher_agent import ScriptIntentMatcher
-
-# Load API key from .env
-load_dotenv()
-api_key = os.getenv("openai_api_key")
-
-if not api_key:
-    raise ValueError("API key is missing! Set it in the .env file.")
+from embedding_providers import embedding_settings, embeddings_from_config
+from script_plugins import ScriptTimeout, runtime_from_config
 
 try:
     BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
@@ -23,6 +22,18 @@ except NameError:
     # Fallback for interactive environments like Jupyter
     BASE_DIR = os.path.abspath(os.path.join(os.getcwd(), "../.."))
 
+# Intent matching embeds with [Embedding] INTENT_PROVIDER (falls back to PROVIDER)
+config = configparser.ConfigParser()
+config.read(os.path.join(BASE_DIR, "config", "config.ini"))
+INTENT_EMBEDDING_PROVIDER = embedding_settings(config, prefix="INTENT_")[0]
+
+# Load API key from .env (not needed when intents are embedded locally)
+load_dotenv()
+api_key = os.getenv("openai_api_key")
+
+if not api_key and INTENT_EMBEDDING_PROVIDER == "openai":
+    raise ValueError("API key is missing! Set it in the .env file.")
+
 # Update log directory path
 LOG_DIR = os.path.join(BASE_DIR, "logs", "gen_ai_script_executer_agent_scripts")
 LOG_FILE = os.path.join(LOG_DIR, "gen_ai_script_executer_agent.log")
@@ -37,55 +48,134 @@ logging.basicConfig(
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# Persisted intent index ([IntentIndex] PATH, relative to the project root)
+INTENT_INDEX_DIR = os.path.join(BASE_DIR, config.get("IntentIndex", "PATH", fallback="data/intent_index"))
+
+INTENT_MATCHES = metrics.REGISTRY.counter(
+    "smartops_intent_matches_total", "Intent matches by the path that served them", ("path",)
+)
+SCRIPT_RUNS = metrics.REGISTRY.counter(
+    "smartops_script_runs_total", "Script executions by outcome", ("script", "mode", "status")
+)
+
 class gen_ai_script_executer:
     """Agent to execute scripts dynamically based on AI-powered intent matching."""
 
     def __init__(self, api_key):
+        self.api_key = api_key
         self.scripts_path = os.path.join(BASE_DIR, "scripts", "execution_scripts")
-        self.matcher = ScriptIntentMatcher(api_key)  # Use FAISS for script matching
-  
-    def execute_script(self, query):
-        """Determines the best script based on query intent using FAISS."""
-        script_name = self.matcher.find_best_script(query)
+        # Scripts with run(query) are imported once and called in a warm pool ([ScriptRuntime])
+        self.runtime = runtime_from_config(config, self.scripts_path)
+        # The FAISS intent index needs embedding calls, so it is built on first use (or by warm_up())
+        self._matcher = None
+        self._matcher_lock = threading.Lock()
+
+    @property
+    def matcher(self):
+        """ScriptIntentMatcher, created once on first access."""
+        if self._matcher is None:
+            with self._matcher_lock:
+                if self._matcher is None:
+                    start = time.perf_counter()
+                    self._matcher = ScriptIntentMatcher(  # Use FAISS for script matching
+                        self.api_key, embeddings_from_config(config, self.api_key, prefix="INTENT_"),
+                        index_dir=INTENT_INDEX_DIR
+                    )
+                    logging.info(f" Script intent matcher ready in {time.perf_counter() - start:.2f}s")
+        return self._matcher
+
+    @property
+    def is_ready(self):
+        return self._matcher is not None
+
+    def _warm_up(self):
+        self.runtime.preload()
+        return self.matcher
+
+    def warm_up(self, background=True):
+        """Import the script plugins and build the intent matcher now, in a daemon thread by default."""
+        if not background:
+            return self._warm_up()
+        thread = threading.Thread(target=self._warm_up, name="script-matcher-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def match_script(self, query, query_embedding=None):
+        """Best script for the query via the keyword prefilter or FAISS (reusing `query_embedding` if given), or None."""
+        matcher = self.matcher
+        with metrics.span("intent_match"):
+            matched = matcher.match(query, query_embedding=query_embedding)
+        script_name = matched["script"]
+        INTENT_MATCHES.inc(path=matched["path"])
         logging.info(f" Query: {query}")
-        logging.info(f" Relevant script found in script_intent_matcher_agent.py : {script_name}")
+        logging.info(
+            f" Relevant script found in script_intent_matcher_agent.py : {script_name} "
+            f"(via {matched['path']}, score {matched['score']})"
+        )
+        if matched["path"] != "keyword" and hasattr(matcher.embeddings_model, "stats"):
+            logging.info(f" Embedding cache: {matcher.embeddings_model.stats()}")
         print("Script Name - ", script_name)
 
-        if script_name == "No relevant script found.":
+        if script_name is None:
             logging.warning(" No relevant script found for the query.")
-            return " No relevant script found for the query."
+            return None
+        return script_name
 
+    def execute_script(self, query, query_embedding=None):
+        """Determines the best script based on query intent and runs it."""
+        script_name = self.match_script(query, query_embedding=query_embedding)
+        if script_name is None:
+            return " No relevant script found for the query."
         return self.run_script_with_query_params(script_name, query)
 
     def run_script_with_query_params(self, script_name, query):
-        """Execute the Ansible script with query parameters."""
-        script_path = os.path.join(self.scripts_path, script_name)
+        """Execute the script with query parameters (in-process plugin, or a subprocess if isolated)."""
+        return self.run_script(script_name, query)[1]
+
+    def run_script(self, script_name, query, on_done=None):
+        """Run a matched script; returns (status, output text).
+
+        status: success | failed (non-zero exit) | timeout | error | not_found
+        `on_done()` is called once the script has stopped (see ScriptPluginRuntime.run).
+        """
+        script_path = self.runtime.script_path(script_name)
         logging.info(f" Execution Script_path: {script_path}")
 
         # Check if the script exists
         if not os.path.exists(script_path):
             logging.error(f" Error: Script '{script_name}' not found at {script_path}")
-            return f" Error: Script '{script_name}' not found."
-
-        try:
-            logging.info(f" Executing Script: {script_path}")       
-            result = subprocess.run(
-                ["python", script_path, query],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-
-            logging.info(f" Script Execution Output:\n{result.stdout}")
-            return result.stdout.strip() if result.stdout else " No output generated."
-
-        except subprocess.CalledProcessError as e:
-            logging.error(f" Subprocess Error: {e}\nstderr Output: {e.stderr}")
-            return f" Error executing script: {e}"
-
-        except Exception as e:
-            logging.error(f" Unexpected Error: {str(e)}")
-            return f" Error executing script: {str(e)}"
+            if on_done is not None:
+                on_done()
+            return "not_found", f" Error: Script '{script_name}' not found."
+
+        mode = "subprocess"
+        handed_off = False
+        with metrics.span("script_execution", script_name):
+            try:
+                mode = self.runtime.mode(script_name)
+                logging.info(f" Executing Script ({mode}): {script_path}")
+                handed_off = True  # From here on the runtime calls on_done
+                output = self.runtime.run(script_name, query, on_done)
+
+                logging.info(f" Script Execution Output:\n{output}")
+                status, result = "success", output if output else " No output generated."
+
+            except subprocess.CalledProcessError as e:
+                logging.error(f" Subprocess Error: {e}\nstderr Output: {e.stderr}")
+                status, result = "failed", f" Error executing script: {e}"
+
+            except ScriptTimeout as e:
+                logging.error(f" Timeout: {e}")
+                status, result = "timeout", f" Error executing script: {e}"
+
+            except Exception as e:
+                logging.error(f" Unexpected Error: {str(e)}")
+                status, result = "error", f" Error executing script: {str(e)}"
+
+        if on_done is not None and not handed_off:
+            on_done()
+        SCRIPT_RUNS.inc(script=script_name, mode=mode, status=status)
+        return status, result
 
 # ---  MAIN FUNCTION TO TEST THE SCRIPT EXECUTOR ---
 def main():
@@ -24,7 +24,16 @@ print("Folder Monitoring Start...")
 print("Starting Flask Server...")
 flask_process = start_process(FLASK_SERVER_SCRIPT)
 
-time.sleep(10)
+# Wait for the readiness probe instead of a fixed sleep
+start = time.time()
+while time.time() - start < 60:
+    try:
+        if requests.get(FLASK_SERVER_URL, timeout=1).status_code == 200:
+            break
+    except requests.exceptions.RequestException:
+        pass
+    time.sleep(0.2)
+print(f"Flask Server answered /health after {time.time() - start:.1f}s")
 
 url = "http://127.0.0.1:5006/alert"
 headers = {"Content-Type": "application/json"}
@@ -35,9 +44,11 @@ response = requests.post(url, headers=headers, data=json.dumps(data))
 #print("Response Code:", response.status_code)
 #print("Response Body:", response.json())
 
-# Validate Flask server startup
-if response.status_code==200:
+# Validate Flask server startup (alerts are accepted as background jobs)
+if response.status_code in (200, 202):
     print("Flask Server is running at http://127.0.0.1:5006/ and is ready to receive requests!")
+    job_url = "http://127.0.0.1:5006" + response.json()["job_url"]
+    print(f"Test alert queued, status at {job_url}")
 else:
     print("Flask Server did not start properly. Check logs for issues.")
 
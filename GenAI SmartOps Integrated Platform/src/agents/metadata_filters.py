@@ -0,0 +1,216 @@
+import re
+import logging
+import threading
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Column types kept as typed metadata:
+#   enum   - categorical text, stored lower-cased; matched when a known value appears in the query
+#   label  - like enum, but its values are common words ("Application", "Network"), so a filter is
+#            only applied when the column name is mentioned too ("application category")
+#   date   - stored as an int YYYYMMDD so Chroma can compare it
+#   number - stored as a float
+#   bool   - stored as a bool; set when every word of the column name appears in the query
+METADATA_TYPES = ("enum", "label", "date", "number", "bool")
+
+# Words of column names that say nothing about the column ("Incident Impact" -> "impact")
+HINT_STOPWORDS = {"by", "of", "is", "the", "incident", "device", "db"}
+
+# Query phrasing for numeric and date comparisons
+NUMBER_OPERATORS = {
+    ">=": "$gte", "<=": "$lte", ">": "$gt", "<": "$lt", "=": "$eq",
+    "over": "$gt", "above": "$gt", "more than": "$gt", "greater than": "$gt",
+    "under": "$lt", "below": "$lt", "less than": "$lt"
+}
+DATE_OPERATORS = {"before": "$lt", "until": "$lte", "after": "$gt", "since": "$gte", "from": "$gte", "on": "$eq"}
+DATE_PATTERN = re.compile(r"\b(before|until|after|since|from|on)\s+(\d{4}-\d{2}-\d{2})\b", re.IGNORECASE)
+
+
+def field_key(column):
+    """Metadata key of a column: "Incident Support Group" -> "incident_support_group"."""
+    return re.sub(r"[^0-9a-zA-Z]+", "_", column).strip("_").lower()
+
+
+def hint_words(column):
+    """Words that refer to a column in a question ("TypeOfChange" -> {"type", "change"})."""
+    words = re.findall(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])", column)
+    return {word.lower() for word in words} - HINT_STOPWORDS
+
+
+def typed_values(series, column_type):
+    """Convert a column to metadata values (None where missing or not convertible)."""
+    if column_type in ("enum", "label"):
+        values = [str(value).strip().lower() if pd.notna(value) else "" for value in series]
+        return [value or None for value in values]
+    if column_type == "date":
+        dates = pd.to_datetime(series, errors="coerce")
+        return [int(date.strftime("%Y%m%d")) if pd.notna(date) else None for date in dates]
+    if column_type == "number":
+        numbers = pd.to_numeric(series, errors="coerce")
+        return [float(number) if pd.notna(number) else None for number in numbers]
+    if column_type == "bool":
+        return [
+            None if pd.isna(value) else (value if isinstance(value, bool) else str(value).strip().lower() in ("true", "yes", "1"))
+            for value in series
+        ]
+    raise ValueError(f"Unknown metadata type: {column_type}")
+
+
+def row_metadata(df, columns):
+    """Typed metadata of every row of `df`. columns: {column: type}; absent columns are skipped."""
+    fields = {
+        field_key(column): typed_values(df[column], column_type)
+        for column, column_type in columns.items() if column in df.columns
+    }
+    rows = [{} for _ in range(len(df))]
+    for key, values in fields.items():
+        for metadata, value in zip(rows, values):
+            if value is not None:
+                metadata[key] = value
+    return rows
+
+
+def combine_where(clauses):
+    """AND a list of Chroma where clauses (None when empty)."""
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class MetadataFilterExtractor:
+    """Turns constraints stated in a question into Chroma ``where`` filters per source.
+
+    The enum vocabulary of each source is learned at ingestion time, so "high impact incidents
+    in production" becomes {"incident_impact": "high"} for Incidents and {"environment":
+    "production"} for CI_Data without any LLM call. Values that belong to more than one column
+    of a source are only used when the query also names the column.
+    """
+
+    def __init__(self, columns_by_source):
+        self.columns_by_source = columns_by_source
+        self._vocabulary = {}  # source -> (compiled value pattern, {value: [column]})
+        self._lock = threading.Lock()
+
+    def _set_vocabulary(self, source, values_by_column):
+        value_columns = {}
+        for column, values in values_by_column.items():
+            for value in values:
+                # Single characters and bare numbers are too ambiguous to act on
+                if len(value) > 1 and not value.replace(".", "").isdigit():
+                    value_columns.setdefault(value, []).append(column)
+
+        pattern = None
+        if value_columns:
+            alternatives = sorted((re.escape(value) for value in value_columns), key=len, reverse=True)
+            # Plurals match too: "firewalls" -> "firewall"
+            pattern = re.compile(r"(?<![\w-])(" + "|".join(alternatives) + r")(?:e?s)?(?![\w-])", re.IGNORECASE)
+        with self._lock:
+            self._vocabulary[source] = (pattern, value_columns)
+
+    def update_source(self, source, df):
+        """Learn the enum values of a source from its sheet."""
+        enum_columns = [
+            column for column, column_type in self.columns_by_source.get(source, {}).items()
+            if column_type in ("enum", "label") and column in df.columns
+        ]
+        self._set_vocabulary(source, {
+            column: {value for value in typed_values(df[column], "enum") if value} for column in enum_columns
+        })
+
+    def update_source_from_metadatas(self, source, metadatas):
+        """Learn the enum values of a source from stored document metadata (export file missing)."""
+        values_by_column = {}
+        for column, column_type in self.columns_by_source.get(source, {}).items():
+            if column_type in ("enum", "label"):
+                key = field_key(column)
+                values_by_column[column] = {metadata[key] for metadata in metadatas if metadata and key in metadata}
+        self._set_vocabulary(source, values_by_column)
+
+    def extract(self, query, source):
+        """Return the Chroma where filter implied by the query for one source, or None."""
+        columns = self.columns_by_source.get(source, {})
+        if not columns:
+            return None
+
+        words = set(re.findall(r"[a-z]+", query.lower()))
+        # Crude stemming so "changes", "started" and "ending" name "Change", "StartDate" and "EndDate"
+        words |= {word[:-suffix_length] for word in words for suffix, suffix_length in (("s", 1), ("ed", 2), ("ing", 3))
+                  if word.endswith(suffix) and len(word) > suffix_length + 2}
+        hinted = {column for column in columns if hint_words(column) & words}
+        clauses = self._enum_clauses(query, source, columns, hinted)
+        clauses += self._number_clauses(query, columns)
+        clauses += self._date_clauses(query, columns, words)
+        clauses += self._bool_clauses(query, columns, words)
+        return combine_where(clauses)
+
+    def _enum_clauses(self, query, source, columns, hinted):
+        with self._lock:
+            pattern, value_columns = self._vocabulary.get(source, (None, {}))
+        if pattern is None:
+            return []
+
+        selected = {}  # column -> [values]
+        for match in pattern.finditer(query):
+            value = match.group(1).lower()
+            candidates = value_columns.get(value, [])
+            if len(candidates) > 1:
+                candidates = [column for column in candidates if column in hinted]
+            if len(candidates) != 1:
+                continue  # Ambiguous between columns and none (or several) named in the query
+            column = candidates[0]
+            if columns[column] == "label" and column not in hinted:
+                continue
+            selected.setdefault(column, [])
+            if value not in selected[column]:
+                selected[column].append(value)
+
+        return [
+            {field_key(column): {"$eq": values[0]}} if len(values) == 1 else {field_key(column): {"$in": values}}
+            for column, values in selected.items()
+        ]
+
+    @staticmethod
+    def _number_clauses(query, columns):
+        clauses = []
+        operators = "|".join(sorted((re.escape(op) for op in NUMBER_OPERATORS), key=len, reverse=True))
+        for column, column_type in columns.items():
+            if column_type != "number":
+                continue
+            names = "|".join(re.escape(word) for word in sorted(hint_words(column)) or [column.lower()])
+            match = re.search(
+                rf"\b(?:{names})\b\s*(?:is\s+)?({operators})?\s*(-?\d+(?:\.\d+)?)\b", query, re.IGNORECASE
+            )
+            if match:
+                operator = NUMBER_OPERATORS[(match.group(1) or "=").lower()]
+                clauses.append({field_key(column): {operator: float(match.group(2))}})
+        return clauses
+
+    @staticmethod
+    def _date_clauses(query, columns, words):
+        date_columns = [column for column, column_type in columns.items() if column_type == "date"]
+        if not date_columns:
+            return []
+        # The column named in the query ("end date after ..."), else the source's first date column
+        column = next((column for column in date_columns if (hint_words(column) - {"date"}) & words), date_columns[0])
+
+        clauses = []
+        for word, date in DATE_PATTERN.findall(query):
+            try:
+                value = int(pd.Timestamp(date).strftime("%Y%m%d"))
+            except ValueError:
+                continue
+            clauses.append({field_key(column): {DATE_OPERATORS[word.lower()]: value}})
+        return clauses
+
+    @staticmethod
+    def _bool_clauses(query, columns, words):
+        clauses = []
+        for column, column_type in columns.items():
+            hints = hint_words(column)
+            if column_type != "bool" or not hints or not hints <= words:
+                continue
+            negated = re.search(rf"\b(?:non|not)[\s-]+{re.escape(sorted(hints, key=len)[-1])}", query, re.IGNORECASE)
+            clauses.append({field_key(column): {"$eq": not negated}})
+        return clauses
@@ -0,0 +1,77 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Search node -> record-ID patterns (strong signal) and topic keywords (weak signal)
+SOURCE_ROUTES = {
+    "CI_Search": {
+        "patterns": [r"\b[A-Z]{4}\d{2}[A-Z]\d{2}\b"],  # CI device names such as WLJP09W11
+        "keywords": ["device", "devices", "server", "servers", "host", "hostname", "ci", "cmdb",
+                     "configuration item", "windows", "rhel", "linux", "os", "application", "supported by"]
+    },
+    "Change_Search": {
+        "patterns": [r"\bCHG-?\d+\b"],
+        "keywords": ["change", "changes", "chg", "change request", "requester", "risk", "emergency",
+                     "rollback", "implementation", "cab"]
+    },
+    "Network_Search": {
+        "patterns": [r"\bSN-\d+\b", r"\b\d{1,3}(?:\.\d{1,3}){3}\b", r"\b(?:[0-9A-F]{2}:){5}[0-9A-F]{2}\b"],
+        "keywords": ["network", "router", "routers", "switch", "switches", "firewall", "vlan", "ip", "mac",
+                     "subnet", "gateway", "port", "access point", "bandwidth", "firmware", "wan", "lan"]
+    },
+    "DB_Search": {
+        "patterns": [r"\bDB\d+\b"],
+        "keywords": ["database", "databases", "db", "sql", "ms-sql", "mssql", "oracle", "postgres",
+                     "postgresql", "mysql", "db2", "schema", "tablespace"]
+    },
+    "Incident_Search": {
+        "patterns": [r"\bINC\d+\b"],
+        "keywords": ["incident", "incidents", "inc", "issue", "issues", "outage", "resolution", "resolve",
+                     "error", "failure", "failing", "problem", "ticket", "priority", "impact", "assignee"]
+    }
+}
+
+
+class QueryRouter:
+    """Selects the search nodes relevant to a query with cheap ID-pattern and keyword rules.
+
+    A record-ID match counts as a confident route; each topic keyword adds half of that.
+    Nodes scoring at least ``min_confidence`` are searched. When no node qualifies the
+    query is ambiguous and the router falls back to the full fan-out.
+    """
+
+    def __init__(self, routes=SOURCE_ROUTES, min_confidence=0.5):
+        self.min_confidence = min_confidence
+        self.all_nodes = list(routes)
+        self._patterns = {
+            node: [re.compile(pattern, re.IGNORECASE) for pattern in route["patterns"]]
+            for node, route in routes.items()
+        }
+        self._keywords = {
+            node: re.compile(r"\b(?:" + "|".join(re.escape(word) for word in route["keywords"]) + r")\b", re.IGNORECASE)
+            for node, route in routes.items()
+        }
+
+    def score(self, query):
+        """Return {node: confidence in [0, 1]} for a query."""
+        scores = {}
+        for node in self.all_nodes:
+            if any(pattern.search(query) for pattern in self._patterns[node]):
+                scores[node] = 1.0
+                continue
+            keyword_hits = len(set(match.lower() for match in self._keywords[node].findall(query)))
+            scores[node] = min(1.0, 0.5 * keyword_hits)
+        return scores
+
+    def route(self, query):
+        """Return the list of search nodes to run for a query."""
+        scores = self.score(query)
+        selected = [node for node, score in scores.items() if score >= self.min_confidence]
+
+        if not selected:
+            logger.info("🔀 Router: low confidence, fanning out to all sources")
+            return list(self.all_nodes)
+
+        logger.info(f"🔀 Router: {selected} (scores: {scores})")
+        return selected
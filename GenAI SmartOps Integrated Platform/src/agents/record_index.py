@@ -0,0 +1,126 @@
+import re
+import sqlite3
+import logging
+import threading
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Candidate tokens in a query; trailing punctuation ("WLJP09W11?") is not part of a key
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9](?:[\w\-.:/#]*[A-Za-z0-9])?")
+
+# Tokens that look like record identifiers: letters mixed with digits (CHG-085, PHSAO23),
+# dotted IPs, MAC addresses, or long pure numbers (DB ID 5632, Device ID 321632)
+IDENTIFIER_PATTERN = re.compile(
+    r"^(?:(?=.*[A-Za-z])(?=.*\d)[\w\-.:/#]+|\d{1,3}(?:\.\d{1,3}){3}|\d{4,})$"
+)
+
+
+def normalize_key(value):
+    return str(value).strip().upper()
+
+
+class RecordKeyIndex:
+    """Exact-match inverted index from primary-key and name columns to full row documents.
+
+    Built at ingestion time and persisted to SQLite, so queries naming a specific record
+    (CHG-085, WLJP09W11, PHSAO23, ...) resolve with a dict lookup instead of an ANN search.
+    """
+
+    def __init__(self, db_path):
+        self._index = {}  # normalized key -> {(source, row_id): row_text}
+        self._sources = {}  # source -> set of normalized keys it contributed
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " source TEXT NOT NULL, row_id TEXT NOT NULL, key TEXT NOT NULL, row_text TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_records_source ON records (source)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS signatures (source TEXT PRIMARY KEY, signature TEXT NOT NULL)")
+
+    def _replace_in_memory(self, source, entries):
+        """entries: iterable of (row_id, key, row_text)."""
+        with self._lock:
+            for key in self._sources.pop(source, set()):
+                rows = self._index.get(key, {})
+                for row_key in [row_key for row_key in rows if row_key[0] == source]:
+                    del rows[row_key]
+                if not rows:
+                    self._index.pop(key, None)
+
+            keys = set()
+            for row_id, key, row_text in entries:
+                self._index.setdefault(key, {})[(source, row_id)] = row_text
+                keys.add(key)
+            self._sources[source] = keys
+
+    def update_source(self, source, rows, signature):
+        """Index a source. rows: iterable of (row_id, [key values], row_text).
+
+        SQLite is only rewritten when `signature` (e.g. a digest of the row hashes) changed.
+        """
+        entries = [
+            (row_id, normalize_key(key), row_text)
+            for row_id, keys, row_text in rows
+            for key in dict.fromkeys(keys) if str(key).strip()
+        ]
+        self._replace_in_memory(source, entries)
+
+        with self._lock, self._conn:
+            stored = self._conn.execute("SELECT signature FROM signatures WHERE source = ?", (source,)).fetchone()
+            if stored and stored[0] == signature:
+                return
+            self._conn.execute("DELETE FROM records WHERE source = ?", (source,))
+            self._conn.executemany(
+                "INSERT INTO records (source, row_id, key, row_text) VALUES (?, ?, ?, ?)",
+                [(source, row_id, key, row_text) for row_id, key, row_text in entries]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO signatures (source, signature) VALUES (?, ?)", (source, signature)
+            )
+        logger.info(f"Record index updated for {source}: {len(entries)} keys")
+
+    def load_source(self, source):
+        """Load a source's last persisted keys (used when its export file is missing)."""
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT row_id, key, row_text FROM records WHERE source = ?", (source,)
+            ).fetchall()
+        self._replace_in_memory(source, entries)
+
+    def lookup(self, key):
+        """Return the full row documents whose key equals `key` (case-insensitive)."""
+        with self._lock:
+            rows = dict(self._index.get(normalize_key(key), {}))
+        return [
+            Document(page_content=row_text, metadata={"source": source, "row_id": row_id, "match": "exact"})
+            for (source, row_id), row_text in rows.items()
+        ]
+
+    def resolve(self, query):
+        """Find record identifiers in a query.
+
+        Returns (documents, identifiers, unresolved): the exact-match row documents, the
+        identifier-like tokens found and those that matched no key.
+        """
+        documents, seen_rows = [], set()
+        identifiers, unresolved = [], []
+
+        for token in dict.fromkeys(TOKEN_PATTERN.findall(query)):
+            matches = self.lookup(token)
+            is_identifier = bool(IDENTIFIER_PATTERN.match(token))
+            if is_identifier:
+                identifiers.append(token)
+                if not matches:
+                    unresolved.append(token)
+
+            for doc in matches:
+                row_key = (doc.metadata["source"], doc.metadata["row_id"])
+                if row_key not in seen_rows:
+                    seen_rows.add(row_key)
+                    documents.append(doc)
+
+        return documents, identifiers, unresolved
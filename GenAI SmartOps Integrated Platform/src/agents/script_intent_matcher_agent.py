@@ -1,90 +1,151 @@
+import os
+import re
+import json
+import hashlib
+import logging
 import faiss
 import numpy as np
-from langchain_community.chat_models import ChatOpenAI
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.docstore.in_memory import InMemoryDocstore
-from langchain_core.documents import Document
+from embedding_cache import CachedEmbeddings
+from embedding_providers import embedding_model_id, model_slug
+
+logger = logging.getLogger(__name__)
+
+# ✅ Script intents and their corresponding execution scripts (the embedded intent table)
+SCRIPT_INTENTS = {
+    "check cpu usage": "get_cpu_usage.py",
+    "monitor memory usage": "get_memory_usage.py",
+    "fetch server statistics perfromance telemetry": "grafana_server_statistics.py",
+    "fix slow down unresponsive server": "ansible_playbook_execution.py",
+    "troubleshoot network application issue": "ansible_playbook_execution.py",
+    "delete temporary files from temp folder when temp folder size exceed 5MB":"e_delete_temp_files.py"
+}
+
+# Keyword prefilter: a query whose words point at exactly one script is resolved without an
+# embedding call; queries matching several scripts (or none) go to the vector search
+KEYWORD_RULES = {
+    "get_cpu_usage.py": r"\bcpu\b|\bprocessor\b",
+    "get_memory_usage.py": r"\bmemory\b|\bram\b",
+    "grafana_server_statistics.py": r"\bgrafana\b|\bstatistics\b|\btelemetry\b",
+    "ansible_playbook_execution.py": (
+        r"\bunresponsive\b|\bnot responding\b|\bdown\b|\bcrashed\b|\bunavailable\b|\bfrozen\b"
+        r"|\bhanging\b|\bslow\b|\blagging\b|\btroubleshoot\b"
+    ),
+    "e_delete_temp_files.py": r"\btemp(?:orary)? (?:folder|files?|directory)\b"
+}
+
+# Bump when the index layout changes, so older files are rebuilt
+INDEX_FORMAT = 1
+
+
+def intent_table_version(intents):
+    """Hash of the intent table; a persisted index is only used for the table it was built from."""
+    payload = json.dumps({"format": INDEX_FORMAT, "intents": sorted(intents.items())})
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
 
 
 class ScriptIntentMatcher:
-    """Matches user queries to relevant scripts using FAISS and OpenAI embeddings."""
-
-    def __init__(self, api_key):
-        self.embeddings_model = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=api_key)
-
-        # ✅ Define script intents and their corresponding execution scripts
-        self.script_intents = {
-            "check cpu usage": "get_cpu_usage.py",
-            "monitor memory usage": "get_memory_usage.py",
-            "fetch server statistics perfromance telemetry": "grafana_server_statistics.py",
-            "fix slow down unresponsive server": "ansible_playbook_execution.py",
-            "troubleshoot network application issue": "ansible_playbook_execution.py",
-            "delete temporary files from temp folder when temp folder size exceed 5MB":"e_delete_temp_files.py"
-        }
-
-        # ✅ Initialize FAISS Vector Store
-        self.vector_store = self.build_vector_store()
-
-    # def build_vector_store(self):
-    #     """Builds a FAISS vector store with script intents and their embeddings."""
-    #     texts = list(self.script_intents.keys())  # Intent text (searchable)
-    #     embeddings = self.embeddings_model.embed_documents(texts)  # Convert text to embeddings
-
-    #     # ✅ Use LangChain’s FAISS utility to create the vector store
-    #     store = FAISS.from_texts(texts, self.embeddings_model)
-
-    #     return store
-
-
-    def build_vector_store(self):
-        """Builds a FAISS vector store with script intent embeddings."""
-    
-        # ✅ Extract intent texts
-        texts = list(self.script_intents.keys())
-    
-        # ✅ Generate embeddings
-        embeddings = self.embeddings_model.embed_documents(texts)
-    
-        # 🔹 Convert embeddings list to NumPy array (Required by FAISS)
-        embeddings_np = np.array(embeddings, dtype=np.float32)  # 🔥 FIX: Convert to NumPy array
-    
-        # ✅ Create FAISS index with L2 distance metric
-        index = faiss.IndexFlatL2(embeddings_np.shape[1])
-        index.add(embeddings_np)  # ✅ FIX: Pass NumPy array, not list
-    
-        # ✅ Create an in-memory docstore
-        docstore = InMemoryDocstore({i: Document(page_content=texts[i]) for i in range(len(texts))})
-    
-        # ✅ Create a simple mapping from FAISS index to docstore
-        index_to_docstore_id = {i: i for i in range(len(texts))}
-    
-        # ✅ Pass **Embeddings Object** (instead of function)
-        store = FAISS(
-            index=index,
-            docstore=docstore,
-            index_to_docstore_id=index_to_docstore_id,
-            embedding_function=self.embeddings_model  # ✅ FIXED: Pass embeddings object
+    """Matches user queries to relevant scripts using FAISS and OpenAI (or local) embeddings.
+
+    Intent vectors are L2-normalized and searched by inner product (cosine similarity). With an
+    `index_dir`, the index is stored there per embedding model together with the version of the
+    intent table, and later matchers load it instead of embedding the intents again. match()
+    tells which path answered: "keyword" (prefilter, no embedding), "embedding" or
+    "precomputed_embedding" (the caller's query vector).
+    """
+
+    def __init__(self, api_key, embeddings_model=None, index_dir=None, rebuild=False):
+        # Shared on-disk cache: intents and repeated alert texts are only embedded once
+        self.embeddings_model = embeddings_model or CachedEmbeddings(
+            OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=api_key),
+            model_name="text-embedding-3-small"
         )
-    
-        return store
-
-
-
-
+        self.embedding_model = embedding_model_id(self.embeddings_model)
+        self.script_intents = dict(SCRIPT_INTENTS)
+        self.version = intent_table_version(self.script_intents)
+        self.keyword_rules = {script: re.compile(pattern, re.IGNORECASE) for script, pattern in KEYWORD_RULES.items()}
+        self.index_dir = index_dir
+
+        # ✅ Load the persisted FAISS index (or build and persist it)
+        self.intent_texts, self.index = (None if rebuild else self.load_index()) or self.build_index()
+
+    def index_paths(self):
+        stem = os.path.join(self.index_dir, f"intent_index_{model_slug(self.embedding_model)}")
+        return stem + ".faiss", stem + ".json"
+
+    def load_index(self):
+        """(intent texts, index) from `index_dir` if it was built for this intent table and model, else None."""
+        if not self.index_dir:
+            return None
+        index_path, meta_path = self.index_paths()
+        if not (os.path.exists(index_path) and os.path.exists(meta_path)):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != self.version or meta.get("embedding_model") != self.embedding_model:
+                logger.info(f"Intent index {index_path} is stale (version {meta.get('version')}), rebuilding")
+                return None
+            index = faiss.read_index(index_path)
+        except Exception as e:
+            logger.warning(f"Could not load intent index {index_path}: {e}")
+            return None
+        logger.info(f"Loaded intent index {index_path} (version {self.version})")
+        return meta["intents"], index
+
+    def build_index(self):
+        """Embed the intents into a cosine (normalized inner product) index and persist it."""
+        texts = list(self.script_intents.keys())
+        vectors = np.array(self.embeddings_model.embed_documents(texts), dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+
+        if self.index_dir:
+            os.makedirs(self.index_dir, exist_ok=True)
+            index_path, meta_path = self.index_paths()
+            # Written under temporary names, then renamed: concurrent readers never see half a file
+            faiss.write_index(index, index_path + ".tmp")
+            with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "embedding_model": self.embedding_model, "intents": texts}, f, indent=2)
+            os.replace(index_path + ".tmp", index_path)
+            os.replace(meta_path + ".tmp", meta_path)
+            logger.info(f"Built intent index {index_path} (version {self.version})")
+        return texts, index
+
+    def keyword_match(self, query):
+        """The only script whose keywords occur in the query, else None."""
+        scripts = [script for script, pattern in self.keyword_rules.items() if pattern.search(query)]
+        return scripts[0] if len(scripts) == 1 else None
+
+    def match(self, query, query_embedding=None):
+        """Best script for the query: dict with script, path, score (cosine) and intent.
+
+        Pass `query_embedding` when the same text was already embedded (e.g. by the chatbot graph)
+        with the matcher's embedding model (`self.embedding_model`) to skip a second embedding call.
+        """
+        script = self.keyword_match(query)
+        if script is not None:
+            return {"script": script, "path": "keyword", "score": None, "intent": None}
+
+        path = "precomputed_embedding"
+        if query_embedding is None:
+            query_embedding = self.embeddings_model.embed_query(query)  # Convert query to embedding
+            path = "embedding"
+        vector = np.array([query_embedding], dtype=np.float32)
+        faiss.normalize_L2(vector)
 
-    def find_best_script(self, query):
-        """Finds the most relevant script based on user query using FAISS vector search."""
-        query_embedding = self.embeddings_model.embed_query(query)  # Convert query to embedding
-        
         # ✅ Perform FAISS search (Finds the closest match)
-        results = self.vector_store.similarity_search_by_vector(np.array(query_embedding, dtype="float32"), k=1)
+        scores, ids = self.index.search(vector, 1)
+        if ids[0][0] < 0:
+            return {"script": None, "path": path, "score": None, "intent": None}
 
-        if not results:
-            return "No relevant script found."
+        intent = self.intent_texts[ids[0][0]]
+        return {"script": self.script_intents.get(intent), "path": path, "score": float(scores[0][0]), "intent": intent}
 
-        matched_intent = results[0].page_content
-        return self.script_intents.get(matched_intent, "No relevant script found.")
+    def find_best_script(self, query, query_embedding=None):
+        """Finds the most relevant script based on user query (see match())."""
+        return self.match(query, query_embedding=query_embedding)["script"] or "No relevant script found."
 
 # --- 🔹 Main Function to Test Intent Matching ---
 def main():
@@ -109,8 +170,8 @@ def main():
 
     print("\n🔍 **Testing Script Intent Matcher**")
     for query in test_queries:
-        matched_script = matcher.find_best_script(query)
-        print(f"📌 Query: {query}\n🔗 Matched Script: {matched_script}\n")
+        matched = matcher.match(query)
+        print(f"📌 Query: {query}\n🔗 Matched Script: {matched['script']} (via {matched['path']})\n")
 
 if __name__ == "__main__":
     main()
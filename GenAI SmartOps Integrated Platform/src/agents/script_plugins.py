@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import logging
+import threading
+import subprocess
+import importlib.util
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Plugin interface: an execution script defines `run(query)` and returns its output (any value,
+# rendered with str()). It is imported once per process and called in a warm thread pool of its
+# own, so module level imports and state (clients, compiled regexes, caches) are paid for once.
+# Scripts without a `run` callable, and scripts listed as isolated, still run as
+# `python <script> <query>`; so does a plugin whose workers are all held by timed out calls.
+PLUGIN_ENTRY_POINT = "run"
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT_SECONDS = 120
+
+HUNG_WORKERS = metrics.REGISTRY.gauge(
+    "smartops_script_hung_workers", "Plugin workers still held by timed out script calls", ("script",)
+)
+
+
+class ScriptTimeout(Exception):
+    pass
+
+
+class ScriptPluginRuntime:
+    """Runs execution scripts in-process (warm) or, when isolated, in a subprocess.
+
+    Every plugin has its own pool of `workers` threads, so a hung plugin only ties up its own
+    script. A timed out call cannot be killed and keeps its worker until it returns; once all
+    workers of a script are held that way, its runs go to a subprocess (killed on timeout)
+    instead of queueing behind the hung calls.
+    """
+
+    def __init__(self, scripts_path, isolated=(), workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT_SECONDS):
+        self.scripts_path = scripts_path
+        self.isolated = set(isolated)
+        self.workers = workers
+        self.timeout = timeout
+        self._pools = {}  # script name -> its worker pool
+        self._hung = defaultdict(int)  # script name -> timed out calls still holding a worker
+        self._plugins = {}  # script name -> run callable (None: no plugin interface, use a subprocess)
+        self._lock = threading.Lock()
+
+    def script_path(self, script_name):
+        return os.path.join(self.scripts_path, script_name)
+
+    def is_isolated(self, script_name):
+        return script_name in self.isolated
+
+    def load(self, script_name):
+        """Import a script once and return its run callable, or None if it has none."""
+        if script_name in self._plugins:
+            return self._plugins[script_name]
+        with self._lock:
+            if script_name not in self._plugins:
+                start = time.perf_counter()
+                module_name = f"smartops_plugin_{os.path.splitext(script_name)[0]}"
+                spec = importlib.util.spec_from_file_location(module_name, self.script_path(script_name))
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+                entry_point = getattr(module, PLUGIN_ENTRY_POINT, None)
+                self._plugins[script_name] = entry_point if callable(entry_point) else None
+                if self._plugins[script_name] is None:
+                    logger.warning(f" Script {script_name} has no {PLUGIN_ENTRY_POINT}(query); it runs as a subprocess")
+                else:
+                    logger.info(f" Loaded script plugin {script_name} in {time.perf_counter() - start:.3f}s")
+        return self._plugins[script_name]
+
+    def preload(self):
+        """Import every non-isolated script now (so the first alert does not pay for it)."""
+        for script_name in sorted(os.listdir(self.scripts_path)):
+            if script_name.endswith(".py") and not self.is_isolated(script_name):
+                try:
+                    self.load(script_name)
+                except Exception as e:
+                    logger.error(f" Could not load script plugin {script_name}: {e}")
+
+    def mode(self, script_name):
+        """'subprocess' for isolated scripts, scripts without run(query) and plugins whose workers are all hung, else 'in_process'."""
+        if self.is_isolated(script_name) or self.load(script_name) is None or self.is_saturated(script_name):
+            return "subprocess"
+        return "in_process"
+
+    def is_saturated(self, script_name):
+        """Whether timed out calls hold every worker of the script's pool."""
+        return self._hung[script_name] >= self.workers
+
+    def _pool(self, script_name):
+        with self._lock:
+            if script_name not in self._pools:
+                name = os.path.splitext(script_name)[0]
+                self._pools[script_name] = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"plugin-{name}")
+            return self._pools[script_name]
+
+    def _track_hung(self, script_name, future):
+        """Count a timed out call against its script until its thread returns."""
+        def finished(_):
+            with self._lock:
+                self._hung[script_name] -= 1
+                hung = self._hung[script_name]
+            HUNG_WORKERS.set(hung, script=script_name)
+            logger.info(f" Timed out call of {script_name} returned; {hung}/{self.workers} workers still hung")
+
+        with self._lock:
+            self._hung[script_name] += 1
+            hung = self._hung[script_name]
+        HUNG_WORKERS.set(hung, script=script_name)
+        logger.warning(f" {hung}/{self.workers} workers of {script_name} are held by timed out calls")
+        future.add_done_callback(finished)
+
+    def run(self, script_name, query, on_done=None):
+        """Run a script for `query` and return its output text.
+
+        Raises ScriptTimeout after `timeout` seconds and subprocess.CalledProcessError when an
+        isolated script exits non-zero; exceptions of in-process plugins propagate. A timed out
+        in-process call cannot be killed and finishes in its worker thread.
+
+        `on_done()` is called once, when the script has really stopped: when run() returns for
+        subprocesses (killed on timeout), but only when the worker thread finishes for in-process
+        plugins, which can be long after a ScriptTimeout.
+        """
+        handed_off = False
+        try:
+            if self.mode(script_name) == "subprocess":
+                if not self.is_isolated(script_name) and self._plugins.get(script_name) is not None:
+                    logger.warning(f" All workers of {script_name} are hung; running it as a subprocess")
+                return self._run_subprocess(script_name, query)
+            future = self._pool(script_name).submit(self._plugins[script_name], query)
+            if on_done is not None:
+                future.add_done_callback(lambda _: on_done())
+            handed_off = True
+        finally:
+            if on_done is not None and not handed_off:
+                on_done()
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self._track_hung(script_name, future)
+            raise ScriptTimeout(f"Script {script_name} did not finish within {self.timeout}s")
+        return "" if result is None else str(result).strip()
+
+    def _run_subprocess(self, script_name, query):
+        try:
+            result = subprocess.run(
+                [sys.executable, self.script_path(script_name), query],
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=self.timeout
+            )
+        except subprocess.TimeoutExpired:
+            raise ScriptTimeout(f"Script {script_name} did not finish within {self.timeout}s")
+        return result.stdout.strip() if result.stdout else ""
+
+    def shutdown(self):
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            pool.shutdown(wait=False)
+
+
+def runtime_from_config(config, scripts_path):
+    """ScriptPluginRuntime from the [ScriptRuntime] section."""
+    isolated = config.get("ScriptRuntime", "ISOLATED_SCRIPTS", fallback="ansible_playbook_execution.py")
+    return ScriptPluginRuntime(
+        scripts_path,
+        isolated=[name.strip() for name in isolated.split(",") if name.strip()],
+        workers=config.getint("ScriptRuntime", "WORKERS", fallback=DEFAULT_WORKERS),
+        timeout=config.getfloat("ScriptRuntime", "TIMEOUT_SECONDS", fallback=DEFAULT_TIMEOUT_SECONDS)
+    )
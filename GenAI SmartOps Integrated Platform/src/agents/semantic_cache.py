@@ -0,0 +1,168 @@
+import re
+import time
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text):
+    """Case-fold, collapse whitespace and drop trailing punctuation ("What is X ?" == "what is x")."""
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip("?!. ")
+
+
+class SemanticCache:
+    """Thread-safe TTL + LRU cache matched by normalized text or by embedding similarity.
+
+    Lookups try the normalized text first (no embedding needed), then the most similar
+    cached vector at or above ``similarity_threshold``. Entries are bounded by count and,
+    with ``max_bytes`` and ``size_fn``, by total size. If ``version_fn`` is given, the cache
+    empties itself whenever the value it returns changes (checked at most every
+    ``version_check_interval`` seconds).
+    """
+
+    def __init__(self, name, capacity=512, ttl_seconds=3600, similarity_threshold=0.95,
+                 version_fn=None, version_check_interval=5.0, max_bytes=None, size_fn=None):
+        self.name = name
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+
+        self._entries = OrderedDict()  # normalized text -> entry dict
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version = version_fn() if version_fn else None
+        self._version_checked = time.monotonic()
+
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.latency_saved = 0.0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        """Drop every entry if the underlying data changed (caller holds the lock)."""
+        if self.version_fn is None or time.monotonic() - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = time.monotonic()
+        version = self.version_fn()
+        if version != self._version:
+            if self._entries:
+                logger.info(f"♻️ {self.name}: data changed, invalidating {len(self._entries)} entries")
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+            self.invalidations += 1
+
+    def _remove(self, key):
+        self._bytes -= self._entries.pop(key)["size"]
+
+    def _expire(self):
+        now = time.monotonic()
+        for key in [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl_seconds]:
+            self._remove(key)
+
+    def _hit(self, key, entry, semantic):
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.semantic_hits += int(semantic)
+        self.latency_saved += entry["cost_seconds"]
+        return entry["value"]
+
+    def _get_exact(self, key, similarity):
+        """Exact lookup. Returns (value, done); done=False means a similarity lookup is still worth a vector."""
+        with self._lock:
+            self._check_version()
+            self._expire()
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._hit(key, entry, semantic=False), True
+            if not similarity or not any(e["vector"] is not None for e in self._entries.values()):
+                self.misses += 1
+                return None, True
+            return None, False
+
+    def _get_similar(self, vector):
+        with self._lock:
+            candidates = [(k, e) for k, e in self._entries.items() if e["vector"] is not None]
+            if candidates:
+                similarities = np.stack([e["vector"] for _, e in candidates]) @ self._unit(vector)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    return self._hit(candidates[best][0], candidates[best][1], semantic=True)
+
+            self.misses += 1
+            return None
+
+    def get(self, text, vector=None):
+        """Return the cached value for `text`, or None.
+
+        `vector` (or a zero-argument callable producing it, only called when there is no
+        exact match) enables similarity matches.
+        """
+        value, done = self._get_exact(normalize_text(text), vector is not None)
+        if done:
+            return value
+        return self._get_similar(vector() if callable(vector) else vector)
+
+    async def aget(self, text, vector):
+        """Async get(): `vector` is a zero-argument coroutine function, awaited only after an exact miss."""
+        value, done = self._get_exact(normalize_text(text), True)
+        if done:
+            return value
+        return self._get_similar(await vector())
+
+    def put(self, text, value, vector=None, cost_seconds=0.0):
+        """Store a value; `cost_seconds` is what a future hit saves."""
+        key = normalize_text(text)
+        size = self.size_fn(value) if self.size_fn else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # Larger than the whole cache; never worth evicting everything for
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "value": value,
+                "vector": self._unit(vector) if vector is not None else None,
+                "created": time.monotonic(),
+                "cost_seconds": cost_seconds,
+                "size": size
+            }
+            self._bytes += size
+
+            # Evict least recently used entries until both bounds hold
+            while len(self._entries) > self.capacity or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "latency_saved_seconds": round(self.latency_saved, 3)
+        }
@@ -0,0 +1,112 @@
+import logging
+import metrics
+from token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """Progressively summarize an IT service-desk conversation.
+Keep record IDs, device/database names and decisions; stay under {max_tokens} tokens.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{lines}
+
+New summary:"""
+
+CONDENSE_PROMPT = """Rewrite the follow-up question as a standalone question that can be understood
+without the conversation. Resolve references such as "above device" or "their names" to the
+concrete records they refer to. Return only the question.
+
+Conversation:
+{history}
+
+Follow-up question: {question}
+Standalone question:"""
+
+
+class SessionMemory:
+    """Conversation memory of one chat session, bounded by a token budget.
+
+    Recent turns are kept verbatim while they fit in ``max_window_tokens``; older turns are
+    folded into a running summary, one incremental LLM call per overflow instead of
+    re-summarizing the whole history.
+    """
+
+    def __init__(self, llm, max_window_tokens=1500, max_summary_tokens=400):
+        self.llm = llm
+        self.max_window_tokens = max_window_tokens
+        self.max_summary_tokens = max_summary_tokens
+        self.summary = ""
+        self.turns = []  # [(user message, assistant message, tokens)]
+
+    @staticmethod
+    def _format_turn(user_message, assistant_message):
+        return f"User: {user_message}\nAssistant: {assistant_message}"
+
+    def _record_turn(self, user_message, assistant_message):
+        """Append a turn and pop the oldest turns that no longer fit the window."""
+        tokens = count_tokens(self._format_turn(user_message, assistant_message))
+        self.turns.append((user_message, assistant_message, tokens))
+
+        overflow = []
+        while len(self.turns) > 1 and sum(turn[2] for turn in self.turns) > self.max_window_tokens:
+            overflow.append(self.turns.pop(0))
+        return overflow
+
+    def _summary_prompt(self, overflow):
+        lines = "\n".join(self._format_turn(user, assistant) for user, assistant, _ in overflow)
+        return SUMMARY_PROMPT.format(max_tokens=self.max_summary_tokens, summary=self.summary or "(empty)", lines=lines)
+
+    def _predict(self, prompt, purpose):
+        with metrics.span("llm", purpose):
+            output = self.llm.invoke(prompt).content
+        metrics.record_tokens(metrics.model_name(self.llm), purpose, count_tokens(prompt), count_tokens(output))
+        return output.strip()
+
+    async def _apredict(self, prompt, purpose):
+        with metrics.span("llm", purpose):
+            output = (await self.llm.ainvoke(prompt)).content
+        metrics.record_tokens(metrics.model_name(self.llm), purpose, count_tokens(prompt), count_tokens(output))
+        return output.strip()
+
+    def add_turn(self, user_message, assistant_message):
+        """Record a completed turn, folding the oldest turns into the summary if over budget."""
+        overflow = self._record_turn(user_message, assistant_message)
+        if overflow:
+            self.summary = self._predict(self._summary_prompt(overflow), "summary")
+            logger.info(f"Session memory folded {len(overflow)} turns into the summary")
+
+    async def aadd_turn(self, user_message, assistant_message):
+        """Async add_turn() using the LLM's async client."""
+        overflow = self._record_turn(user_message, assistant_message)
+        if overflow:
+            self.summary = await self._apredict(self._summary_prompt(overflow), "summary")
+            logger.info(f"Session memory folded {len(overflow)} turns into the summary")
+
+    def history_text(self):
+        """Summary plus the recent window, for the final prompt."""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of earlier conversation: {self.summary}")
+        parts.extend(self._format_turn(user, assistant) for user, assistant, _ in self.turns)
+        return "\n".join(parts)
+
+    def condense_question(self, question):
+        """Turn a follow-up into a standalone question used for retrieval (no history: unchanged)."""
+        if not self.turns and not self.summary:
+            return question
+        standalone = self._predict(CONDENSE_PROMPT.format(history=self.history_text(), question=question), "condense")
+        return standalone or question
+
+    async def acondense_question(self, question):
+        """Async condense_question() using the LLM's async client."""
+        if not self.turns and not self.summary:
+            return question
+        standalone = await self._apredict(CONDENSE_PROMPT.format(history=self.history_text(), question=question), "condense")
+        return standalone or question
+
+    def clear(self):
+        self.summary = ""
+        self.turns = []
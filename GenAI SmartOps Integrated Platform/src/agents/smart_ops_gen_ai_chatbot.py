@@ -1,17 +1,36 @@
 import os
+import time
+import asyncio
 import openai
 import json
+import hashlib
+import glob
 import logging
+import threading
+import configparser
+import numpy as np
 import pandas as pd
-from langchain.embeddings.openai import OpenAIEmbeddings
 from langchain.chat_models import ChatOpenAI
 from langchain.vectorstores import Chroma
 from langchain.document_loaders import DirectoryLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from langgraph.graph import StateGraph
-from typing import TypedDict, List
+from langchain_core.runnables import RunnableLambda
+from typing import TypedDict, List, Optional
 from langchain.schema import Document
+from embedding_providers import DEFAULT_EMBEDDING_MODEL, embedding_model_id, embeddings_from_config, model_slug
+from embedding_pipeline import BatchEmbeddingPipeline
+from query_router import QueryRouter
+from record_index import RecordKeyIndex
+from metadata_filters import MetadataFilterExtractor, row_metadata, combine_where
+from structured_query_engine import StructuredQueryEngine
+from semantic_cache import SemanticCache
+from context_assembler import ContextAssembler
+from token_counter import count_tokens
+import metrics
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 from dotenv import load_dotenv
 
@@ -29,34 +48,19 @@ dotenv_path = os.path.join(BASE_DIR, "config", ".env")
 # Load environment variables from the .env file
 load_dotenv(dotenv_path)
 
+# Load tuning settings from config/config.ini
+config = configparser.ConfigParser()
+config.read(os.path.join(BASE_DIR, "config", "config.ini"))
 
-# Retrieve API key from the environment variables
-api_key = os.getenv("OPENAI_API_KEY")
-
-if not api_key:
-    raise ValueError("API key is missing! Set it in the config/.env file.")
-
-
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-
-# Initialize OpenAI Models
-embedding_model = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=api_key)
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, openai_api_key=api_key)
 
-#With Langchain and Langgraph
+# Retrieve API key from the environment variables (checked when the OpenAI clients are first built)
+api_key = os.getenv("OPENAI_API_KEY")
 
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize OpenAI Models
-embedding_model = OpenAIEmbeddings(model="text-embedding-3-small", openai_api_key=api_key)
-llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.7, openai_api_key=api_key)
-
 # Data sources
 DATA_SOURCES = {
     "Change_Requests": "Change_Request.xlsx",
@@ -67,223 +71,1152 @@ DATA_SOURCES = {
     "Network_Devices": "Network_Devices.xlsx"
 }
 
+# Primary-key column of each source, used as the stable row ID for delta ingestion
+SOURCE_KEY_COLUMNS = {
+    "Change_Requests": "ChangeNumber",
+    "CI_Data": "Device Name",
+    "Knowledge_Base": "KB#",
+    "Database_Data": "DB ID",
+    "Incidents": "Incident Number",
+    "Network_Devices": "Device ID/Serial Number"
+}
+
+# Primary-key and name columns indexed for exact record lookups (bypassing vector search)
+SOURCE_LOOKUP_COLUMNS = {
+    "Change_Requests": ["ChangeNumber"],
+    "CI_Data": ["Device Name", "Device ID"],
+    "Knowledge_Base": ["KB#"],
+    "Database_Data": ["DB ID", "DB Name", "Server"],
+    "Incidents": ["Incident Number"],
+    "Network_Devices": ["Device ID/Serial Number", "Device Name/Hostname", "IP Address", "MAC Address"]
+}
+
+# Columns kept as typed metadata for filtered search (see metadata_filters.METADATA_TYPES);
+# "label" columns hold generic words (High, Network, ...) and only filter when named in the query
+SOURCE_METADATA_COLUMNS = {
+    "Change_Requests": {"Category": "label", "Risk": "label", "TypeOfChange": "enum", "State": "enum",
+                        "AssignGroup": "enum", "StartDate": "date", "EndDate": "date", "IsProductionChange": "bool"},
+    "CI_Data": {"Location": "enum", "Type": "enum", "OS": "enum", "Supported by": "enum",
+                "Environment": "enum", "Status": "enum"},
+    "Knowledge_Base": {"Type": "label", "Severity": "label"},
+    "Database_Data": {"DB Type": "enum", "Environment": "enum", "Supported By": "enum", "Status": "enum"},
+    "Incidents": {"Incident Priority": "enum", "Incident Impact": "label", "Incident Support Group": "enum",
+                  "Incident Category": "label", "Incident state": "enum",
+                  "Incident Start Date": "date", "Incident End Date": "date"},
+    "Network_Devices": {"Device Type": "enum", "Manufacturer": "enum", "Location": "enum", "Department/Owner": "enum",
+                        "Connection Type": "enum", "Status": "enum", "Security Level": "label",
+                        "VLAN": "number", "Last Updated": "date"}
+}
+
+# Bumped when the stored metadata layout changes, so unchanged rows are rewritten once
+METADATA_VERSION = 1
+
+# Chroma rejects very large add/delete calls, so writes are sent in slices
+CHROMA_WRITE_BATCH_SIZE = 5000
+
+# Chunking: one shared splitter, only used for rows longer than CHUNK_SIZE
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+# Parsed sheets are cached as Parquet so repeat builds skip openpyxl
+SHEET_CACHE_DIR = os.path.join(BASE_DIR, "data", "cache", "sheets")
+
+# Exact-key record index, rebuilt from the sheets at ingestion time
+RECORD_INDEX_PATH = os.path.join(BASE_DIR, "data", "cache", "record_index.sqlite3")
+
+# Vector store layouts: one collection for all sources (filtered by the "source" metadata field),
+# or the original persistent Chroma store per source under <persist_directory>/<source>
+STORE_MODE_SINGLE = "single"
+STORE_MODE_PER_SOURCE = "per_source"
+DEFAULT_COLLECTION_NAME = "smartops_records"
+
+# Collection metadata key holding the embedding model a store was built with. Stores of other
+# models than the default get their own name ("<name>__<model>"), so switching [Embedding]
+# PROVIDER builds a separate index instead of mixing vectors of two models.
+EMBEDDING_MODEL_KEY = "embedding_model"
+
+
+def store_suffix(embedding_model):
+    """Suffix of the store and collection names built with `embedding_model`."""
+    return "" if embedding_model == DEFAULT_EMBEDDING_MODEL else f"__{model_slug(embedding_model)}"
+
 
 class OpenAI_RAG:
-    """Handles RAG-based retrieval for each data source."""
+    """Handles RAG-based retrieval for each data source.
 
-    def __init__(self, docs_path: str, persist_directory: str):
+    In ``single`` store mode every source lives in one Chroma collection and searches are
+    filtered on the ``source`` metadata field, so a multi-source query is one ANN search.
+    """
+
+    def __init__(self, docs_path: str, persist_directory: str, record_index_path: str = RECORD_INDEX_PATH,
+                 structured_engine=None, store_mode: str = STORE_MODE_SINGLE,
+                 collection_name: str = DEFAULT_COLLECTION_NAME, embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+                 sheet_cache_dir: str = SHEET_CACHE_DIR):
         self.docs_path = docs_path
+        self.sheet_cache_dir = sheet_cache_dir
         self.persist_directory = persist_directory
         self.vector_stores = {}
+        self.structured_engine = structured_engine
+        self.single_collection = store_mode == STORE_MODE_SINGLE
+        self.embedding_model = embedding_model
+        self.store_suffix = store_suffix(embedding_model)
+        self.collection_name = collection_name + self.store_suffix
+        self._shared_store = None
+        self._shared_store_lock = threading.Lock()
+        self.metadata_filters = MetadataFilterExtractor(SOURCE_METADATA_COLUMNS)
+
+        os.makedirs(os.path.dirname(record_index_path), exist_ok=True)
+        self.record_index = RecordKeyIndex(record_index_path)
+
+    @staticmethod
+    def _normalize_sheet(df):
+        """Make mixed-type object columns plain strings so Parquet round-trips them unchanged."""
+        for col in df.columns:
+            values = df[col]
+            if values.dtype == object and not values.dropna().map(type).eq(str).all():
+                df[col] = values.map(lambda value: value if pd.isna(value) else str(value))
+        df.columns = [str(col) for col in df.columns]
+        return df
+
+    def _read_sheet(self, file_path):
+        """Read an Excel sheet, served from the Parquet cache while the file's mtime and size are unchanged."""
+        stat = os.stat(file_path)
+        sheet_name = os.path.splitext(os.path.basename(file_path))[0]
+        cache_path = os.path.join(self.sheet_cache_dir, f"{sheet_name}-{stat.st_mtime_ns}-{stat.st_size}.parquet")
+
+        if os.path.exists(cache_path):
+            try:
+                return pd.read_parquet(cache_path)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable sheet cache {cache_path}: {e}")
+
+        df = self._normalize_sheet(pd.read_excel(file_path))
+
+        try:
+            os.makedirs(self.sheet_cache_dir, exist_ok=True)
+            for stale_path in glob.glob(os.path.join(self.sheet_cache_dir, f"{glob.escape(sheet_name)}-*.parquet")):
+                os.remove(stale_path)
+            temp_path = f"{cache_path}.tmp"
+            df.to_parquet(temp_path, index=False)
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            # Parquet support (pyarrow) is optional; without it every build parses the .xlsx
+            logger.warning(f"Sheet cache disabled for {file_path}: {e}")
+
+        return df
+
+    @staticmethod
+    def _row_ids(df, source):
+        """Build a stable, unique ID for every row from the source's primary-key column."""
+        key_column = SOURCE_KEY_COLUMNS.get(source)
+        if key_column in df.columns:
+            keys = df[key_column].astype(str).str.strip().where(df[key_column].notna(), "")
+        else:
+            keys = pd.Series("", index=df.index)
+
+        positions = "row-" + pd.Series(np.arange(len(df)), index=df.index).astype(str)
+        keys = keys.where(keys != "", positions)
+
+        # Duplicate keys get an occurrence suffix so every row stays addressable
+        occurrence = keys.groupby(keys).cumcount() + 1
+        return keys.where(occurrence == 1, keys + "#" + occurrence.astype(str)).tolist()
+
+    @staticmethod
+    def _format_rows(df):
+        """Render every row as "col: value | col: value" using column-wise string operations."""
+        row_text = pd.Series("", index=df.index, dtype=object)
+        for col in df.columns:
+            present = df[col].notna()
+            cell = (f"{col}: " + df[col].astype(str)).where(present, "")
+            separator = np.where(present & (row_text != ""), " | ", "")
+            row_text = row_text + separator + cell
+        return row_text.tolist()
+
+    def _load_rows(self, file_path, source):
+        """Read a sheet and render its non-empty rows as (row_id, row_text, row_hash).
+
+        Returns the sheet filtered to those rows as well, aligned with the list.
+        """
+        df = self._read_sheet(file_path)
+        rows, keep = [], []
 
-    def _load_documents(self, file_path, source):
-        """Load and chunk Excel data into documents."""
+        for row_id, row_text in zip(self._row_ids(df, source), self._format_rows(df)):
+            row_text = row_text.strip()
+            keep.append(bool(row_text))
+            if row_text:
+                rows.append((row_id, row_text, hashlib.sha256(row_text.encode("utf-8")).hexdigest()))
+
+        return df[keep], rows
+
+    def _index_records(self, source, df, rows):
+        """Feed the lookup columns of every row into the exact-key record index."""
+
+        def as_key(value):
+            if pd.isna(value):
+                return ""
+            return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+
+        columns = [col for col in SOURCE_LOOKUP_COLUMNS.get(source, []) if col in df.columns]
+        key_values = list(zip(*(df[col].map(as_key) for col in columns))) if columns else [()] * len(rows)
+        signature = hashlib.sha256("".join(row_hash for _, _, row_hash in rows).encode("utf-8")).hexdigest()
+
+        self.record_index.update_source(
+            source,
+            [(row_id, list(keys), row_text) for (row_id, row_text, _), keys in zip(rows, key_values)],
+            signature
+        )
+
+    def _build_documents(self, source, rows, fields=None):
+        """Chunk rendered rows into documents keyed by row ID and content hash.
+
+        `fields` holds each row's typed metadata (aligned with `rows`), copied to all of its chunks.
+        """
         documents = []
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-        df = pd.read_excel(file_path)
 
-        for _, row in df.iterrows():
-            row_text = " | ".join(f"{col}: {row[col]}" for col in df.columns if pd.notna(row[col]))
-            if row_text.strip():
-                docs = text_splitter.split_text(row_text)
-                documents.extend([Document(page_content=doc, metadata={"source": source}) for doc in docs])
+        for (row_id, row_text, row_hash), row_fields in zip(rows, fields or [{}] * len(rows)):
+            metadata = {"source": source, "row_id": row_id, "row_hash": row_hash, "metadata_version": METADATA_VERSION}
+            metadata.update(row_fields)
 
-        return documents
+            # Most rows fit in one chunk; only long rows pay for the recursive splitter
+            chunks = text_splitter.split_text(row_text) if len(row_text) > CHUNK_SIZE else [row_text]
+            documents.extend([Document(page_content=chunk, metadata=dict(metadata)) for chunk in chunks])
 
-    def _create_vector_store(self, source_name, file_path):
-        """Create vector store for a data source."""
-        logger.info(f"Processing data for: {source_name}")
-        docs = self._load_documents(file_path, source_name)
+        return documents
 
-        self.vector_stores[source_name] = Chroma.from_documents(
-            documents=docs,
-            embedding=embedding_model,
-            persist_directory=os.path.join(self.persist_directory, source_name)
+    def _load_documents(self, file_path, source):
+        """Load and chunk Excel data into documents keyed by row ID and content hash."""
+        df, rows = self._load_rows(file_path, source)
+        return self._build_documents(source, rows, row_metadata(df, SOURCE_METADATA_COLUMNS.get(source, {})))
+
+    @staticmethod
+    def _chunk_ids(documents):
+        """Deterministic Chroma IDs: <source>:<row_id>:<chunk number>."""
+        counters = {}
+        ids = []
+        for doc in documents:
+            row_key = (doc.metadata["source"], doc.metadata["row_id"])
+            counters[row_key] = counters.get(row_key, -1) + 1
+            ids.append(f"{row_key[0]}:{row_key[1]}:{counters[row_key]}")
+        return ids
+
+    def _store_path(self, source_name):
+        """Directory of a source's own store (per-source mode)."""
+        return os.path.join(self.persist_directory, source_name + self.store_suffix)
+
+    def _check_embedding_model(self, store, name):
+        """Refuse a store built with another embedding model; untagged stores predate tagging (default model)."""
+        stored_model = (store._collection.metadata or {}).get(EMBEDDING_MODEL_KEY, DEFAULT_EMBEDDING_MODEL)
+        if stored_model != self.embedding_model:
+            raise ValueError(
+                f"Vector store {name} was built with embedding model '{stored_model}', "
+                f"but '{self.embedding_model}' is configured. Rebuild the store or switch [Embedding] PROVIDER back."
+            )
+        return store
+
+    def _open_vector_store(self, source_name):
+        """Open (or create empty) the persistent Chroma store of a data source (the shared one in single mode)."""
+        tag = {EMBEDDING_MODEL_KEY: self.embedding_model}
+        if self.single_collection:
+            with self._shared_store_lock:
+                if self._shared_store is None:
+                    self._shared_store = self._check_embedding_model(Chroma(
+                        collection_name=self.collection_name,
+                        persist_directory=self.persist_directory,
+                        embedding_function=get_embedding_model(),
+                        collection_metadata=tag
+                    ), self.collection_name)
+                return self._shared_store
+
+        return self._check_embedding_model(Chroma(
+            persist_directory=self._store_path(source_name),
+            embedding_function=get_embedding_model(),
+            collection_metadata=tag
+        ), source_name + self.store_suffix)
+
+    def _source_filter(self, source_name, where=None):
+        """Chroma `where` clause selecting one source's documents, AND-ed with an optional field filter."""
+        return combine_where([{"source": source_name} if self.single_collection else None, where])
+
+    def sync_vector_store(self, source_name, file_path):
+        """Embed only added or changed rows and delete removed ones (delta ingestion)."""
+        logger.info(f"Syncing data for: {source_name}")
+        store = self.vector_stores.get(source_name) or self._open_vector_store(source_name)
+        df, rows = self._load_rows(file_path, source_name)
+        self._index_records(source_name, df, rows)
+        if self.structured_engine is not None:
+            self.structured_engine.load_table(source_name, df)
+        self.metadata_filters.update_source(source_name, df)
+        docs = self._build_documents(source_name, rows, row_metadata(df, SOURCE_METADATA_COLUMNS.get(source_name, {})))
+        doc_ids = self._chunk_ids(docs)
+
+        # Step 1: Index what is already stored -> row_id: (row_hash, [chunk ids])
+        existing = store.get(where=self._source_filter(source_name), include=["metadatas"])
+        stored_rows = {}
+        legacy_ids = []
+        for doc_id, metadata in zip(existing["ids"], existing["metadatas"]):
+            metadata = metadata or {}
+            if "row_id" not in metadata or "row_hash" not in metadata:
+                legacy_ids.append(doc_id)  # Built before delta ingestion; replace once
+                continue
+            # Rows stored with an older metadata layout count as changed (re-embedding hits the embedding cache)
+            stored_hash = metadata["row_hash"] if metadata.get("metadata_version") == METADATA_VERSION else None
+            row = stored_rows.setdefault(metadata["row_id"], {"hash": stored_hash, "ids": []})
+            row["ids"].append(doc_id)
+
+        # Step 2: Diff against the current sheet
+        current_hashes = {doc.metadata["row_id"]: doc.metadata["row_hash"] for doc in docs}
+        stale_ids = list(legacy_ids)
+        changed_rows = removed_rows = 0
+        for row_id, row in stored_rows.items():
+            if row_id not in current_hashes:
+                removed_rows += 1
+                stale_ids.extend(row["ids"])
+            elif current_hashes[row_id] != row["hash"]:
+                changed_rows += 1
+                stale_ids.extend(row["ids"])
+
+        pending = [
+            (doc, doc_id) for doc, doc_id in zip(docs, doc_ids)
+            if stored_rows.get(doc.metadata["row_id"], {}).get("hash") != doc.metadata["row_hash"]
+        ]
+        added_rows = len({doc.metadata["row_id"] for doc, _ in pending}) - changed_rows
+
+        # Step 3: Apply the delta (only pending chunks are embedded)
+        for start in range(0, len(stale_ids), CHROMA_WRITE_BATCH_SIZE):
+            store.delete(ids=stale_ids[start:start + CHROMA_WRITE_BATCH_SIZE])
+
+        get_embedding_pipeline().ingest(store, [doc for doc, _ in pending], [doc_id for _, doc_id in pending])
+
+        if stale_ids or pending:
+            store.persist()
+
+        self.vector_stores[source_name] = store
+        logger.info(
+            f"Vector store synced for {source_name}: {added_rows} added, {changed_rows} changed, "
+            f"{removed_rows} removed, {len(current_hashes) - added_rows - changed_rows} unchanged rows "
+            f"({len(pending)} chunks embedded)"
         )
-        self.vector_stores[source_name].persist()
-        logger.info(f"Vector store created for {source_name}")
+
+    def _setup_source(self, source, filename):
+        file_path = os.path.join(self.docs_path, filename)
+        vector_store_path = self._store_path(source)
+
+        if not os.path.exists(file_path):
+            logger.warning(f"{filename} not found. Skipping...")
+            # Keep serving the last ingested data if the export is temporarily missing
+            if self.single_collection:
+                self.vector_stores[source] = self._open_vector_store(source)
+            elif os.path.exists(vector_store_path) and os.listdir(vector_store_path):
+                self.vector_stores[source] = self._open_vector_store(source)
+            if source in self.vector_stores:
+                stored = self.vector_stores[source].get(where=self._source_filter(source), include=["metadatas"])
+                self.metadata_filters.update_source_from_metadatas(source, stored["metadatas"])
+            self.record_index.load_source(source)
+            return
+
+        self.sync_vector_store(source, file_path)
 
     def setup_rag(self):
-        """Initialize vector stores for all sources."""
-        for source, filename in DATA_SOURCES.items():
-            file_path = os.path.join(self.docs_path, filename)
-            if not os.path.exists(file_path):
-                logger.warning(f"{filename} not found. Skipping...")
-                continue
+        """Initialize vector stores for all sources concurrently, re-ingesting only rows that changed."""
+        # Sources share the embedding pipeline (and its rate limits), so they are synced in parallel
+        with ThreadPoolExecutor(max_workers=len(DATA_SOURCES), thread_name_prefix="rag-setup") as executor:
+            futures = [executor.submit(self._setup_source, source, filename) for source, filename in DATA_SOURCES.items()]
+            for future in futures:
+                future.result()
 
-            vector_store_path = os.path.join(self.persist_directory, source)
-            if not os.path.exists(vector_store_path) or not os.listdir(vector_store_path):
-                self._create_vector_store(source, file_path)
-            else:
-                self.vector_stores[source] = Chroma(
-                    persist_directory=vector_store_path,
-                    embedding_function=embedding_model
-                )
+        logger.info(f"Embedding cache: {get_embedding_model().stats()}")
 
     def retrieve_relevant_docs(self, query: str, source: str, k: int = 50):
         """Retrieve relevant documents from a specific source."""
         if source not in self.vector_stores:
             return []
         
-        return self.vector_stores[source].similarity_search(query, k=k)
+        with metrics.span("vector_search", source):
+            return self.vector_stores[source].similarity_search(query, k=k)
 
+    def retrieve_by_vector(self, embedding, source: str, k: int = 50, where=None):
+        """Retrieve relevant documents from a specific source for an already embedded query.
 
-# Initialize RAG system
-#BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))  # Move up two levels
-docs_path = os.path.join(BASE_DIR, "data", "documents")
-persist_directory = os.path.join(BASE_DIR, "data", "chroma_db")
-rag_system = OpenAI_RAG(docs_path, persist_directory)
-rag_system.setup_rag()
+        `where` narrows the search to rows whose typed metadata match; if nothing matches,
+        the search is repeated without it.
+        """
+        if source not in self.vector_stores:
+            return []
+
+        store = self.vector_stores[source]
+        if where:
+            with metrics.span("vector_search", f"{source}:filtered"):
+                docs = store.similarity_search_by_vector(embedding, k=k, filter=self._source_filter(source, where))
+            if docs:
+                return docs
+            logger.info(f"No {source} rows match {where}, searching unfiltered")
+        with metrics.span("vector_search", source):
+            return store.similarity_search_by_vector(embedding, k=k, filter=self._source_filter(source))
+
+    def retrieve_from_sources(self, embedding, sources, k: int = 50, filters=None):
+        """Single-collection mode: one filtered ANN search over several sources.
+
+        `filters` maps a source to its field filter. Returns {source: documents}, at most `k`
+        per source, taken from the nearest ``k * len(sources)`` chunks across the requested
+        sources; a filtered source with no match is searched again without its filter.
+        """
+        filters = filters or {}
+        sources = [source for source in sources if source in self.vector_stores]
+        if not sources:
+            return {}
+        if not self.single_collection or len(sources) == 1:
+            return {source: self.retrieve_by_vector(embedding, source, k=k, where=filters.get(source)) for source in sources}
+
+        where = {"$or": [combine_where([{"source": source}, filters.get(source)]) for source in sources]}
+        with metrics.span("vector_search", "multi_source"):
+            docs = self._open_vector_store(sources[0]).similarity_search_by_vector(embedding, k=k * len(sources), filter=where)
+        results = {source: [] for source in sources}
+        for doc in docs:
+            source_docs = results.get(doc.metadata.get("source"))
+            if source_docs is not None and len(source_docs) < k:
+                source_docs.append(doc)
+
+        for source in sources:
+            if not results[source] and filters.get(source):
+                results[source] = self.retrieve_by_vector(embedding, source, k=k)
+        return results
 
 
+# Default locations of the source exports and the Chroma stores (overridable through init())
+DOCS_PATH = os.path.join(BASE_DIR, "data", "documents")
+PERSIST_DIRECTORY = os.path.join(BASE_DIR, "data", "chroma_db")
+
+
+def data_version():
+    """Fingerprint of the source exports and Chroma stores; any change invalidates cached answers and retrievals."""
+    signature = []
+    for root in (_setting("docs_path", DOCS_PATH), _setting("persist_directory", PERSIST_DIRECTORY)):
+        for dirpath, _, filenames in os.walk(root):
+            for name in sorted(filenames):
+                if name.endswith((".xlsx", ".sqlite3")):
+                    stat = os.stat(os.path.join(dirpath, name))
+                    signature.append((os.path.join(dirpath, name), stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def docs_size(docs):
+    """Approximate in-memory size of a list of Documents (UTF-8 text plus metadata)."""
+    return sum(len(doc.page_content.encode("utf-8")) + len(json.dumps(doc.metadata)) for doc in docs)
+
 
 class ServiceDesk_LLM:
-    """LangGraph-based orchestration for querying multiple sources with Model Context Processing (MCP)."""
+    """LangGraph-based orchestration for querying multiple sources with a query-aware retrieval cache."""
 
-    def __init__(self, rag_system, memory_limit=5):
+    def __init__(self, rag_system, cache_capacity=128, cache_ttl_seconds=600, cache_max_bytes=4_000_000,
+                 similarity_threshold=0.95, search_workers=8, context_assembler=None):
         """
-        Initializes the ServiceDesk LLM with MCP and memory constraints.
+        Initializes the ServiceDesk LLM with one bounded retrieval cache per source.
 
         Args:
             rag_system: Instance of OpenAI_RAG for document retrieval.
-            memory_limit: Number of queries to retain before context expires.
+            cache_capacity: Maximum number of cached queries per source.
+            cache_ttl_seconds: Lifetime of a cached retrieval.
+            cache_max_bytes: Maximum size of the cached documents per source.
+            similarity_threshold: Minimum cosine similarity for a new query to reuse a cached one.
+            search_workers: Threads shared by all sessions for Chroma searches in the async graph.
+            context_assembler: ContextAssembler that dedupes, reranks and budgets the final-prompt context.
         """
         self.rag_system = rag_system
-        self.memory_limit = memory_limit
-
-        # MCP: Context Memory for each data category
-        self.context_memory = {
-            "CI": [],
-            "Change": [],
-            "Network": [],
-            "DB": [],
-            "Incidents": []
+        self.context_assembler = context_assembler or ContextAssembler()
+
+        # Bounded pool for the blocking HNSW searches of the async nodes (not one thread per request)
+        self.search_pool = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="chroma-search")
+
+        # Retrieval cache keyed by (source, normalized query / query embedding); shared by all sessions
+        self.retrieval_caches = {
+            source: SemanticCache(
+                f"Retrieval cache [{source}]",
+                capacity=cache_capacity,
+                ttl_seconds=cache_ttl_seconds,
+                similarity_threshold=similarity_threshold,
+                version_fn=data_version,
+                max_bytes=cache_max_bytes,
+                size_fn=docs_size
+            )
+            for source in DATA_SOURCES
         }
 
-        # Memory counter to track expiration
-        self.memory_counter = {
-            "CI": 0,
-            "Change": 0,
-            "Network": 0,
-            "DB": 0,
-            "Incidents": 0
-        }
+    @staticmethod
+    def _cache_vector(embedding, where):
+        """Filtered retrievals are cached by exact query only: "high impact" and "low impact" embed alike."""
+        return None if where else embedding
 
-    def _retrieve_with_memory(self, query, source, category):
-        """Retrieves data from memory if available; otherwise, queries ChromaDB."""
-        
-        # Step 1: Check if the memory exists
-        if self.context_memory[category]:
-            logging.info(f"📌 Using MCP Context Memory for {category}")
-            return self.context_memory[category]
+    def _retrieve_with_cache(self, query, source, embedding, where=None):
+        """Reuse a cached retrieval only when the query matches a cached one; otherwise query ChromaDB.
 
-        # Step 2: Query ChromaDB if memory is empty
-        results = self.rag_system.retrieve_relevant_docs(query, source)
+        `embedding` is the query vector computed once in START and shared by every search node;
+        `where` is the metadata filter extracted from the query for this source.
+        """
+        cache = self.retrieval_caches[source]
+        results = cache.get(query, self._cache_vector(embedding, where))
+        if results is not None:
+            logging.info(f"📌 Retrieval cache hit for {source}")
+            return results
+
+        start = time.perf_counter()
+        results = self.rag_system.retrieve_by_vector(embedding, source, where=where)
+        cache.put(query, results, self._cache_vector(embedding, where), cost_seconds=time.perf_counter() - start)
+        return results
 
-        # Step 3: Store results in MCP memory (limit to avoid memory overflow)
-        if results:
-            self.context_memory[category].extend(results)
-            self.memory_counter[category] += 1  # Increase counter
+    async def _aretrieve_with_cache(self, query, source, embedding, where=None):
+        """Async _retrieve_with_cache(): the Chroma search runs in search_pool."""
+        cache = self.retrieval_caches[source]
+        results = cache.get(query, self._cache_vector(embedding, where))
+        if results is not None:
+            logging.info(f"📌 Retrieval cache hit for {source}")
+            return results
+
+        start = time.perf_counter()
+        results = await asyncio.get_running_loop().run_in_executor(
+            self.search_pool, partial(self.rag_system.retrieve_by_vector, embedding, source, where=where)
+        )
+        cache.put(query, results, self._cache_vector(embedding, where), cost_seconds=time.perf_counter() - start)
+        return results
 
-            # Step 4: Expire memory if limit is reached
-            if self.memory_counter[category] >= self.memory_limit:
-                logging.info(f"🧹 Expiring memory for {category} after {self.memory_limit} queries")
-                self.context_memory[category] = []  # Reset memory
-                self.memory_counter[category] = 0  # Reset counter
+    def _search_source(self, state, source):
+        return self._retrieve_with_cache(
+            state["query"], source, state["Query_Embedding"], state.get("Metadata_Filters", {}).get(source)
+        )
 
-        return results
+    async def _asearch_source(self, state, source):
+        return await self._aretrieve_with_cache(
+            state["query"], source, state["Query_Embedding"], state.get("Metadata_Filters", {}).get(source)
+        )
 
     def retrieve_from_ci(self, state):
-        """Retrieve CI data with MCP context memory."""
-        return {"CI_Results": self._retrieve_with_memory(state["query"], "CI_Data", "CI")}
+        """Retrieve CI data through the retrieval cache."""
+        return {"CI_Results": self._search_source(state, "CI_Data")}
 
     def retrieve_from_change(self, state):
-        """Retrieve Change Request data with MCP context memory."""
-        return {"Change_Results": self._retrieve_with_memory(state["query"], "Change_Requests", "Change")}
+        """Retrieve Change Request data through the retrieval cache."""
+        return {"Change_Results": self._search_source(state, "Change_Requests")}
 
     def retrieve_from_network(self, state):
-        """Retrieve Network data with MCP context memory."""
-        return {"Network_Results": self._retrieve_with_memory(state["query"], "Network_Devices", "Network")}
+        """Retrieve Network data through the retrieval cache."""
+        return {"Network_Results": self._search_source(state, "Network_Devices")}
 
     def retrieve_from_db(self, state):
-        """Retrieve Database data with MCP context memory."""
-        return {"DB_Results": self._retrieve_with_memory(state["query"], "Database_Data", "DB")}
+        """Retrieve Database data through the retrieval cache."""
+        return {"DB_Results": self._search_source(state, "Database_Data")}
 
     def retrieve_from_incidents(self, state):
-        """Retrieve Incident data with MCP context memory."""
-        return {"Incident_Results": self._retrieve_with_memory(state["query"], "Incidents", "Incidents")}
+        """Retrieve Incident data through the retrieval cache."""
+        return {"Incident_Results": self._search_source(state, "Incidents")}
 
-    def format_response(self, state):
-        """Format response with full context memory for better readability."""
-        
-        def extract_text(docs):
-            """Extracts clean text from Document objects."""
-            return [doc.page_content for doc in docs] if docs else []
-
-        # Structure response with retained memory context
-        results = {
-            "CI Data": extract_text(self.context_memory["CI"]),
-            "Change Requests": extract_text(self.context_memory["Change"]),
-            "Network Data": extract_text(self.context_memory["Network"]),
-            "Database Info": extract_text(self.context_memory["DB"]),
-            "Incident Reports": extract_text(self.context_memory["Incidents"]),
-        }
+    async def aretrieve_from_ci(self, state):
+        return {"CI_Results": await self._asearch_source(state, "CI_Data")}
 
-        # Convert structured data to JSON
-        formatted_results = json.dumps(results, indent=2)
+    async def aretrieve_from_change(self, state):
+        return {"Change_Results": await self._asearch_source(state, "Change_Requests")}
 
-        # Pass formatted response to LLM for final answer generation
-        final_prompt = f"Context:\n{formatted_results}\n\nUser Query: {state['query']}\n\nAnswer:"
-        response = llm.predict(final_prompt)
+    async def aretrieve_from_network(self, state):
+        return {"Network_Results": await self._asearch_source(state, "Network_Devices")}
+
+    async def aretrieve_from_db(self, state):
+        return {"DB_Results": await self._asearch_source(state, "Database_Data")}
+
+    async def aretrieve_from_incidents(self, state):
+        return {"Incident_Results": await self._asearch_source(state, "Incidents")}
+
+    def _cached_or_missing(self, query, nodes, embedding, filters):
+        """Split search nodes into cached results {node: docs} and nodes that still need a search."""
+        results, missing = {}, []
+        for node in nodes:
+            source = SEARCH_NODE_SOURCES[node]
+            docs = self.retrieval_caches[source].get(query, self._cache_vector(embedding, filters.get(source)))
+            if docs is not None:
+                logging.info(f"📌 Retrieval cache hit for {source}")
+                results[node] = docs
+            else:
+                missing.append(node)
+        return results, missing
+
+    def _store_searched(self, query, missing, embedding, filters, by_source, elapsed, results):
+        for node in missing:
+            source = SEARCH_NODE_SOURCES[node]
+            results[node] = by_source.get(source, [])
+            self.retrieval_caches[source].put(
+                query, results[node], self._cache_vector(embedding, filters.get(source)), cost_seconds=elapsed / len(missing)
+            )
+        return {SEARCH_NODE_CATEGORIES[node][0]: docs for node, docs in results.items()}
+
+    def retrieve_from_routed_sources(self, state):
+        """Single-collection mode: serve every routed source from the cache or one filtered ANN search."""
+        query, embedding, filters = state["query"], state["Query_Embedding"], state.get("Metadata_Filters", {})
+        results, missing = self._cached_or_missing(query, state["Routed_Sources"], embedding, filters)
+        by_source, start = {}, time.perf_counter()
+        if missing:
+            by_source = self.rag_system.retrieve_from_sources(
+                embedding, [SEARCH_NODE_SOURCES[node] for node in missing], filters=filters
+            )
+        return self._store_searched(query, missing, embedding, filters, by_source, time.perf_counter() - start, results)
+
+    async def aretrieve_from_routed_sources(self, state):
+        query, embedding, filters = state["query"], state["Query_Embedding"], state.get("Metadata_Filters", {})
+        results, missing = self._cached_or_missing(query, state["Routed_Sources"], embedding, filters)
+        by_source, start = {}, time.perf_counter()
+        if missing:
+            by_source = await asyncio.get_running_loop().run_in_executor(
+                self.search_pool,
+                partial(self.rag_system.retrieve_from_sources, embedding,
+                        [SEARCH_NODE_SOURCES[node] for node in missing], filters=filters)
+            )
+        return self._store_searched(query, missing, embedding, filters, by_source, time.perf_counter() - start, results)
+
+    def _route(self, state):
+        """Exact record lookup and source routing; returns (state update, whether vector search may run)."""
+        exact_docs, identifiers, unresolved = self.rag_system.record_index.resolve(state["query"])
+
+        # Every identifier in the query resolved: no embedding or ANN search needed
+        if exact_docs and identifiers and not unresolved:
+            logging.info(f"🎯 Exact lookup resolved {identifiers}, skipping vector search")
+            return {
+                "query": state["query"], "Exact_Results": exact_docs, "Routed_Sources": [], "Search_Nodes": [], "Metadata_Filters": {}
+            }, False
+
+        routed = get_query_router().route(state["query"])
+        filters = {}
+        for node in routed:
+            source = SEARCH_NODE_SOURCES[node]
+            where = self.rag_system.metadata_filters.extract(state["query"], source)
+            if where:
+                logging.info(f"🔎 Metadata filter for {source}: {where}")
+                filters[source] = where
+        return {
+            "query": state["query"],
+            "Exact_Results": exact_docs,
+            "Routed_Sources": routed,
+            "Metadata_Filters": filters,
+            # One filtered search covers all routed sources when they share a collection
+            "Search_Nodes": ["Vector_Search"] if self.rag_system.single_collection else routed,
+            "Structured_Route": StructuredQueryEngine.is_aggregate_query(state["query"])
+        }, True
+
+    def route_query(self, state):
+        """Resolve exact record IDs, pick the relevant search nodes and embed the query once (START node).
+
+        A vector already in the input state (e.g. computed for the response cache) is reused.
+        """
+        update, needs_embedding = self._route(state)
+        if needs_embedding:
+            update["Query_Embedding"] = state.get("Query_Embedding") or QueryVector(state["query"])()
+        return update
+
+    async def aroute_query(self, state):
+        """Async route_query() using the async embedding client."""
+        update, needs_embedding = self._route(state)
+        if needs_embedding:
+            update["Query_Embedding"] = state.get("Query_Embedding") or await QueryVector(state["query"]).aget()
+        return update
+
+    def run_structured_query(self, state):
+        """Answer count/list/filter questions with SQL over the full source tables."""
+        return {"Structured_Results": get_structured_engine().answer(state["query"])}
+
+    async def arun_structured_query(self, state):
+        return {"Structured_Results": await get_structured_engine().aanswer(state["query"])}
+
+    def _final_prompt(self, state):
+        """Build the final prompt from the documents retrieved for this query; returns (prompt, context stats)."""
+        # Exact record matches, the structured query result (which replaces vector search when it
+        # succeeded) and the results of the searched sources, deduplicated and packed into the budget
+        structured = state.get("Structured_Results")
+        searched = [] if structured else state.get("Routed_Sources", [])
+        categories = [
+            (label, state.get(results_key))
+            for node, (results_key, label) in SEARCH_NODE_CATEGORIES.items()
+            if node in searched
+        ]
+        context, stats = self.context_assembler.assemble(state["query"], state.get("Exact_Results"), categories, structured)
+
+        # Pass the assembled context to the LLM for final answer generation
+        final_prompt = f"Context:\n{context}\n\nUser Query: {state['query']}\n\nAnswer:"
+        if state.get("chat_history"):
+            final_prompt = f"Conversation so far:\n{state['chat_history']}\n\n{final_prompt}"
+        return final_prompt, stats
+
+    def format_response(self, state, config=None):
+        """Format response with the documents retrieved for this query.
+
+        The LLM call receives the node's runnable config, so get_graph().stream(...,
+        stream_mode="messages") yields its tokens as they are generated.
+        """
+        final_prompt, stats = self._final_prompt(state)
+        with metrics.span("llm", "answer"):
+            response = get_llm().invoke(final_prompt, config=config)
+        self._record_llm_tokens(final_prompt, response.content)
+        return {"Final_Response": response.content, "Context_Stats": stats}
+
+    async def aformat_response(self, state, config=None):
+        """Async format_response() using the LLM's async client."""
+        final_prompt, stats = self._final_prompt(state)
+        with metrics.span("llm", "answer"):
+            response = await get_llm().ainvoke(final_prompt, config=config)
+        self._record_llm_tokens(final_prompt, response.content)
+        return {"Final_Response": response.content, "Context_Stats": stats}
+
+    @staticmethod
+    def _record_llm_tokens(prompt, answer):
+        metrics.record_tokens(metrics.model_name(get_llm()), "answer", count_tokens(prompt), count_tokens(answer))
+
+
+# Search node -> (state key of its results, context label)
+SEARCH_NODE_CATEGORIES = {
+    "CI_Search": ("CI_Results", "CI Data"),
+    "Change_Search": ("Change_Results", "Change Requests"),
+    "Network_Search": ("Network_Results", "Network Data"),
+    "DB_Search": ("DB_Results", "Database Info"),
+    "Incident_Search": ("Incident_Results", "Incident Reports"),
+}
+
+# Search node -> data source it searches
+SEARCH_NODE_SOURCES = {
+    "CI_Search": "CI_Data",
+    "Change_Search": "Change_Requests",
+    "Network_Search": "Network_Devices",
+    "DB_Search": "Database_Data",
+    "Incident_Search": "Incidents",
+}
+
+
+def route_from_start(state):
+    """START ➝ Format_Response (exact lookup answered), Structured_Query or the routed search nodes."""
+    if not state["Routed_Sources"]:
+        return ["Format_Response"]
+    if state.get("Structured_Route"):
+        return ["Structured_Query"]
+    return state["Search_Nodes"]
+
+
+def route_from_structured_query(state):
+    """Structured_Query ➝ Format_Response, or fall back to vector search if no valid SQL answer."""
+    return ["Format_Response"] if state.get("Structured_Results") else state["Search_Nodes"]
 
-        return {"Final_Response": response}
-        
 
 # Define the state schema for LangGraph
 class ServiceDeskState(TypedDict):
     query: str
+    chat_history: str
+    Routed_Sources: List[str]
+    Search_Nodes: List[str]
+    Metadata_Filters: dict
+    Exact_Results: List[Document]
+    Structured_Route: bool
+    Structured_Results: Optional[dict]
+    Query_Embedding: Optional[List[float]]
     CI_Results: List[str]
     Change_Results: List[str]
     Network_Results: List[str]
     DB_Results: List[str]
     Incident_Results: List[str]
+    Context_Stats: dict
     Final_Response: str
 
 
-# Initialize LangGraph workflow
-workflow = StateGraph(state_schema=ServiceDeskState)
-service_desk_llm = ServiceDesk_LLM(rag_system)
+def _timed_node(name, func, afunc):
+    """Graph node whose sync and async implementations are timed as span "node"."""
+    return RunnableLambda(metrics.timed("node", name)(func), afunc=metrics.timed("node", name)(afunc))
+
+
+def build_graph(service_desk_llm):
+    """Build and compile the LangGraph workflow around a ServiceDesk_LLM."""
+    workflow = StateGraph(state_schema=ServiceDeskState)
+
+    # Define the START node (routes the query to the relevant sources)
+    workflow.add_node("START", _timed_node("START", service_desk_llm.route_query, afunc=service_desk_llm.aroute_query))
+
+    # Add search nodes: graph.invoke()/stream() run the sync implementations,
+    # ainvoke()/astream() the async ones, so the fan-out overlaps every network wait
+    workflow.add_node("CI_Search", _timed_node("CI_Search", service_desk_llm.retrieve_from_ci, afunc=service_desk_llm.aretrieve_from_ci))
+    workflow.add_node("Change_Search", _timed_node("Change_Search", service_desk_llm.retrieve_from_change, afunc=service_desk_llm.aretrieve_from_change))
+    workflow.add_node("Network_Search", _timed_node("Network_Search", service_desk_llm.retrieve_from_network, afunc=service_desk_llm.aretrieve_from_network))
+    workflow.add_node("DB_Search", _timed_node("DB_Search", service_desk_llm.retrieve_from_db, afunc=service_desk_llm.aretrieve_from_db))
+    workflow.add_node("Incident_Search", _timed_node("Incident_Search", service_desk_llm.retrieve_from_incidents, afunc=service_desk_llm.aretrieve_from_incidents))
+    # Single-collection mode: one node searches every routed source with a single filtered ANN query
+    workflow.add_node("Vector_Search", _timed_node("Vector_Search", service_desk_llm.retrieve_from_routed_sources, afunc=service_desk_llm.aretrieve_from_routed_sources))
+    workflow.add_node("Structured_Query", _timed_node("Structured_Query", service_desk_llm.run_structured_query, afunc=service_desk_llm.arun_structured_query))
+    workflow.add_node("Format_Response", _timed_node("Format_Response", service_desk_llm.format_response, afunc=service_desk_llm.aformat_response))
 
-# Define the START node
-workflow.add_node("START", lambda state: {"query": state["query"]})
+    # Define edges: START ➝ routed Search Nodes (all of them when the router is not confident),
+    # Structured_Query for count/list questions, or straight to Format_Response when exact
+    # record lookup answered the query
+    workflow.add_conditional_edges(
+        "START", route_from_start, list(SEARCH_NODE_CATEGORIES) + ["Vector_Search", "Structured_Query", "Format_Response"]
+    )
+    workflow.add_conditional_edges(
+        "Structured_Query", route_from_structured_query, list(SEARCH_NODE_CATEGORIES) + ["Vector_Search", "Format_Response"]
+    )
 
-# Add search nodes
-workflow.add_node("CI_Search", service_desk_llm.retrieve_from_ci)
-workflow.add_node("Change_Search", service_desk_llm.retrieve_from_change)
-workflow.add_node("Network_Search", service_desk_llm.retrieve_from_network)
-workflow.add_node("DB_Search", service_desk_llm.retrieve_from_db)
-workflow.add_node("Incident_Search", service_desk_llm.retrieve_from_incidents)
-workflow.add_node("Format_Response", service_desk_llm.format_response)
+    # Search Nodes ➝ Format Response
+    for node in list(SEARCH_NODE_CATEGORIES) + ["Vector_Search"]:
+        workflow.add_edge(node, "Format_Response")
 
-# Define edges: START ➝ Search Nodes
-workflow.add_edge("START", "CI_Search")
-workflow.add_edge("START", "Change_Search")
-workflow.add_edge("START", "Network_Search")
-workflow.add_edge("START", "DB_Search")
-workflow.add_edge("START", "Incident_Search")
+    # Define the workflow entry point
+    workflow.set_entry_point("START")
 
-# Search Nodes ➝ Format Response
-workflow.add_edge("CI_Search", "Format_Response")
-workflow.add_edge("Change_Search", "Format_Response")
-workflow.add_edge("Network_Search", "Format_Response")
-workflow.add_edge("DB_Search", "Format_Response")
-workflow.add_edge("Incident_Search", "Format_Response")
+    # Compile LangGraph workflow
+    return workflow.compile()
 
-# Define the workflow entry point
-workflow.set_entry_point("START")
 
-# Compile LangGraph workflow
-graph_executor = workflow.compile()
+# ---------- Lazy initialization ----------
+# Importing this module builds nothing: every shared resource is created on first use,
+# or up front by init() / in the background by warm_up().
+
+_overrides = {}
+_resources = {}
+_resource_locks = {}
+_resource_locks_guard = threading.Lock()
+
+
+def _setting(name, default):
+    return _overrides.get(name, default)
+
+
+def _lazy(name, factory):
+    """Return resource `name`, creating it once (thread-safe) unless init() supplied an override."""
+    if name in _overrides:
+        return _overrides[name]
+    if name in _resources:
+        return _resources[name]
+
+    with _resource_locks_guard:
+        lock = _resource_locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _resources:
+            start = time.perf_counter()
+            _resources[name] = factory()
+            logger.info(f"Initialized {name} in {time.perf_counter() - start:.2f}s")
+    return _resources[name]
+
+
+def _require_api_key():
+    if not api_key:
+        raise ValueError("API key is missing! Set it in the config/.env file.")
+    return api_key
+
+
+def get_embedding_model():
+    """Embedding model selected by [Embedding] PROVIDER (OpenAI, a local sentence transformer or hashing)."""
+    return _lazy("embedding_model", lambda: embeddings_from_config(config, api_key))
+
+
+def get_llm():
+    return _lazy("llm", lambda: ChatOpenAI(
+        model="gpt-4o-mini", temperature=0.7, openai_api_key=_require_api_key(), streaming=True
+    ))
+
+
+def get_sql_llm():
+    """Deterministic model for SQL generation over the full tables (count/list questions)."""
+    return _lazy("sql_llm", lambda: ChatOpenAI(model="gpt-4o-mini", temperature=0, openai_api_key=_require_api_key()))
+
+
+def get_embedding_pipeline():
+    """Concurrent, rate-limited embedding for index builds."""
+    return _lazy("embedding_pipeline", lambda: BatchEmbeddingPipeline(
+        get_embedding_model(),
+        max_batch_tokens=config.getint("Embedding", "MAX_BATCH_TOKENS", fallback=8000),
+        requests_per_minute=config.getint("Embedding", "REQUESTS_PER_MINUTE", fallback=3000),
+        tokens_per_minute=config.getint("Embedding", "TOKENS_PER_MINUTE", fallback=1000000),
+        max_concurrency=config.getint("Embedding", "MAX_CONCURRENCY", fallback=8),
+        max_retries=config.getint("Embedding", "MAX_RETRIES", fallback=6)
+    ))
+
+
+def get_structured_engine():
+    return _lazy("structured_engine", lambda: StructuredQueryEngine(
+        get_sql_llm(), max_rows=config.getint("StructuredQuery", "MAX_ROWS", fallback=200)
+    ))
+
+
+def get_query_router():
+    return _lazy("query_router", lambda: QueryRouter(
+        min_confidence=config.getfloat("Router", "MIN_CONFIDENCE", fallback=0.5)
+    ))
+
+
+def _rag_instance():
+    """The OpenAI_RAG object, before any store is opened (cheap)."""
+    return _lazy("rag_instance", lambda: OpenAI_RAG(
+        _setting("docs_path", DOCS_PATH),
+        _setting("persist_directory", PERSIST_DIRECTORY),
+        record_index_path=_setting("record_index_path", RECORD_INDEX_PATH),
+        structured_engine=get_structured_engine(),
+        store_mode=config.get("VectorStore", "MODE", fallback=STORE_MODE_SINGLE),
+        collection_name=config.get("VectorStore", "COLLECTION", fallback=DEFAULT_COLLECTION_NAME),
+        embedding_model=embedding_model_id(get_embedding_model()),
+        sheet_cache_dir=_setting("sheet_cache_dir", SHEET_CACHE_DIR)
+    ))
+
+
+def get_rag_system():
+    """The RAG system with every source store opened and synced (the expensive startup step)."""
+    def setup():
+        rag_system = _rag_instance()
+        rag_system.setup_rag()
+        return rag_system
+    return _lazy("rag_system", setup)
+
+
+def get_service_desk():
+    return _lazy("service_desk", lambda: ServiceDesk_LLM(
+        _rag_instance(),
+        cache_capacity=config.getint("RetrievalCache", "CAPACITY", fallback=128),
+        cache_ttl_seconds=config.getint("RetrievalCache", "TTL_SECONDS", fallback=600),
+        cache_max_bytes=config.getint("RetrievalCache", "MAX_BYTES", fallback=4000000),
+        similarity_threshold=config.getfloat("RetrievalCache", "SIMILARITY_THRESHOLD", fallback=0.95),
+        search_workers=config.getint("Async", "SEARCH_THREADS", fallback=8),
+        context_assembler=ContextAssembler(
+            max_tokens=config.getint("Context", "MAX_TOKENS", fallback=3000),
+            mmr_lambda=config.getfloat("Context", "MMR_LAMBDA", fallback=0.7),
+            max_overlap=2 * CHUNK_OVERLAP
+        )
+    ))
+
+
+def _compiled_graph():
+    return _lazy("graph", lambda: build_graph(get_service_desk()))
+
+
+def get_graph():
+    """Compiled LangGraph workflow, returned once the source stores are ready."""
+    get_rag_system()
+    return _compiled_graph()
+
+
+def get_response_cache():
+    """Semantic final-answer cache in front of the graph."""
+    return _lazy("response_cache", lambda: SemanticCache(
+        "Response cache",
+        capacity=config.getint("ResponseCache", "CAPACITY", fallback=512),
+        ttl_seconds=config.getint("ResponseCache", "TTL_SECONDS", fallback=3600),
+        similarity_threshold=config.getfloat("ResponseCache", "SIMILARITY_THRESHOLD", fallback=0.95),
+        version_fn=data_version
+    ))
+
+
+def warm_up(background=True):
+    """Build the source stores, the compiled graph and the caches in parallel.
+
+    Runs in a daemon thread by default so an entry point can start serving right away;
+    callers that need the graph simply block in get_graph() until it is ready.
+    """
+    def run():
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="warm-up") as executor:
+            futures = [executor.submit(factory) for factory in
+                       (get_rag_system, _compiled_graph, get_response_cache, get_llm)]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Warm-up failed: {e}")
+        logger.info(f"🔥 Chatbot warm-up finished in {time.perf_counter() - start:.2f}s")
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="chatbot-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def configure(embedding_model=None, llm=None, sql_llm=None, docs_path=None, persist_directory=None,
+              record_index_path=None, sheet_cache_dir=None):
+    """Replace the OpenAI clients or data/cache locations (e.g. for benchmarks) without building anything.
+
+    Overrides must be given before the resources that use them are first created.
+    """
+    for name, value in {"embedding_model": embedding_model, "llm": llm, "sql_llm": sql_llm,
+                        "docs_path": docs_path, "persist_directory": persist_directory,
+                        "record_index_path": record_index_path, "sheet_cache_dir": sheet_cache_dir}.items():
+        if value is not None:
+            _overrides[name] = value
+
+
+def init(embedding_model=None, llm=None, sql_llm=None, docs_path=None, persist_directory=None,
+         record_index_path=None, sheet_cache_dir=None):
+    """Explicitly initialize the chatbot (see configure() for the overrides) and return the compiled graph."""
+    configure(embedding_model, llm, sql_llm, docs_path, persist_directory, record_index_path, sheet_cache_dir)
+    warm_up(background=False)
+    return get_graph()
+
+
+class QueryVector:
+    """Embeds a query at most once; the response cache and the graph's START node share the vector."""
+
+    def __init__(self, query):
+        self.query = query
+        self.vector = None
+
+    def __call__(self):
+        if self.vector is None:
+            with metrics.span("embedding", "query"):
+                self.vector = get_embedding_model().embed_query(self.query)
+        return self.vector
+
+    async def aget(self):
+        if self.vector is None:
+            with metrics.span("embedding", "query"):
+                self.vector = await get_embedding_model().aembed_query(self.query)
+        return self.vector
+
+
+def _exact_cache_only(query):
+    """Whether the response cache may only match this query by its exact (normalized) text.
+
+    Same rule as the retrieval cache: queries naming records ("status of CHG-085" / "CHG-086"),
+    with a metadata constraint ("high impact" / "low impact incidents") or taking the structured
+    route ("count of production" / "non-production devices") embed almost like queries with
+    another answer, so a similarity hit would return the wrong one.
+    """
+    rag = get_rag_system()
+    documents, identifiers, _ = rag.record_index.resolve(query)
+    if documents or identifiers or StructuredQueryEngine.is_aggregate_query(query):
+        return True
+    return any(rag.metadata_filters.extract(query, source) for source in DATA_SOURCES)
+
+
+def _route_embedding(chunk):
+    """Query_Embedding from a graph "updates" stream chunk, if the route computed one."""
+    for update in chunk.values():
+        if isinstance(update, dict) and update.get("Query_Embedding") is not None:
+            return update["Query_Embedding"]
+    return None
+
+
+def answer_query(query, chat_history=""):
+    """Answer a query through the response cache; only cache misses run the graph.
+
+    `query` should be a standalone question (it drives retrieval and the cache key);
+    `chat_history` is only added to the final prompt.
+    """
+    # Exact (normalized) repeats are served without embedding the query
+    query_vector = QueryVector(query)
+    response_cache = get_response_cache()
+    exact_only = _exact_cache_only(query)
+    answer = response_cache.get(query, None if exact_only else query_vector)
+    if answer is not None:
+        logger.info(f"⚡ Response cache hit: {response_cache.stats()}")
+        return answer
+
+    start = time.perf_counter()
+    result = get_graph().invoke({"query": query, "chat_history": chat_history, "Query_Embedding": query_vector.vector})
+    answer = result["Final_Response"]
+    # Only a vector the route already computed is stored (the exact-ID route embeds nothing)
+    vector = None if exact_only else result.get("Query_Embedding")
+    response_cache.put(query, answer, vector, cost_seconds=time.perf_counter() - start)
+    logger.info(f"Response cache miss: {response_cache.stats()}")
+    return answer
+
+
+def stream_query(query, chat_history=""):
+    """Stream the answer to a query: retrieval nodes finish first, then Format_Response tokens are yielded.
+
+    Cache hits are yielded in one piece. Time-to-first-token is logged for every streamed answer.
+    """
+    query_vector = QueryVector(query)
+    response_cache = get_response_cache()
+    exact_only = _exact_cache_only(query)
+    answer = response_cache.get(query, None if exact_only else query_vector)
+    if answer is not None:
+        logger.info(f"⚡ Response cache hit: {response_cache.stats()}")
+        yield answer
+        return
+
+    start = time.perf_counter()
+    parts = []
+    for mode, chunk in get_graph().stream(
+        {"query": query, "chat_history": chat_history, "Query_Embedding": query_vector.vector},
+        stream_mode=["messages", "updates"]
+    ):
+        if mode == "updates":
+            embedding = _route_embedding(chunk)
+            if embedding is not None:
+                query_vector.vector = embedding
+            continue
+        message, metadata = chunk
+        # Only the final answer is streamed (the SQL-drafting LLM call also emits messages)
+        if metadata.get("langgraph_node") != "Format_Response" or not message.content:
+            continue
+        if not parts:
+            logger.info(f"⏱️ Time to first token: {time.perf_counter() - start:.3f}s")
+        parts.append(message.content)
+        yield message.content
+
+    answer = "".join(parts)
+    vector = None if exact_only else query_vector.vector
+    response_cache.put(query, answer, vector, cost_seconds=time.perf_counter() - start)
+    logger.info(f"⏱️ Streamed answer in {time.perf_counter() - start:.3f}s; response cache: {response_cache.stats()}")
+
+
+async def aanswer_query(query, chat_history=""):
+    """Async answer_query(): runs the graph with ainvoke, so one event loop serves many sessions."""
+    query_vector = QueryVector(query)
+    response_cache = get_response_cache()
+    exact_only = _exact_cache_only(query)
+    if exact_only:
+        answer = response_cache.get(query)
+    else:
+        answer = await response_cache.aget(query, query_vector.aget)
+    if answer is not None:
+        logger.info(f"⚡ Response cache hit: {response_cache.stats()}")
+        return answer
+
+    start = time.perf_counter()
+    result = await get_graph().ainvoke(
+        {"query": query, "chat_history": chat_history, "Query_Embedding": query_vector.vector}
+    )
+    answer = result["Final_Response"]
+    vector = None if exact_only else result.get("Query_Embedding")
+    response_cache.put(query, answer, vector, cost_seconds=time.perf_counter() - start)
+    logger.info(f"Response cache miss: {response_cache.stats()}")
+    return answer
+
+
+async def astream_query(query, chat_history=""):
+    """Async stream_query(): yields Format_Response tokens from get_graph().astream."""
+    query_vector = QueryVector(query)
+    response_cache = get_response_cache()
+    exact_only = _exact_cache_only(query)
+    if exact_only:
+        answer = response_cache.get(query)
+    else:
+        answer = await response_cache.aget(query, query_vector.aget)
+    if answer is not None:
+        logger.info(f"⚡ Response cache hit: {response_cache.stats()}")
+        yield answer
+        return
+
+    start = time.perf_counter()
+    parts = []
+    async for mode, chunk in get_graph().astream(
+        {"query": query, "chat_history": chat_history, "Query_Embedding": query_vector.vector},
+        stream_mode=["messages", "updates"]
+    ):
+        if mode == "updates":
+            embedding = _route_embedding(chunk)
+            if embedding is not None:
+                query_vector.vector = embedding
+            continue
+        message, metadata = chunk
+        if metadata.get("langgraph_node") != "Format_Response" or not message.content:
+            continue
+        if not parts:
+            logger.info(f"⏱️ Time to first token: {time.perf_counter() - start:.3f}s")
+        parts.append(message.content)
+        yield message.content
+
+    answer = "".join(parts)
+    vector = None if exact_only else query_vector.vector
+    response_cache.put(query, answer, vector, cost_seconds=time.perf_counter() - start)
+    logger.info(f"⏱️ Streamed answer in {time.perf_counter() - start:.3f}s; response cache: {response_cache.stats()}")
 
 
 # # 🔹 MAIN FUNCTION: Run a test query
@@ -296,23 +1229,23 @@ graph_executor = workflow.compile()
 def main():
     # First query (adds data to context)
     query1 = "Give me list of high impact incidents id only?"
-    response1 = graph_executor.invoke({"query": query1})
+    response1 = {"Final_Response": answer_query(query1)}
     print("\n=== First Query Response ===")
     print(response1["Final_Response"])
     
     # Second query (uses stored context)
     query2 = "I am facing 'Windows Server update failure issue' what is resolution for it?"
-    response2 = graph_executor.invoke({"query": query2})
+    response2 = {"Final_Response": answer_query(query2)}
     print("\n=== Follow-up Query Response ===")
     print(response2["Final_Response"])
 
     query3 = "What is count of production devices?"
-    response3 = graph_executor.invoke({"query": query3})
+    response3 = {"Final_Response": answer_query(query3)}
     print("\n=== Follow-up Query Response ===")
     print(response3["Final_Response"])
 
     query4 = "What is status of devices WLJP09W11?"
-    response4 = graph_executor.invoke({"query": query4})
+    response4 = {"Final_Response": answer_query(query4)}
     print("\n=== Follow-up Query Response ===")
     print(response4["Final_Response"])
 
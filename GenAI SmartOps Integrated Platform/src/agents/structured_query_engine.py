@@ -0,0 +1,201 @@
+import re
+import asyncio
+import sqlite3
+import logging
+import threading
+import metrics
+from token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Count / list / aggregate phrasing that top-k retrieval cannot answer exactly. Only explicit
+# aggregate phrases: single words like "total", "per" or "max" also occur in ordinary lookups,
+# which would then pay for an extra SQL drafting call
+AGGREGATE_INTENT_PATTERN = re.compile(
+    r"\b(how many|count of|number of|total number of|average|avg|sum of|"
+    r"(?:maximum|minimum|highest|lowest) number of|top \d+|group(?:ed)? by|breakdown (?:by|of)|"
+    r"distribution of|list (?:all|every)|names only|ids? only)\b",
+    re.IGNORECASE
+)
+
+# Columns with at most this many distinct values get sample values in the schema prompt
+CATEGORICAL_SAMPLE_LIMIT = 12
+
+# SQLite authorizer actions a read-only SELECT needs
+ALLOWED_SQL_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+SQL_PROMPT = """You translate IT service-desk questions into one SQLite SELECT statement.
+
+Tables:
+{schema}
+
+Rules:
+- Return only the SQL statement, no explanation and no code fences.
+- Use only the tables and columns listed above; quote identifiers with double quotes.
+- Compare text case-insensitively, e.g. LOWER("Environment") = 'production'.
+- Return only the columns needed to answer, and add LIMIT {max_rows} to list queries.
+- If the question cannot be answered from these tables, return NONE.
+
+Question: {query}
+SQL:"""
+
+
+class StructuredQueryEngine:
+    """Answers count, filter and list questions with validated SQL over the full source tables.
+
+    Every source sheet is loaded into an in-memory SQLite database (one indexed table per
+    source). An LLM drafts a single SELECT from the schema; it only runs if it passes the
+    validator and a read-only authorizer, and only the compact result reaches the final prompt.
+    """
+
+    def __init__(self, llm, max_rows=200, max_steps=5_000_000):
+        self.llm = llm
+        self.max_rows = max_rows
+        self.max_steps = max_steps
+        self.tables = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+
+    # ---------- Loading ----------
+
+    def load_table(self, table, df):
+        """(Re)load a source sheet as a table with an index on every column."""
+        with self._lock:
+            self._conn.set_authorizer(None)
+            df.to_sql(table, self._conn, if_exists="replace", index=False)
+            for position, column in enumerate(df.columns):
+                self._conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS "idx_{table}_{position}" ON "{table}" ("{column}" COLLATE NOCASE)'
+                )
+
+            samples = {}
+            for column in df.columns:
+                values = df[column].dropna().astype(str).unique()
+                if 0 < len(values) <= CATEGORICAL_SAMPLE_LIMIT:
+                    samples[column] = sorted(values)
+
+            self.tables[table] = {"columns": {col: str(df[col].dtype) for col in df.columns},
+                                  "rows": len(df), "samples": samples}
+        logger.info(f"Structured engine loaded {table}: {len(df)} rows")
+
+    def schema_prompt(self):
+        lines = []
+        for table, info in self.tables.items():
+            columns = ", ".join(f'"{col}" ({dtype})' for col, dtype in info["columns"].items())
+            lines.append(f'- "{table}" ({info["rows"]} rows): {columns}')
+            for col, values in info["samples"].items():
+                lines.append(f'    "{col}" values: {", ".join(values)}')
+        return "\n".join(lines)
+
+    # ---------- Query generation and validation ----------
+
+    @staticmethod
+    def is_aggregate_query(query):
+        return bool(AGGREGATE_INTENT_PATTERN.search(query))
+
+    def _sql_prompt(self, query):
+        return SQL_PROMPT.format(schema=self.schema_prompt(), max_rows=self.max_rows, query=query)
+
+    def generate_sql(self, query):
+        prompt = self._sql_prompt(query)
+        with metrics.span("llm", "sql"):
+            sql = self.llm.invoke(prompt).content
+        self._record_tokens(prompt, sql)
+        return sql
+
+    async def agenerate_sql(self, query):
+        prompt = self._sql_prompt(query)
+        with metrics.span("llm", "sql"):
+            sql = (await self.llm.ainvoke(prompt)).content
+        self._record_tokens(prompt, sql)
+        return sql
+
+    def _record_tokens(self, prompt, sql):
+        metrics.record_tokens(metrics.model_name(self.llm), "sql", count_tokens(prompt), count_tokens(sql))
+
+    def validate_sql(self, sql):
+        """Return a cleaned single SELECT statement, or raise ValueError."""
+        sql = re.sub(r"^```(?:sql)?|```$", "", sql.strip(), flags=re.IGNORECASE).strip().rstrip(";").strip()
+
+        if not sql or sql.upper() == "NONE":
+            raise ValueError("Question is not answerable from the source tables")
+        if not re.match(r"^(SELECT|WITH)\b", sql, re.IGNORECASE):
+            raise ValueError("Only SELECT statements are allowed")
+        if ";" in sql or not sqlite3.complete_statement(sql + ";"):
+            raise ValueError("Exactly one complete statement is allowed")
+        return sql
+
+    def _authorize(self, action, arg1, arg2, db_name, trigger):
+        if action not in ALLOWED_SQL_ACTIONS:
+            return sqlite3.SQLITE_DENY
+        if action == sqlite3.SQLITE_READ and arg1 not in self.tables:
+            # Row-only reads of a CTE ("WITH n AS (...) SELECT COUNT(*) FROM n") arrive with no
+            # database name; the schema tables never get through, whichever form they take
+            if db_name is not None or arg1.lower().startswith("sqlite_"):
+                return sqlite3.SQLITE_DENY
+        return sqlite3.SQLITE_OK
+
+    def execute(self, sql):
+        """Run a validated statement read-only with a step budget. Returns (columns, rows, truncated)."""
+        steps = {"count": 0}
+
+        def progress():
+            steps["count"] += 1000
+            return 1 if steps["count"] > self.max_steps else 0  # Non-zero aborts the query
+
+        with self._lock:
+            self._conn.set_authorizer(self._authorize)
+            self._conn.set_progress_handler(progress, 1000)
+            try:
+                cursor = self._conn.execute(sql)
+                rows = cursor.fetchmany(self.max_rows + 1)
+                columns = [description[0] for description in cursor.description or []]
+            finally:
+                self._conn.set_progress_handler(None, 0)
+                self._conn.set_authorizer(None)
+
+        return columns, [list(row) for row in rows[:self.max_rows]], len(rows) > self.max_rows
+
+    def _result(self, sql, columns, rows, truncated):
+        logger.info(f"🧮 Structured query: {sql} -> {len(rows)} rows")
+        return {"sql": sql, "columns": columns, "rows": rows, "truncated": truncated}
+
+    def answer(self, query):
+        """Answer an aggregate/list question over the full tables, or return None to fall back."""
+        if not self.tables:
+            return None
+
+        try:
+            draft = self.generate_sql(query)
+        except Exception as e:
+            logger.warning(f"Structured query fallback for '{query}': SQL drafting failed: {e}")
+            return None
+
+        try:
+            sql = self.validate_sql(draft)
+            columns, rows, truncated = self.execute(sql)
+        except (ValueError, sqlite3.Error) as e:
+            logger.info(f"Structured query fallback for '{query}': {e}")
+            return None
+
+        return self._result(sql, columns, rows, truncated)
+
+    async def aanswer(self, query):
+        """Async answer(): the SQL is drafted with the LLM's async client and executed in a worker thread."""
+        if not self.tables:
+            return None
+
+        try:
+            draft = await self.agenerate_sql(query)
+        except Exception as e:
+            logger.warning(f"Structured query fallback for '{query}': SQL drafting failed: {e}")
+            return None
+
+        try:
+            sql = self.validate_sql(draft)
+            columns, rows, truncated = await asyncio.to_thread(self.execute, sql)
+        except (ValueError, sqlite3.Error) as e:
+            logger.info(f"Structured query fallback for '{query}': {e}")
+            return None
+
+        return self._result(sql, columns, rows, truncated)
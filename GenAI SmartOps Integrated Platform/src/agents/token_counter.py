@@ -0,0 +1,28 @@
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# Same tokenizer family as text-embedding-3-* and gpt-4o-mini's predecessor models
+TOKEN_ENCODING = "cl100k_base"
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tiktoken encoding once; tiktoken is optional (and needs its BPE file)."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable ({e}); estimating tokens as characters / 4")
+        return None
+
+
+def count_tokens(text):
+    """Count (or estimate) the number of tokens in a text."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
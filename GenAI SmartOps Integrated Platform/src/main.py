@@ -8,6 +8,7 @@ Created on Mon Mar 31 21:24:29 2025
 import os
 import subprocess
 import time
+import requests
 
 # Resolve base directory
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
@@ -16,6 +17,7 @@ BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
 FLASK_SERVER_SCRIPT = os.path.join(BASE_DIR, "src", "agents", "flask_alert_receiver_agent.py")  # Flask Server
 MONITORING_SCRIPT = os.path.join(BASE_DIR, "scripts", "monitoring_scripts", "m_temp_files_size_monitoring.py")  # Monitoring App
 GRADIO_APP_SCRIPT = os.path.join(BASE_DIR, "src", "agents", "GenAI_SmartOps_Integrated_Platform.py")  # Gradio App
+FLASK_HEALTH_URL = "http://127.0.0.1:5006/health"
 
 # Function to start a script as a background process
 def start_script(script_path, name):
@@ -31,14 +33,28 @@ def start_script(script_path, name):
         print(f" Starting {name}...")
         return subprocess.Popen(["python", script_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
+def wait_until_healthy(url, timeout=60, interval=0.2):
+    """Poll a health endpoint until it answers 200 (instead of sleeping a fixed time)."""
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                print(f" {url} ready in {time.time() - start:.1f}s")
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(interval)
+    print(f" Warning: {url} not ready after {timeout}s, continuing")
+    return False
 
-#  Start Monitoring App
-monitoring_process = start_script(MONITORING_SCRIPT, "Monitoring App")
-time.sleep(5)  # Give some time to start
 
- # Start Flask server
+# Start Flask server first so the monitor's first alert has a receiver
 flask_process = start_script(FLASK_SERVER_SCRIPT, "Flask Server")
-time.sleep(15)  # Wait for Flask to initialize
+if flask_process:
+    wait_until_healthy(FLASK_HEALTH_URL)
+
+#  Start Monitoring App
+monitoring_process = start_script(MONITORING_SCRIPT, "Monitoring App")
 
 # Start Gradio App
 gradio_process = start_script(GRADIO_APP_SCRIPT, "Gradio App")
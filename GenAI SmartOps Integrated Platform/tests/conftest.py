@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agents are flat modules importing each other as siblings
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "agents"))
@@ -0,0 +1,101 @@
+import time
+import pytest
+from alert_queue import AlertQueue, QueueFull, alert_priority
+from alert_jobs import alert_fingerprint
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return AlertQueue(str(tmp_path / "alerts.sqlite3"), max_depth=3, lease_seconds=60, max_attempts=2)
+
+
+def enqueue(queue, message, alert=None, dedup_window=0):
+    alert = alert or {}
+    return queue.enqueue(message, alert, alert_fingerprint(message, alert.get("labels")), dedup_window)
+
+
+@pytest.mark.parametrize("labels", [["severity", "critical"], "severity=critical", 42, None])
+def test_non_dict_labels_get_the_default_priority(labels):
+    assert alert_priority({"message": "disk full", "labels": labels}) == 0
+    assert alert_priority({"message": "disk full", "labels": labels, "severity": "warning"}) == 10
+
+
+def test_priority_from_explicit_field_or_severity():
+    assert alert_priority({"priority": 7, "severity": "critical"}) == 7
+    assert alert_priority({"priority": True, "severity": "critical"}) == 30
+    assert alert_priority({"labels": {"severity": "High"}}) == 20
+
+
+def test_non_dict_labels_are_queued(queue):
+    row, reason = enqueue(queue, "disk full on WIN01", {"labels": ["disk", "WIN01"]})
+    assert reason is None
+    assert row["priority"] == 0
+    assert queue.dequeue_batch(10)[0]["alert"]["labels"] == ["disk", "WIN01"]
+
+
+def test_dequeue_by_priority_then_arrival(queue):
+    low, _ = enqueue(queue, "cpu high on db-1")
+    critical, _ = enqueue(queue, "router down", {"severity": "critical"})
+    later, _ = enqueue(queue, "memory high on app-2")
+    assert [row["id"] for row in queue.dequeue_batch(10)] == [critical["id"], low["id"], later["id"]]
+
+
+def test_repeats_share_the_unfinished_row(queue):
+    first, _ = enqueue(queue, "Disk full on WIN01 at 2025-03-08 10:15:00")
+    repeat, reason = enqueue(queue, "disk full on WIN01 at 2025-03-08 10:16:30!")
+    assert reason == "in_flight"
+    assert repeat["id"] == first["id"]
+    assert repeat["duplicates"] == 1
+
+
+def test_dedup_window_after_success_only(queue):
+    succeeded, _ = enqueue(queue, "cpu high on db-1")
+    queue.complete(succeeded["id"], "succeeded", "ok")
+    assert enqueue(queue, "cpu high on db-1", dedup_window=300)[1] == "window"
+    assert enqueue(queue, "cpu high on db-1", dedup_window=0)[1] is None
+
+    failed, _ = enqueue(queue, "router down")
+    queue.complete(failed["id"], "failed", "error")
+    assert enqueue(queue, "router down", dedup_window=300)[1] is None
+
+
+def test_backpressure_when_full(queue):
+    for index in range(3):
+        enqueue(queue, f"alert {index}")
+    with pytest.raises(QueueFull) as raised:
+        enqueue(queue, "one too many")
+    assert raised.value.retry_after == queue.retry_after
+    assert enqueue(queue, "alert 0")[1] == "in_flight"  # Repeats are still answered
+
+
+def test_expired_lease_is_redelivered_until_max_attempts(queue):
+    row, _ = enqueue(queue, "cpu high on db-1")
+    queue.lease_seconds = 0.05
+
+    assert [job["attempts"] for job in queue.dequeue_batch(10)] == [1]
+    assert queue.dequeue_batch(10) == []  # Still leased
+    time.sleep(0.1)
+    assert [job["attempts"] for job in queue.dequeue_batch(10)] == [2]
+    time.sleep(0.1)
+    assert queue.dequeue_batch(10) == []
+    assert queue.get(row["id"])["status"] == "failed"
+
+
+def test_extended_lease_is_not_redelivered(queue):
+    enqueue(queue, "cpu high on db-1")
+    queue.lease_seconds = 0.2
+    leased = queue.dequeue_batch(10)
+    time.sleep(0.1)
+    queue.extend_leases([job["id"] for job in leased])
+    time.sleep(0.15)
+    assert queue.dequeue_batch(10) == []
+
+
+def test_purge_keeps_newest_finished_rows(queue):
+    ids = []
+    for index in range(3):
+        row, _ = enqueue(queue, f"alert {index}")
+        queue.complete(row["id"], "succeeded", "ok")
+        ids.append(row["id"])
+    queue.purge(1)
+    assert [queue.get(row_id) is not None for row_id in ids] == [False, False, True]
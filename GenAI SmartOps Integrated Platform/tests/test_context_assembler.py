@@ -0,0 +1,70 @@
+import time
+import random
+from langchain_core.documents import Document
+from context_assembler import ContextAssembler
+
+WORDS = ("server database router switch incident change outage latency disk memory cpu network "
+         "firewall patch backup cluster replica oracle windows linux production staging vlan").split()
+
+
+def make_docs(source, count, seed):
+    rng = random.Random(seed)
+    return [
+        Document(
+            page_content=f"ID: {source}-{i} | " + " ".join(rng.choice(WORDS) for _ in range(30)),
+            metadata={"source": source, "row_id": f"{source}-{i}"}
+        )
+        for i in range(count)
+    ]
+
+
+def test_mmr_packing_scales_to_hundreds_of_units():
+    categories = [(f"Source {n}", make_docs(f"S{n}", 60, n)) for n in range(5)]
+    assembler = ContextAssembler(max_tokens=3000)
+
+    start = time.perf_counter()
+    context, stats = assembler.assemble("oracle database outage in production", [], categories)
+    elapsed = time.perf_counter() - start
+
+    assert stats["rows"] == 300
+    assert 0 < stats["kept_rows"] < 300
+    assert elapsed < 2.0, f"assemble took {elapsed:.2f}s for 300 units"
+
+
+def test_mmr_prefers_distinct_rows():
+    duplicate = "Server: WIN01 | Status: Down | Location: Chennai datacenter rack 4"
+    docs = [
+        Document(page_content=duplicate + f" slot {i}", metadata={"source": "CI", "row_id": f"r{i}"})
+        for i in range(3)
+    ] + [Document(page_content="Router: RT-9 | Status: Degraded | Location: Pune", metadata={"source": "CI", "row_id": "rt"})]
+    assembler = ContextAssembler(max_tokens=60, mmr_lambda=0.5)
+
+    context, stats = assembler.assemble("server status", [], [("CI", docs)])
+
+    assert "RT-9" in context
+    assert stats["kept_rows"] < 4
+
+
+def test_context_never_exceeds_max_tokens():
+    exact = make_docs("EX", 5, 99)
+    categories = [(f"Source {n}", make_docs(f"S{n}", 40, n)) for n in range(6)]
+    for max_tokens in (50, 200, 777, 3000):
+        assembler = ContextAssembler(max_tokens=max_tokens)
+        context, stats = assembler.assemble("cpu latency on linux cluster", exact, categories)
+        assert stats["context_tokens"] <= max_tokens
+        assert stats["kept_rows"] == sum(line.startswith("- ") for line in context.splitlines())
+
+
+def test_structured_result_is_cut_to_fit():
+    structured = {
+        "sql": "SELECT name FROM CI_Data",
+        "columns": ["name"],
+        "rows": [[f"server-{i:04d}-production-cluster"] for i in range(200)],
+        "truncated": False
+    }
+    assembler = ContextAssembler(max_tokens=500)
+    context, stats = assembler.assemble("list all servers", [], [("CI", make_docs("CI", 20, 1))], structured)
+
+    assert stats["context_tokens"] <= 500
+    assert '"truncated":true' in context
+    assert "server-0000" in context
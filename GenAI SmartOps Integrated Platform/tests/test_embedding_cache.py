@@ -0,0 +1,48 @@
+from langchain_core.embeddings import Embeddings
+from embedding_cache import CachedEmbeddings
+from token_counter import count_tokens
+import metrics
+
+MODEL = "text-embedding-3-small"
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0, 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def counted(counter, *key):
+    return counter._values.get(key, 0.0)
+
+
+def test_only_cache_misses_are_embedded_and_counted(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, MODEL, cache_dir=str(tmp_path))
+    tokens_before = counted(metrics.TOKENS, MODEL, "prompt", "embedding")
+    cost_before = counted(metrics.COST, MODEL, "embedding")
+
+    first = cache.embed_documents(["disk full on WIN01", "cpu spike on db-7"])
+    second = cache.embed_documents(["disk full on WIN01", "cpu spike on db-7", "router RT-9 down"])
+
+    assert second[:2] == first
+    assert model.texts == ["disk full on WIN01", "cpu spike on db-7", "router RT-9 down"]
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 3
+    expected = sum(count_tokens(text) for text in model.texts)
+    assert counted(metrics.TOKENS, MODEL, "prompt", "embedding") - tokens_before == expected
+    assert counted(metrics.COST, MODEL, "embedding") > cost_before
+
+
+def test_vectors_survive_a_new_cache_instance(tmp_path):
+    CachedEmbeddings(CountingEmbeddings(), MODEL, cache_dir=str(tmp_path)).embed_query("status of CHG-085")
+    model = CountingEmbeddings()
+    vector = CachedEmbeddings(model, MODEL, cache_dir=str(tmp_path)).embed_query("status of CHG-085")
+
+    assert vector == [float(len("status of CHG-085")), 1.0, 0.5]
+    assert model.texts == []
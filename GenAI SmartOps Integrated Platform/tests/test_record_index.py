@@ -0,0 +1,58 @@
+import sqlite3
+import pytest
+from record_index import RecordKeyIndex
+
+CHANGES = [
+    ("0", ["CHG-085", "WLJP09W11"], "Change ID: CHG-085 | Server: WLJP09W11"),
+    ("1", ["CHG-086", "PHSAO23"], "Change ID: CHG-086 | Server: PHSAO23"),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = RecordKeyIndex(str(tmp_path / "records.sqlite3"))
+    index.update_source("changes", CHANGES, "v1")
+    return index
+
+
+def test_resolve_named_record(index):
+    documents, identifiers, unresolved = index.resolve("What is the status of chg-085?")
+    assert [doc.page_content for doc in documents] == [CHANGES[0][2]]
+    assert documents[0].metadata == {"source": "changes", "row_id": "0", "match": "exact"}
+    assert identifiers == ["chg-085"]
+    assert unresolved == []
+
+
+def test_resolve_reports_unknown_identifiers(index):
+    documents, identifiers, unresolved = index.resolve("Compare CHG-999 with WLJP09W11 and 10.0.0.1")
+    assert [doc.metadata["row_id"] for doc in documents] == ["0"]
+    assert identifiers == ["CHG-999", "WLJP09W11", "10.0.0.1"]
+    assert unresolved == ["CHG-999", "10.0.0.1"]
+
+
+def test_resolve_deduplicates_rows_and_ignores_plain_words(index):
+    documents, identifiers, unresolved = index.resolve("CHG-085 on WLJP09W11 and CHG-085 again, how many servers?")
+    assert [doc.metadata["row_id"] for doc in documents] == ["0"]
+    assert identifiers == ["CHG-085", "WLJP09W11"]
+    assert index.resolve("how many open changes") == ([], [], [])
+
+
+def test_update_replaces_a_sources_keys(index):
+    index.update_source("changes", [("0", ["CHG-100"], "Change ID: CHG-100")], "v2")
+    assert index.lookup("CHG-085") == []
+    assert [doc.page_content for doc in index.lookup("chg-100")] == ["Change ID: CHG-100"]
+
+
+def test_unchanged_signature_skips_the_rewrite(tmp_path, index):
+    db_path = str(tmp_path / "records.sqlite3")
+    index.update_source("changes", [("0", ["CHG-100"], "Change ID: CHG-100")], "v1")
+    assert index.lookup("CHG-100")  # Memory is always refreshed
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM records WHERE key = 'CHG-100'").fetchone() == (0,)
+
+
+def test_load_source_restores_persisted_keys(tmp_path, index):
+    restored = RecordKeyIndex(str(tmp_path / "records.sqlite3"))
+    assert restored.lookup("PHSAO23") == []
+    restored.load_source("changes")
+    assert [doc.metadata["row_id"] for doc in restored.lookup("phsao23")] == ["1"]
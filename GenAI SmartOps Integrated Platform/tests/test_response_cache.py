@@ -0,0 +1,38 @@
+import os
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+import smart_ops_gen_ai_chatbot as chatbot
+from embedding_providers import create_embeddings
+
+DOCS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "documents")
+
+
+@pytest.fixture(scope="module")
+def llm(tmp_path_factory):
+    work = tmp_path_factory.mktemp("chatbot")
+    # A loose threshold makes any similarity lookup hit, so only the exact-only rule keeps answers apart
+    chatbot.config.set("ResponseCache", "SIMILARITY_THRESHOLD", "0.3")
+    llm = FakeListChatModel(responses=["first answer", "second answer", "third answer", "fourth answer"])
+    chatbot.init(
+        embedding_model=create_embeddings("hashing"),
+        llm=llm,
+        sql_llm=FakeListChatModel(responses=["SELECT 1"]),
+        docs_path=DOCS_PATH,
+        persist_directory=str(work / "chroma"),
+        record_index_path=str(work / "record_index.sqlite3"),
+        sheet_cache_dir=str(work / "sheets")
+    )
+    return llm
+
+
+def test_filtered_query_is_not_answered_from_a_similar_one(llm):
+    high = chatbot.answer_query("show high impact incidents")
+    low = chatbot.answer_query("show low impact incidents")
+
+    assert high != low
+    assert chatbot.answer_query("Show high impact incidents?") == high  # Exact repeats still hit
+
+
+def test_unconstrained_paraphrase_hits_by_similarity(llm):
+    first = chatbot.answer_query("recent outages reported by users")
+    assert chatbot.answer_query("recent outages reported by the users") == first
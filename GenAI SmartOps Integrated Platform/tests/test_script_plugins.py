@@ -0,0 +1,47 @@
+import time
+import pytest
+from script_plugins import ScriptPluginRuntime, ScriptTimeout, HUNG_WORKERS
+
+HANGING_SCRIPT = """import sys, time
+def run(query):
+    time.sleep(4)
+    return "plugin " + query
+if __name__ == "__main__":
+    print("subprocess " + sys.argv[1])
+"""
+
+
+def test_hung_plugin_falls_back_to_a_subprocess(tmp_path):
+    (tmp_path / "hang.py").write_text(HANGING_SCRIPT)
+    (tmp_path / "quick.py").write_text("def run(query):\n    return 'quick ' + query\n")
+    runtime = ScriptPluginRuntime(str(tmp_path), workers=2, timeout=1.5)
+
+    for attempt in range(2):
+        with pytest.raises(ScriptTimeout):
+            runtime.run("hang.py", str(attempt))
+
+    assert runtime.mode("hang.py") == "subprocess"
+    assert HUNG_WORKERS._values[("hang.py",)] == 2
+    assert runtime.run("hang.py", "x") == "subprocess x"  # Not queued behind the hung calls
+    assert runtime.run("quick.py", "y") == "quick y"  # Other scripts keep their own workers
+
+    deadline = time.time() + 10
+    while HUNG_WORKERS._values[("hang.py",)] and time.time() < deadline:
+        time.sleep(0.05)
+    assert HUNG_WORKERS._values[("hang.py",)] == 0
+    assert runtime.mode("hang.py") == "in_process"
+
+
+def test_on_done_waits_for_the_plugin_thread(tmp_path):
+    (tmp_path / "hang.py").write_text(HANGING_SCRIPT)
+    runtime = ScriptPluginRuntime(str(tmp_path), workers=1, timeout=1.5)
+    done = []
+
+    with pytest.raises(ScriptTimeout):
+        runtime.run("hang.py", "x", on_done=lambda: done.append(time.time()))
+    assert done == []
+
+    deadline = time.time() + 10
+    while not done and time.time() < deadline:
+        time.sleep(0.05)
+    assert len(done) == 1
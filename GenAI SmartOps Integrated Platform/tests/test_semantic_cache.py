@@ -0,0 +1,87 @@
+import asyncio
+import time
+from semantic_cache import SemanticCache, normalize_text
+
+
+def test_normalize_text():
+    assert normalize_text("  What is   INC001 ?") == normalize_text("what is inc001") == "what is inc001"
+
+
+def test_exact_hit_does_not_compute_a_vector():
+    cache = SemanticCache("test")
+    cache.put("How many open incidents?", "12", vector=[1.0, 0.0])
+
+    def vector():
+        raise AssertionError("vector computed for an exact match")
+
+    assert cache.get("how many open incidents", vector) == "12"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["semantic_hits"] == 0
+
+
+def test_similarity_hit_and_miss():
+    cache = SemanticCache("test", similarity_threshold=0.9)
+    cache.put("how many open incidents", "12", vector=[1.0, 0.0], cost_seconds=2.0)
+
+    assert cache.get("count of open incidents", [0.99, 0.05]) == "12"
+    assert cache.get("list closed changes", [0.0, 1.0]) is None
+    assert cache.get("count of open incidents") is None  # No vector, exact text only
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+    assert stats["latency_saved_seconds"] == 2.0
+
+
+def test_ttl_expiry():
+    cache = SemanticCache("test", ttl_seconds=0.05)
+    cache.put("q", "a")
+    time.sleep(0.1)
+    assert cache.get("q") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_version_change_invalidates():
+    version = [1]
+    cache = SemanticCache("test", version_fn=lambda: version[0], version_check_interval=0)
+    cache.put("q", "a")
+    assert cache.get("q") == "a"
+
+    version[0] = 2
+    assert cache.get("q") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_capacity_evicts_least_recently_used():
+    cache = SemanticCache("test", capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert [cache.get(key) for key in "abc"] == [1, None, 3]
+
+
+def test_max_bytes_bound():
+    cache = SemanticCache("test", max_bytes=10, size_fn=len)
+    cache.put("a", "xxxxxx")
+    cache.put("b", "yyyyyy")
+    assert cache.get("a") is None
+    assert cache.get("b") == "yyyyyy"
+
+    cache.put("c", "z" * 11)  # Larger than the whole cache: not stored, nothing evicted
+    assert cache.get("c") is None
+    assert cache.stats()["bytes"] == 6
+
+
+def test_aget_awaits_vector_only_after_exact_miss():
+    cache = SemanticCache("test", similarity_threshold=0.9)
+    cache.put("how many open incidents", "12", vector=[1.0, 0.0])
+    calls = []
+
+    async def vector():
+        calls.append(1)
+        return [0.99, 0.05]
+
+    assert asyncio.run(cache.aget("How many open incidents?", vector)) == "12"
+    assert calls == []
+    assert asyncio.run(cache.aget("count of open incidents", vector)) == "12"
+    assert calls == [1]
@@ -0,0 +1,80 @@
+import sqlite3
+import pandas as pd
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from structured_query_engine import StructuredQueryEngine
+
+
+@pytest.fixture
+def engine():
+    engine = StructuredQueryEngine(llm=None, max_rows=2)
+    engine.load_table("change_requests", pd.DataFrame({
+        "Change ID": ["CHG-001", "CHG-002", "CHG-003"],
+        "Environment": ["Production", "Staging", "Production"],
+    }))
+    return engine
+
+
+@pytest.mark.parametrize("draft, expected", [
+    ("SELECT 1", "SELECT 1"),
+    ("select count(*) from t;", "select count(*) from t"),
+    ("```sql\nSELECT 1;\n```", "SELECT 1"),
+    ("WITH x AS (SELECT 1) SELECT * FROM x", "WITH x AS (SELECT 1) SELECT * FROM x"),
+])
+def test_validate_accepts_single_select(engine, draft, expected):
+    assert engine.validate_sql(draft) == expected
+
+
+@pytest.mark.parametrize("draft", [
+    "",
+    "NONE",
+    "DELETE FROM change_requests",
+    "DROP TABLE change_requests",
+    "PRAGMA table_info(change_requests)",
+    "ATTACH DATABASE 'x.db' AS x",
+    "SELECT 1; DROP TABLE change_requests",
+    "SELECT 1; SELECT 2",
+    "SELECT 'unterminated",
+])
+def test_validate_rejects(engine, draft):
+    with pytest.raises(ValueError):
+        engine.validate_sql(draft)
+
+
+def test_execute_truncates_to_max_rows(engine):
+    columns, rows, truncated = engine.execute('SELECT "Change ID" FROM change_requests ORDER BY 1')
+    assert columns == ["Change ID"]
+    assert rows == [["CHG-001"], ["CHG-002"]]
+    assert truncated
+
+
+def test_execute_counts_over_a_cte(engine):
+    sql = 'WITH prod AS (SELECT * FROM change_requests WHERE "Environment" = \'Production\') SELECT COUNT(*) FROM prod'
+    assert engine.execute(engine.validate_sql(sql))[1] == [[2]]
+
+
+@pytest.mark.parametrize("sql", [
+    "WITH x AS (SELECT 1) DELETE FROM change_requests",
+    "SELECT name FROM sqlite_master",
+    "SELECT COUNT(*) FROM sqlite_master",
+    "SELECT COUNT(*) FROM temp.sqlite_master",
+])
+def test_authorizer_denies_writes_and_unknown_tables(engine, sql):
+    with pytest.raises(sqlite3.DatabaseError):
+        engine.execute(engine.validate_sql(sql))
+    assert engine.execute("SELECT COUNT(*) FROM change_requests")[1] == [[3]]
+
+
+def test_step_budget_aborts_runaway_queries(engine):
+    engine.max_steps = 10_000
+    with pytest.raises(sqlite3.OperationalError):
+        engine.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n")
+
+
+def test_answer_falls_back_on_invalid_sql(engine):
+    engine.llm = FakeListChatModel(responses=[
+        'SELECT COUNT(*) FROM change_requests WHERE LOWER("Environment") = \'production\'',
+        "DROP TABLE change_requests",
+    ])
+    assert engine.answer("how many production changes")["rows"] == [[2]]
+    assert engine.answer("drop everything") is None